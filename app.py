@@ -1,34 +1,92 @@
 import time
 import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from threading import Timer
-from flask import Flask, render_template, request, jsonify, session, Response, abort
+from flask import Flask, render_template, request, jsonify, session, Response, abort, send_file, \
+    redirect, send_from_directory
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import uuid
 import random
 from datetime import datetime
 import os
 from game_logic import GameManager, Room, Player, SubmittedData
+from room_store import create_room_store
+from sharding import ShardMap
+from image_store import ImageStore
+from asset_manifest import AssetManifest, compress
+from image_transcoder import ImageTranscoder, TranscoderBusy, run_off_hub
 from comfy_client import ComfyUIClient, MockComfyUIClient
-from comfy_api_simplified import ComfyApiWrapper, ComfyWorkflowWrapper
+from comfy_backend_pool import ComfyBackendPool, NoBackendAvailable
+from comfy_workflow import WorkflowTemplate
+from generation_scheduler import GenerationScheduler, GenerationJob, DispatchDeferred
+from phase_scheduler import PhaseScheduler
+from status_batcher import StatusBatcher
 import json
 import logging
+import mimetypes
 import base64
 import secrets
 from markupsafe import escape
-from PIL import Image
-import io
 
 # 配置上傳設定
-UPLOAD_FOLDER = 'art_output'
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'art_output')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB 最大檔案大小
-COMFY_API = 'http://127.0.0.1:8188/'
+# 房間狀態儲存（未設定為行程內儲存；多個 worker 時設定為 redis://...）
+ROOM_STORE_URL = os.environ.get('ROOM_STORE_URL')
+ROOM_IDLE_TIMEOUT = int(os.environ.get('ROOM_IDLE_TIMEOUT', 30 * 60))  # 有玩家的房間閒置多久後回收（秒）
+EMPTY_ROOM_TIMEOUT = 60  # 沒有玩家的房間閒置多久後回收（秒）
+ROOM_REAP_MAX_WAIT = 30  # 回收執行緒最長的等待間隔（秒）
+STATUS_BATCH_WINDOW = 0.05  # 玩家狀態更新的合併時間窗（秒）
+# Socket.IO 訊息佇列，讓多個 worker 能廣播到同一房間（預設與房間儲存相同）
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE', ROOM_STORE_URL)
+# 分片模式：啟動 SHARD_COUNT 個 worker，各自以 SHARD_ID 區分，只負責自己建立的房間
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', 1))
+SHARD_ID = int(os.environ.get('SHARD_ID', 0))
+SERVER_PORT = int(os.environ.get('PORT', 5566 + SHARD_ID))
+# Socket.IO 非同步模式（eventlet、threading 等），未設定時自動選擇；gunicorn.conf.py 依 worker 類型設定
+SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE') or None
+# 記錄每個 Socket.IO 封包（開發用；python app.py 預設開啟，其他進入點預設關閉）
+SOCKETIO_DEBUG_LOG = os.environ.get('SOCKETIO_DEBUG_LOG', '0') == '1'
+TLS_CERTFILE = os.environ.get('TLS_CERTFILE', 'server.crt')
+TLS_KEYFILE = os.environ.get('TLS_KEYFILE', 'server.key')
+# ComfyUI 後端，多台以逗號分隔
+COMFY_API = os.environ.get('COMFY_API', 'http://127.0.0.1:8188/')
+# ComfyUI 繪圖完成後回傳圖片的網址（後端在其他主機時需改為本伺服器對外位址）
+COMFY_CALLBACK_URL = os.environ.get('COMFY_CALLBACK_URL', f'https://127.0.0.1:{SERVER_PORT}/upload')
+# 繪圖結果取得方式：push 由工作流程的 Image Send HTTP 節點回傳到 /upload；
+# pull 由伺服器透過事件串流得知完成後自行下載 Preview Image 節點的輸出
+COMFY_RESULT_MODE = os.environ.get('COMFY_RESULT_MODE', 'push')
+COMFY_OUTPUT_NODE = 'Preview Image'
+COMFY_WORKFLOW_FILE = 'flux_devTW_checkpoint_example.json'
+COMFY_MAX_IN_FLIGHT = 2  # 每台 ComfyUI 同時處理的繪圖工作上限
+DEFAULT_DRAWING_PROMPT = '隨手塗鴉'  # 繪圖時間到仍未提交提詞的玩家，由伺服器代為送出
+ART_CACHE_MAX_AGE = 365 * 24 * 3600  # 生成圖片以內容雜湊命名，內容永不改變
+ASSET_MAX_AGE = 365 * 24 * 3600  # 帶指紋的靜態檔案網址，內容改變時網址也會改變
+# 上傳圖片轉 JPEG 設定
+TRANSCODE_WORKERS = int(os.environ.get('TRANSCODE_WORKERS', 2))
+TRANSCODE_MAX_PENDING = int(os.environ.get('TRANSCODE_MAX_PENDING', 16))  # 超過即回覆 503
+# 轉檔工作池模式：auto（eventlet 下為 tpool，否則為執行緒池）、thread、tpool、process
+TRANSCODE_MODE = os.environ.get('TRANSCODE_MODE', 'auto')
+TRANSCODE_RETRY_AFTER = 2  # 秒
+JPEG_QUALITY = int(os.environ.get('JPEG_QUALITY', 75))
+JPEG_PROGRESSIVE = os.environ.get('JPEG_PROGRESSIVE', '0') == '1'
+JPEG_SUBSAMPLING = os.environ.get('JPEG_SUBSAMPLING')  # 例如 4:2:0，未設定為 PIL 預設
 
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
-logging.getLogger('socketio').setLevel(logging.DEBUG)
-logging.getLogger('engineio').setLevel(logging.DEBUG)
+
+
+def enable_socketio_debug_log():
+    """記錄每個 Socket.IO／engine.io 封包"""
+    logging.getLogger('socketio').setLevel(logging.DEBUG)
+    logging.getLogger('engineio').setLevel(logging.DEBUG)
+
+
+if SOCKETIO_DEBUG_LOG:
+    enable_socketio_debug_log()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -39,52 +97,270 @@ app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 1800
 socketio = SocketIO(
     app,
     cors_allowed_origins="*",
+    message_queue=SOCKETIO_MESSAGE_QUEUE,
+    async_mode=SOCKETIO_ASYNC_MODE,
+)
+# 協程模式下等待（房間鎖、背景排程）時讓出事件迴圈的 sleep；執行緒模式直接阻塞等待
+cooperative_sleep = None if socketio.async_mode == 'threading' else socketio.sleep
+# 遊戲管理器（同一房間的事件依序處理）
+game_manager = GameManager(create_room_store(ROOM_STORE_URL, sleep=cooperative_sleep),
+                           idle_timeout=ROOM_IDLE_TIMEOUT,
+                           empty_timeout=EMPTY_ROOM_TIMEOUT)
+# 房間分片
+shard_map = ShardMap(SHARD_COUNT, SHARD_ID)
+
+
+def send_player_statuses(room_id, statuses):
+    """廣播一批玩家狀態（玩家ID -> 狀態）"""
+    socketio.emit('player_status_batch', {'statuses': statuses}, room=room_id)
+
+
+# 玩家狀態更新在短時間窗內合併成一則訊息
+status_batcher = StatusBatcher(send_player_statuses, window=STATUS_BATCH_WINDOW,
+                               start_background_task=socketio.start_background_task,
+                               sleep=cooperative_sleep)
+
+
+def shard_redirect(room_id, event, data):
+    """房間不屬於本 worker 時，請客戶端改連到擁有房間的分片後重送事件
+
+    Returns:
+        是否已要求轉址
+    """
+    if shard_map.owns(room_id):
+        return False
+    shard = shard_map.owner(room_id)
+    logger.info(f'房間 {room_id} 位於分片 {shard}，要求客戶端轉址')
+    emit('shard_redirect', {'shard': shard, 'event': event, 'data': data})
+    return True
+
+
+def room_event(event):
+    """註冊 Socket.IO 事件，處理期間讀取的房間會被鎖定並在結束時寫回房間儲存"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            with game_manager.transaction():
+                return handler(*args, **kwargs)
+        return socketio.on(event)(wrapper)
+    return decorator
+
+
+# 上傳圖片轉檔工作池（不在請求處理中轉檔）
+image_transcoder = ImageTranscoder(
+    max_workers=TRANSCODE_WORKERS,
+    max_pending=TRANSCODE_MAX_PENDING,
+    quality=JPEG_QUALITY,
+    progressive=JPEG_PROGRESSIVE,
+    subsampling=JPEG_SUBSAMPLING,
+    mode=TRANSCODE_MODE,
+)
+
+logger.info(f'GameManager 初始化完成: {type(game_manager.store).__name__}')
+
+
+# 以下讀檔、建立資料夾、掃描資料夾、解析網址等較慢的資源都在第一次使用時才建立並快取，
+# 匯入本模組不讀寫檔案、不連線也不啟動執行緒，worker 啟動後由 create_app() 啟動背景工作
+
+
+@functools.lru_cache(maxsize=None)
+def get_image_store():
+    """生成圖片儲存（房間內只保留圖片ID；eventlet 下縮圖在 tpool 中編碼）"""
+    return ImageStore(UPLOAD_FOLDER, offload=run_off_hub)
+
+
+@functools.lru_cache(maxsize=None)
+def get_comfy_client():
+    """ComfyUI 客戶端，如果初始化失敗則使用模擬客戶端"""
+    try:
+        comfy_client = ComfyUIClient()
+        # 測試連接
+        # if not comfy_client.test_connection():
+        #     logger.warning("ComfyUI 服務不可用，將使用模擬客戶端")
+        #     comfy_client = MockComfyUIClient()
+        return comfy_client
+    except Exception as e:
+        logger.warning(f"ComfyUI 初始化失敗: {e}，使用模擬客戶端")
+        return MockComfyUIClient()
+
+
+@functools.lru_cache(maxsize=None)
+def get_workflow_template():
+    """繪圖工作流程範本（整個行程共用，避免每次提交都重新讀檔）"""
+    return WorkflowTemplate(COMFY_WORKFLOW_FILE)
+
+
+def comfy_api_urls():
+    """ComfyUI 後端網址列表"""
+    return [url.strip() for url in app.config['COMFY_API'].split(',') if url.strip()]
+
+
+@functools.lru_cache(maxsize=None)
+def get_comfy_pool():
+    """ComfyUI 後端池"""
+    return ComfyBackendPool(comfy_api_urls(), max_in_flight=COMFY_MAX_IN_FLIGHT)
+
+
+@functools.lru_cache(maxsize=None)
+def get_upload_allowed_addrs():
+    """允許回傳圖片到 /upload 的位址（需解析後端主機名稱）"""
+    return {'127.0.0.1'} | get_comfy_pool().callback_addresses()
+
+
+# pull 模式下寫入圖片、更新遊戲狀態的執行緒（下載本身在後端事件迴圈上進行）
+result_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='comfy-result')
+
+
+def dispatch_generation(job):
+    """將繪圖工作送到負載最低的 ComfyUI 後端，回傳 prompt_id"""
+    pull = COMFY_RESULT_MODE == 'pull'
+    try:
+        job.backend, prompt_id = get_comfy_pool().queue_prompt(job.workflow, use_events=pull)
+    except NoBackendAvailable as e:
+        raise DispatchDeferred(str(e))
+    if pull:
+        outputs = get_comfy_pool().fetch_outputs(
+            job.backend, prompt_id, job.workflow.get_node_id(COMFY_OUTPUT_NODE))
+        outputs.add_done_callback(
+            lambda future: result_executor.submit(store_generation_result, job, future))
+    return prompt_id
+
+
+def store_generation_result(job, outputs):
+    """pull 模式：將下載的圖片直接寫入儲存（不重新編碼）並完成繪圖"""
+    try:
+        image_store = get_image_store()
+        image_ids = [image_store.put(data, owner=job.room_id) for data in outputs.result()]
+        finish_drawing(job.room_id, job.player_id, job.round, image_ids)
+    except Exception as e:
+        logger.error(f'取得繪圖結果失敗: {job.key}: {e}')
+        generation_scheduler.complete(job.room_id, job.player_id, job.round)
+        notify_generation_error(job, e)
+
+
+def release_generation(job):
+    """繪圖工作完成或逾時，釋放後端名額"""
+    if job.backend:
+        get_comfy_pool().release(job.backend)
+
+
+def notify_queue_position(job, position):
+    """通知玩家繪圖排隊位置（排程器在其他房間的事件中呼叫，不鎖定房間）"""
+    room = game_manager.peek_room(job.room_id)
+    player = room.get_player(job.player_id) if room else None
+    if player:
+        socketio.emit('drawing_queue_update', {
+            'round': job.round,
+            'position': position
+        }, room=player.socket_id)
+
+
+def notify_generation_error(job, error):
+    """通知玩家繪圖失敗（排程器在其他房間的事件中呼叫，不鎖定房間）"""
+    notify_drawing_error(job.room_id, job.player_id)
+
+
+def notify_drawing_error(room_id, player_id):
+    """通知玩家繪圖失敗（不鎖定房間）"""
+    room = game_manager.peek_room(room_id)
+    player = room.get_player(player_id) if room else None
+    if player:
+        socketio.emit('drawing_error', {'message': '繪圖失敗：請重試'}, room=player.socket_id)
+
+
+# 繪圖工作排程器：房間之間輪流送出、限制同時送出數量
+generation_scheduler = GenerationScheduler(
+    dispatch_generation,
+    max_in_flight=COMFY_MAX_IN_FLIGHT * len(comfy_api_urls()),
+    on_position=notify_queue_position,
+    on_error=notify_generation_error,
+    on_release=release_generation,
 )
-# 遊戲管理器
-game_manager = GameManager()
 
-# 測試 GameManager 是否正常工作
-logger.info(f'GameManager 初始化完成: {game_manager}')
-logger.info(f'GameManager rooms 初始狀態: {game_manager.rooms}')
+# 階段截止時間排程器：所有房間共用一個執行緒
+phase_scheduler = PhaseScheduler(start_background_task=socketio.start_background_task,
+                                 sleep=cooperative_sleep)
+
+
+def schedule_phase_deadline(room, delay, on_timeout):
+    """設定房間目前步驟的截止時間
+
+    逾時時若房間仍停在同一步驟（階段、回合、展示中的玩家皆未改變），
+    在房間交易中呼叫 on_timeout(room) 強制推進；取代房間既有的截止時間。
+    """
+    room_id = room.id
+    step = (room.phase, room.current_round, room.now_showing)
+
+    def expire():
+        with game_manager.transaction():
+            current = game_manager.get_room(room_id)
+            if current and (current.phase, current.current_round, current.now_showing) == step:
+                logger.info(f'房間 {room_id} 階段逾時: {current.phase_name}')
+                on_timeout(current)
+
+    phase_scheduler.schedule(room_id, delay, expire)
+
 
+# 房間回收統計
+reclaim_stats = {'closed_rooms': 0, 'expired_rooms': 0, 'released_images': 0, 'released_bytes': 0}
+reclaim_stats_lock = threading.Lock()
+
+
+def release_images(room_id, image_ids):
+    """釋放房間對圖片的引用（沒有其他房間引用時刪除）並計入回收統計"""
+    image_store = get_image_store()
+    freed = sum(image_store.release(image_id, room_id) for image_id in image_ids)
+    with reclaim_stats_lock:
+        reclaim_stats['released_images'] += len(image_ids)
+        reclaim_stats['released_bytes'] += freed
+    return freed
+
+
+def release_room(room, expired=False):
+    """釋放已移除房間的繪圖工作、階段計時與圖片"""
+    generation_scheduler.cancel_room(room.id)
+    phase_scheduler.cancel(room.id)
+    status_batcher.discard(room.id)
+    freed = release_images(room.id, room.image_ids())
+    with reclaim_stats_lock:
+        reclaim_stats['expired_rooms' if expired else 'closed_rooms'] += 1
+    logger.info(f'房間已{"過期回收" if expired else "刪除"}: {room.id}，釋放圖片 {freed} bytes')
 
-# 初始化 ComfyUI 客戶端，如果失敗則使用模擬客戶端
-try:
-    comfy_client = ComfyUIClient()
-    # 測試連接
-    # if not comfy_client.test_connection():
-    #     logger.warning("ComfyUI 服務不可用，將使用模擬客戶端")
-    #     comfy_client = MockComfyUIClient()
-except Exception as e:
-    logger.warning(f"ComfyUI 初始化失敗: {e}，使用模擬客戶端")
-    comfy_client = MockComfyUIClient()
 
 # 遊戲主題和關鍵詞資料庫
 # 從 JSON 檔案讀取遊戲主題和關鍵詞資料庫
 GAME_TOPICS_FILE = 'key_word.json'
 STYLES_FILE = 'comfy_style.json'
 
-try:
-    with open(GAME_TOPICS_FILE, 'r', encoding='utf-8') as f:
-        GAME_TOPICS = json.load(f)
-    logger.info(f'成功載入遊戲主題和關鍵詞資料庫: {list(GAME_TOPICS.keys())}')
-except FileNotFoundError:
-    logger.error(f'找不到遊戲主題檔案: {GAME_TOPICS_FILE}')
-    GAME_TOPICS = {}
-except json.JSONDecodeError as e:
-    logger.error(f'解析遊戲主題檔案失敗: {e}')
-    GAME_TOPICS = {}
-
-try:
-    with open(STYLES_FILE, 'r', encoding='utf-8') as f:
-        STYLES = json.load(f)
-    logger.info(f'成功載入圖片風格資料庫: {[style["style_name"] for style in STYLES]}')
-except FileNotFoundError:
-    logger.error(f'找不到圖片風格檔案: {STYLES_FILE}')
-    STYLES = []
-except json.JSONDecodeError as e:
-    logger.error(f'解析圖片風格檔案失敗: {e}')
-    STYLES = []
+
+@functools.lru_cache(maxsize=None)
+def get_game_topics():
+    """遊戲主題和關鍵詞資料庫"""
+    try:
+        with open(GAME_TOPICS_FILE, 'r', encoding='utf-8') as f:
+            topics = json.load(f)
+        logger.info(f'成功載入遊戲主題和關鍵詞資料庫: {list(topics.keys())}')
+        return topics
+    except FileNotFoundError:
+        logger.error(f'找不到遊戲主題檔案: {GAME_TOPICS_FILE}')
+    except json.JSONDecodeError as e:
+        logger.error(f'解析遊戲主題檔案失敗: {e}')
+    return {}
+
+
+@functools.lru_cache(maxsize=None)
+def get_styles():
+    """圖片風格資料庫"""
+    try:
+        with open(STYLES_FILE, 'r', encoding='utf-8') as f:
+            styles = json.load(f)
+        logger.info(f'成功載入圖片風格資料庫: {[style["style_name"] for style in styles]}')
+        return styles
+    except FileNotFoundError:
+        logger.error(f'找不到圖片風格檔案: {STYLES_FILE}')
+    except json.JSONDecodeError as e:
+        logger.error(f'解析圖片風格檔案失敗: {e}')
+    return []
 
 
 AVATAR_FOLDER = './static/images/avatar'
@@ -105,51 +381,56 @@ def count_images_in_folder(folder_path):
         return 0
 
 
-# 計算 AVATAR_FOLDER 中的圖片檔案數量
-AVATAR_COUNT = count_images_in_folder(AVATAR_FOLDER)
+@functools.lru_cache(maxsize=None)
+def get_avatar_count():
+    """AVATAR_FOLDER 中的圖片檔案數量"""
+    return count_images_in_folder(AVATAR_FOLDER)
 
-PRELOAD_FILES = {}
 
+@functools.lru_cache(maxsize=None)
+def get_asset_manifest():
+    """靜態檔案清單（帶指紋的網址，前端依版本決定是否重新預載；需雜湊所有靜態檔案）"""
+    return AssetManifest(app.static_folder)
+
+
+app.jinja_env.globals['asset_url'] = lambda path: get_asset_manifest().url(path)
+# 渲染後的頁面（只依賴靜態檔案清單，每個行程渲染一次）：模板名稱 -> {壓縮格式: 內容}
+page_cache = {}
+
+
+def accepted_encodings():
+    """瀏覽器接受的 Content-Encoding"""
+    return {encoding for encoding, quality in request.accept_encodings if quality > 0}
 
-def preload_static_files():
-    """預加載 static 資料夾中的圖片和聲音檔案"""
-    images_folder = './static/images'
-    sounds_folder = './static/sounds'
-    preload_files = {'images': [], 'sounds': {}}
-    try:
-        # 預加載圖片檔案
-        for root, _, files in os.walk(images_folder):
-            for file in files:
-                if file.rsplit('.', 1)[-1].lower() in {'png', 'jpg', 'svg'}:
-                    # 強制轉成 "../static/..."
-                    relative_path = os.path.join(
-                        '../static', os.path.relpath(
-                            os.path.join(root, file), 'static')
-                    ).replace("\\", "/")
-                    preload_files['images'].append(relative_path)
-
-        logger.info(f'已預加載圖片檔案: {len(preload_files["images"])} 個')
-
-        # 預加載聲音檔案
-        for root, _, files in os.walk(sounds_folder):
-            for file in files:
-                if file.rsplit('.', 1)[-1].lower() == 'mp3':
-                    relative_path = os.path.join(
-                        '../static', os.path.relpath(
-                            os.path.join(root, file), 'static')
-                    ).replace("\\", "/")
-                    preload_files['sounds'][os.path.splitext(
-                        file)[0]] = relative_path
-
-        logger.info(f'已預加載聲音檔案: {len(preload_files["sounds"])} 個')
-        return preload_files
-    except Exception as e:
-        logger.error(f'預加載檔案時發生錯誤: {e}')
-        return {'images': {}, 'sounds': {}}
 
+def encoded_response(body, mimetype, encoding, etag):
+    """回傳（可能已壓縮的）內容，支援 If-None-Match"""
+    response = Response(body, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+    return response.make_conditional(request)
 
-# 預加載 static 資料夾中的檔案
-PRELOAD_FILES = preload_static_files()
+
+def render_page(template):
+    """回傳頁面，瀏覽器支援時壓縮；頁面本身不長期快取，每次以 ETag 驗證"""
+    variants = page_cache.get(template)
+    if variants is None:
+        variants = page_cache[template] = {None: render_template(template).encode('utf-8')}
+    accepted = accepted_encodings()
+    encoding = None
+    for candidate, _ in AssetManifest.ENCODINGS:
+        if candidate in accepted:
+            if candidate not in variants:
+                variants[candidate] = compress(variants[None], candidate)
+            if variants[candidate] is not None:
+                encoding = candidate
+                break
+    response = encoded_response(variants[encoding], 'text/html', encoding,
+                                f'{template}-{get_asset_manifest().version}')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 @app.route('/')
@@ -160,13 +441,35 @@ def root():
 @app.route('/playgame')
 def index():
     """遊戲主頁面"""
-    return render_template('index.html')
+    return render_page('index.html')
 
 
 @app.route('/credit')
 def credit():
     """音樂授權頁面"""
-    return render_template('MusicCredit.html')
+    return render_page('MusicCredit.html')
+
+
+@app.route('/assets/<digest>/<path:filename>')
+def get_asset(digest, filename):
+    """取得帶指紋的靜態檔案（網址隨內容改變，可永久快取）"""
+    asset_manifest = get_asset_manifest()
+    if not asset_manifest.is_current(digest, filename):
+        if filename not in asset_manifest.digests:
+            abort(404)
+        # 伺服器更新前載入的頁面仍使用舊指紋，轉到目前的版本
+        return redirect(asset_manifest.url(filename))
+    # 文字檔案依 Accept-Encoding 回傳壓縮版本，CSS 回傳改寫網址後的內容
+    encoding, body = asset_manifest.negotiate(filename, accepted_encodings())
+    if body is None:
+        response = send_from_directory(app.static_folder, filename, max_age=ASSET_MAX_AGE)
+        if asset_manifest.compressible(filename):
+            response.vary.add('Accept-Encoding')
+    else:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = encoded_response(body, mimetype, encoding, digest)
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
 
 
 def allowed_file(filename):
@@ -175,6 +478,41 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def _send_art(path, mimetype, etag):
+    """回傳圖片檔案（內容永不改變，可長期快取）"""
+    response = send_file(path, mimetype=mimetype, etag=etag, max_age=ART_CACHE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={ART_CACHE_MAX_AGE}, immutable'
+    return response
+
+
+@app.route('/art/<image_id>')
+def get_art(image_id):
+    """取得生成的繪圖原圖（以圖片ID作為 ETag，可長期快取）"""
+    image_store = get_image_store()
+    if not image_store.exists(image_id):
+        abort(404)
+    return _send_art(image_store.path(image_id), image_store.mimetype(image_id), image_id)
+
+
+@app.route('/art/<image_id>/<size>')
+def get_art_rendition(image_id, size):
+    """取得生成繪圖的縮圖，瀏覽器支援 WebP 時優先回傳 WebP"""
+    image_store = get_image_store()
+    if not image_store.exists(image_id) or size not in ImageStore.RENDITIONS:
+        abort(404)
+    accepts_webp = 'image/webp' in request.accept_mimetypes.values()
+    rendition = image_store.find_rendition(
+        image_id, size, ['webp', 'jpg'] if accepts_webp else ['jpg'])
+    if rendition is None:
+        # 舊圖片沒有縮圖時退回原圖
+        response = get_art(image_id)
+    else:
+        path, mimetype = rendition
+        response = _send_art(path, mimetype, os.path.basename(path))
+    response.headers['Vary'] = 'Accept'
+    return response
+
+
 @app.route('/debug/rooms')
 def debug_rooms():
     if request.remote_addr != '127.0.0.1':
@@ -223,6 +561,21 @@ def debug_rooms():
         })
 
 
+@app.route('/debug/reclaim')
+def debug_reclaim():
+    """調試：房間回收統計"""
+    if request.remote_addr != '127.0.0.1':
+        abort(404)
+    next_expiry = game_manager.next_expiry()
+    with reclaim_stats_lock:
+        stats = dict(reclaim_stats)
+    stats.update({
+        'tracked_rooms': game_manager.tracked_room_count(),
+        'next_expiry_in': None if next_expiry is None else max(0.0, next_expiry - time.time()),
+    })
+    return jsonify(stats)
+
+
 @app.before_request
 def reject_http_except():
     # 檢查是否為非 HTTPS 請求
@@ -230,12 +583,73 @@ def reject_http_except():
         abort(400)
 
 
+def finish_drawing(room_id, player_id, round_number, image_ids):
+    """記錄繪圖結果並通知房間（push 模式由 /upload、pull 模式由結果收集呼叫）"""
+    with game_manager.transaction():
+        _finish_drawing(room_id, player_id, round_number, image_ids)
+
+
+def _finish_drawing(room_id, player_id, round_number, image_ids):
+    room = game_manager.get_room(room_id)
+    player = room.get_player(player_id) if room else None
+    if not player:
+        raise ValueError('玩家不存在')
+    last_submitted_data = player.submitted_data[-1]
+    assert str(last_submitted_data.round) == str(
+        round_number), "提交的回合數與當前回合數不一致"
+    # ComfyUI 已完成這個工作，釋放排程名額（下一個工作在釋放房間鎖後才送出）
+    game_manager.after_commit(
+        lambda: generation_scheduler.complete(room_id, player_id, last_submitted_data.round))
+    if last_submitted_data.isDrawFinished:
+        # 已因逾時視為完成，忽略遲到的結果
+        logger.warning(f'忽略逾時後才完成的繪圖: room={room_id}, player={player_id}')
+        return
+    last_submitted_data.image_ids.extend(image_ids)
+    status_batcher.update(room_id, player_id, 'finished')
+    room.mark_drawing_finished(player_id, last_submitted_data.round)
+    allDrawFinish = room.check_all_drawing_finished(int(round_number))
+    if allDrawFinish:
+        status_batcher.flush(room_id)
+        socketio.emit('drawing_finished', {
+            'room_id': room_id,
+            'round': round_number,
+            'players': room.player_list()
+        }, room=room_id)
+        # 等待玩家接收繪圖，逾時未回報的玩家直接進入展示
+        schedule_phase_deadline(room, room.gameConfig.ART_RECEIVE_TIME_LIMIT, start_showing)
+
+
+def store_uploaded_images(room_id, player_id, round_number, transcoded):
+    """寫入轉檔完成的上傳圖片（在轉檔工作池的執行緒上執行）"""
+    image_ids = []
+    try:
+        results = transcoded.result()
+        # 寫入圖片儲存並記錄房間的引用，房間內只保留圖片ID
+        image_store = get_image_store()
+        image_ids = [image_store.put(data, owner=room_id) for data in results if data is not None]
+        logger.info(f'檔案上傳成功: {len(image_ids)} 個檔案已上傳')
+        if len(image_ids) < len(results):
+            raise ValueError(f'{len(results) - len(image_ids)} 個檔案轉檔失敗')
+    except Exception as e:
+        logger.error(f'上傳圖片處理失敗: room={room_id}, player={player_id}: {e}')
+        # 這次繪圖不會完成：釋放已寫入的圖片與排程名額並通知玩家
+        release_images(room_id, image_ids)
+        if round_number.isdigit():
+            generation_scheduler.complete(room_id, player_id, int(round_number))
+        notify_drawing_error(room_id, player_id)
+        return
+    try:
+        finish_drawing(room_id, player_id, round_number, image_ids)
+    except Exception as e:
+        logger.error(f'上傳圖片處理失敗: {e}')
+
+
 @app.route('/upload', methods=['POST'])
 def upload_images():
-    if request.remote_addr != '127.0.0.1':
+    if request.remote_addr not in get_upload_allowed_addrs():
         abort(404)
     try:
-        print(request.headers)
+        logger.debug('上傳請求標頭: %s', request.headers)  # 不記錄時不格式化
         # 檢查是否有檔案在請求中
         if 'files' not in request.files:
             return jsonify({
@@ -254,57 +668,28 @@ def upload_images():
         room_id = request.headers.get('room', 'no_room')
         player_id = request.headers.get('player', 'no_player')
         round_number = request.headers.get('round', 'no_round')
-        room = game_manager.get_room(room_id)
-
-        player = room.get_player(player_id)
-        if not player:
-            emit('error', {'message': '玩家不存在'})
-            return
-        last_submitted_data = player.submitted_data[-1]
-        assert str(last_submitted_data.round) == str(
-            round_number), "提交的回合數與當前回合數不一致"
-        fileNo = 0
-        for file in files:
-            if file.filename == '':
-                continue
-            try:
-                # 先將 PNG 轉為 JPG
-                ext = file.filename.rsplit('.', 1)[-1].lower()
-                img_bytes = file.read()
-                if ext == 'png':
-                    img = Image.open(io.BytesIO(img_bytes)).convert('RGB')
-                    buf = io.BytesIO()
-                    img.save(buf, format='JPEG')
-                    img_bytes = buf.getvalue()
-                file_data = base64.b64encode(img_bytes).decode('utf-8')
-                last_submitted_data.image_data.append(file_data)
-                fileNo += 1
-            except Exception as e:
-                logger.info(f'檔案上傳失敗: , 錯誤: {str(e)}')
-        logger.info(f'檔案上傳成功: {fileNo} 個檔案已上傳')
-        # 根據成功比例決定 HTTP 狀態碼
-        if fileNo < len(files):
+        if not shard_map.owns(room_id):
+            # 反向代理應依房間ID轉送到擁有房間的 worker
             return jsonify({
                 'success': False,
-                'message': '部分檔案未成功上傳'
-            }), 400
-        elif fileNo == len(files):
-            socketio.emit('player_status_update', {
-                'player_id': player_id,
-                'status': "finished"
-            }, room=room_id)
-            last_submitted_data.isDrawFinished = True
-            allDrawFinish = room.check_all_drawing_finished(int(round_number))
-            if allDrawFinish:
-                socketio.emit('drawing_finished', {
-                    'room_id': room_id,
-                    'round': round_number,
-                    'players': [p.to_dict() for p in room.players]
-                }, room=room_id)
+                'message': f'房間屬於分片 {shard_map.owner(room_id)}'
+            }), 421
+        images = [(file.filename, file.read()) for file in files if file.filename != '']
+        # 轉檔交給工作池，完成後再寫入圖片儲存並通知房間
+        try:
+            transcoded = image_transcoder.submit(images)
+        except TranscoderBusy as e:
+            logger.warning(f'上傳圖片轉檔忙碌中: {e}')
             return jsonify({
-                'success': True,
-                'message': '所有檔案上傳成功'
-            }), 200
+                'success': False,
+                'message': '伺服器忙碌中，請稍後重試'
+            }), 503, {'Retry-After': str(TRANSCODE_RETRY_AFTER)}
+        transcoded.add_done_callback(
+            lambda future: store_uploaded_images(room_id, player_id, round_number, future))
+        return jsonify({
+            'success': True,
+            'message': '檔案已接收，處理中'
+        }), 202
 
     except Exception as e:
         return jsonify({
@@ -321,20 +706,22 @@ def default_error_handler(e):
 
 
 @socketio.on('connect')
-def handle_connect():
-    """處理客戶端連接"""
+def handle_connect(auth=None):
+    """處理客戶端連接（客戶端回報已預載的靜態檔案版本，版本相同時不再送出清單）"""
     logger.info(f'客戶端已連接: {request.sid}')
 
     try:
+        client_version = auth.get('asset_version') if isinstance(auth, dict) else None
         emit('connected', {
             'message': '成功連接到伺服器',
-            'preload_files': PRELOAD_FILES
+            'assets': get_asset_manifest().handshake(client_version),
+            'shard': shard_map.shard_id
         })
     except Exception as e:
         logger.error(f'連接處理錯誤: {e}')
 
 
-@socketio.on('disconnect')
+@room_event('disconnect')
 def handle_disconnect():
     """處理玩家離線"""
     logger.info(f'客戶端已斷線: {request.sid}')
@@ -354,25 +741,26 @@ def handle_disconnect():
                     def delayed_remove():
                         try:
                             socketio.sleep(5)
-                            current_room = game_manager.get_room(room_id)
-                            if current_room:
-                                current_player = current_room.get_player(
-                                    player_id)
-                                if current_player and current_player.socket_id == sid:
-                                    current_room.remove_player(player_id)
-
-                                    logger.info(
-                                        f'玩家離開房間: {player_name} from {room_id}'
-                                    )
-
-                                    socketio.emit('player_left', {
-                                        'player_name': player_name,
-                                        'players': [p.to_dict() for p in current_room.players]
-                                    }, room=room_id)
-
-                                    if len(current_room.players) == 0:
-                                        game_manager.remove_room(room_id)
-                                        logger.info(f'房間已刪除: {room_id}')
+                            with game_manager.transaction():
+                                current_room = game_manager.get_room(room_id)
+                                if current_room:
+                                    current_player = current_room.get_player(
+                                        player_id)
+                                    if current_player and current_player.socket_id == sid:
+                                        current_room.remove_player(player_id)
+
+                                        logger.info(
+                                            f'玩家離開房間: {player_name} from {room_id}'
+                                        )
+
+                                        socketio.emit('player_left', {
+                                            'player_name': player_name,
+                                            'players': current_room.player_list()
+                                        }, room=room_id)
+
+                                        if len(current_room.players) == 0:
+                                            game_manager.remove_room(room_id)
+                                            release_room(current_room)
                         except Exception as e:
                             logger.error(f'延遲移除玩家錯誤: {e}')
 
@@ -382,7 +770,7 @@ def handle_disconnect():
         logger.error(f'處理斷線錯誤: {e}')
 
 
-@socketio.on('create_room')
+@room_event('create_room')
 def handle_create_room(data):
     """建立遊戲房間"""
     try:
@@ -399,7 +787,7 @@ def handle_create_room(data):
             return
 
         # 生成房間ID
-        room_id = str(uuid.uuid4())[:8].upper()
+        room_id = shard_map.new_room_id()
         logger.info(f'生成房間ID: {room_id}')
 
         # 建立玩家
@@ -412,10 +800,10 @@ def handle_create_room(data):
             f'建立房間物件: room_id={room.id}, player_count={len(room.players)}')
 
         # 添加房間到管理器
-        logger.info(f'添加房間前，管理器中的房間數: {len(game_manager.rooms)}')
+        logger.info(f'添加房間前，管理器中的房間數: {game_manager.get_room_count()}')
         game_manager.add_room(room)
-        logger.info(f'添加房間後，管理器中的房間數: {len(game_manager.rooms)}')
-        logger.info(f'管理器中的房間列表: {list(game_manager.rooms.keys())}')
+        logger.info(f'添加房間後，管理器中的房間數: {game_manager.get_room_count()}')
+        logger.info(f'管理器中的房間列表: {game_manager.store.room_ids()}')
 
         # 加入房間
         join_room(room_id)
@@ -436,7 +824,7 @@ def handle_create_room(data):
         emit('room_created', {
             'room_id': room_id,
             'player': player.to_dict(),
-            'avatar_count': AVATAR_COUNT
+            'avatar_count': get_avatar_count()
         })
 
     except Exception as e:
@@ -445,7 +833,7 @@ def handle_create_room(data):
              'message': f'建立房間失敗: {str(e)}'})
 
 
-@socketio.on('join_room')
+@room_event('join_room')
 def handle_join_room(data):
     """加入遊戲房間"""
     try:
@@ -453,7 +841,7 @@ def handle_join_room(data):
         player_name = escape(data.get('player_name', '').strip())
 
         logger.info(f'嘗試加入房間: room_id={room_id}, player_name={player_name}')
-        logger.info(f'當前所有房間: {list(game_manager.rooms.keys())}')
+        logger.info(f'當前所有房間: {game_manager.store.room_ids()}')
 
         # 驗證輸入
         if not room_id or len(room_id) != 8:
@@ -466,6 +854,9 @@ def handle_join_room(data):
                  'message': '玩家名稱長度需在1-10個字元之間'})
             return
 
+        if shard_redirect(room_id, 'join_room', data):
+            return
+
         room = game_manager.get_room(room_id)
         logger.info(f'找到房間: {room is not None}')
 
@@ -506,14 +897,14 @@ def handle_join_room(data):
         emit('join_room_success', {
             'room_id': room_id,
             'player': player.to_dict(),
-            'players': [p.to_dict() for p in room.players],
-            'avatar_count': AVATAR_COUNT
+            'players': room.player_list(),
+            'avatar_count': get_avatar_count()
         })
 
         # 再通知房間內所有玩家（包括新加入的）
         socketio.emit('player_joined', {
             'player': player.to_dict(),
-            'players': [p.to_dict() for p in room.players]
+            'players': room.player_list()
         }, room=room_id)
 
         logger.info(f'已通知房間內所有玩家新玩家加入')
@@ -523,13 +914,13 @@ def handle_join_room(data):
         emit('error', {'type': 'create_join_room', 'message': '加入房間失敗，請重試'})
 
 
-@socketio.on('ping')
+@room_event('ping')
 def handle_ping(data=None):
     """心跳檢測"""
     emit('pong')
 
 
-@socketio.on('rejoin_room')
+@room_event('rejoin_room')
 def handle_rejoin_room(data):
     """重新加入房間（用於頁面跳轉後重新連接）"""
     try:
@@ -542,6 +933,9 @@ def handle_rejoin_room(data):
             emit('error', {'message': '缺少房間或玩家資訊'})
             return
 
+        if shard_redirect(room_id, 'rejoin_room', data):
+            return
+
         room = game_manager.get_room(room_id)
         if not room:
             emit('error', {'message': '房間不存在或已關閉'})
@@ -553,7 +947,7 @@ def handle_rejoin_room(data):
             return
 
         # 更新玩家的 socket ID
-        player.socket_id = request.sid
+        room.set_player_socket(player, request.sid)
 
         # 重新加入房間
         join_room(room_id)
@@ -566,7 +960,7 @@ def handle_rejoin_room(data):
         emit('room_rejoined', {
             'room_id': room_id,
             'player': player.to_dict(),
-            'players': [p.to_dict() for p in room.players],
+            'players': room.player_list(),
             'phase': room.phase,
             'current_round': getattr(room, 'current_round', 1)
         })
@@ -592,7 +986,7 @@ def handle_rejoin_room(data):
         logger.error(f'重新加入房間錯誤: {e}', exc_info=True)
 
 
-@socketio.on('get_room_info')
+@room_event('get_room_info')
 def handle_get_room_info(data=None):
     """獲取房間資訊"""
     try:
@@ -609,7 +1003,7 @@ def handle_get_room_info(data=None):
         emit('room_info', {
             'room_id': room.id,
             'phase': room.phase,
-            'players': [p.to_dict() for p in room.players],
+            'players': room.player_list(),
             'current_round': room.current_round
         })
 
@@ -618,7 +1012,7 @@ def handle_get_room_info(data=None):
         emit('error', {'message': '獲取房間資訊失敗'})
 
 
-@socketio.on('leave_room')
+@room_event('leave_room')
 def handle_leave_room(data=None):
     """玩家離開房間"""
     try:
@@ -655,12 +1049,12 @@ def handle_leave_room(data=None):
                 socketio.emit('player_left', {
                     'player_name': player_name,
                     'player_id': player_id,
-                    'players': [p.to_dict() for p in current_room.players]
+                    'players': current_room.player_list()
                 }, room=room_id)
 
                 if len(current_room.players) == 0:
                     game_manager.remove_room(room_id)
-                    logger.info(f'房間已刪除: {room_id}')
+                    release_room(current_room)
 
                 # 清除 session
                 session.pop('room_id', None)
@@ -671,7 +1065,7 @@ def handle_leave_room(data=None):
         emit('error', {'message': '離開房間失敗'})
 
 
-@socketio.on('change_avatar')
+@room_event('change_avatar')
 def handle_change_avatar(data):
     """更換玩家頭像"""
     try:
@@ -683,7 +1077,7 @@ def handle_change_avatar(data):
             emit('error', {'message': '請先加入房間'})
             return
 
-        if not isinstance(avatar_id, int) or avatar_id < 0 or avatar_id > AVATAR_COUNT:
+        if not isinstance(avatar_id, int) or avatar_id < 0 or avatar_id > get_avatar_count():
             emit('error', {'message': '無效的頭像ID'})
             return
 
@@ -691,7 +1085,7 @@ def handle_change_avatar(data):
         if room:
             player = room.get_player(player_id)
             if player:
-                player.avatar_id = avatar_id
+                room.set_player_avatar(player, avatar_id)
                 logger.info(f'頭像更換: {player.name} -> {avatar_id}')
 
                 socketio.emit('avatar_changed', {
@@ -704,7 +1098,7 @@ def handle_change_avatar(data):
         emit('error', {'message': '更換頭像失敗'})
 
 
-@socketio.on('topic_vote_start')
+@room_event('topic_vote_start')
 def handle_start_game(data=None):
     """開始遊戲"""
     try:
@@ -726,19 +1120,22 @@ def handle_start_game(data=None):
             return
 
         # 隨機選擇主題和關鍵詞
-        if GAME_TOPICS:
-            topics = random.sample(list(GAME_TOPICS.keys()), 6)
+        if get_game_topics():
+            topics = random.sample(list(get_game_topics().keys()), 6)
         else:
             topics = ["default_topic"]
 
         room.topicCandidates = topics
         room.topicVoteCount = [0] * len(topics)
+        for game_player in room.players:
+            game_player.topic_voted = False
         # 發送遊戲訊息給所有玩家
         socketio.emit('start_voting_topic', {
             'room_id': room_id,
             'topics': topics,
-            'players': [p.to_dict() for p in room.players]
+            'players': room.player_list()
         }, room=room_id)
+        schedule_phase_deadline(room, room.wait_time['picking'], finish_topic_vote)
         # debug直接跳到投票階段
         # socketio.emit('start_voting_spy', {
         #     'room_id': room_id,
@@ -772,7 +1169,7 @@ def handle_start_game(data=None):
         emit('error', {'message': '開始遊戲失敗，請重試'})
 
 
-@socketio.on('topic_voted')
+@room_event('topic_voted')
 def handle_topic_voted(data=None):
     """處理主題投票"""
     try:
@@ -789,59 +1186,20 @@ def handle_topic_voted(data=None):
             return
 
         player = room.get_player(player_id)
+        if not player or room.phase_name != 'waiting' or not room.topicCandidates:
+            emit('error', {'message': '主題投票時間已結束'})
+            return
+        if player.topic_voted:
+            emit('error', {'message': '您已經投過票了'})
+            return
 
         voted_topic_no = data['selected_topic_no']
         room.topicVoteCount[voted_topic_no] += 1
         player.topic_voted = True
-        socketio.emit('player_status_update', {
-            'player_id': player_id,
-            'status': "finished"
-        }, room=room_id)
+        status_batcher.update(room_id, player_id, 'finished')
         # 檢查是否所有玩家都投票完成
         if all(p.topic_voted for p in room.players):
-            # 計算投票結果
-            max_votes = max(room.topicVoteCount)
-            selected_topic_index = room.topicVoteCount.index(max_votes)
-            selected_topic = room.topicCandidates[selected_topic_index]
-            room.topic = selected_topic
-            room.keyword = random.choice(
-                GAME_TOPICS[selected_topic]["keywords"])
-            logger.info(f'投票完成，選定主題: {selected_topic}, 關鍵詞: {room.keyword}')
-            # 開始遊戲
-            room.start_game(selected_topic, room.keyword)
-
-            logger.info(
-                f'遊戲開始: {room_id}, 主題: {selected_topic}, 關鍵詞: {room.keyword}, 玩家數: {len(room.players)}')
-
-            # 打包風格資料
-            styles_data = [
-                {
-                    'style_name': style.get('style_name'),
-                    'introduction': style.get('introduction'),
-                    'thumbnail': style.get('thumbnail')
-                }
-                for style in STYLES
-            ]
-            # 發送遊戲開始訊息給所有玩家
-            for game_player in room.players:
-                if game_player.is_spy:
-                    socketio.emit('game_started', {
-                        'topic': selected_topic,
-                        'keyword': '?',  # 間諜看不到關鍵詞
-                        'is_spy': True,
-                        'styles': styles_data,
-                        'round': 1
-                    }, room=game_player.socket_id)
-                    logger.info(f'間諜: {game_player.name}')
-                else:
-                    socketio.emit('game_started', {
-                        'topic': selected_topic,
-                        'keyword': room.keyword,
-                        'is_spy': False,
-                        'styles': styles_data,
-                        'round': 1
-                    }, room=game_player.socket_id)
-            room.phase += 2  # 跳過顯示階段
+            finish_topic_vote(room)
         # debug直接跳到投票階段
         # socketio.emit('start_voting_spy', {
         #     'room_id': room_id,
@@ -854,7 +1212,58 @@ def handle_topic_voted(data=None):
         emit('error', {'message': '開始遊戲失敗，請重試'})
 
 
-@socketio.on('submit_drawing_prompt')
+def finish_topic_vote(room):
+    """主題投票結束（全員投票或逾時），以目前票數選定主題並開始繪圖"""
+    status_batcher.flush(room.id)
+    # 計算投票結果
+    max_votes = max(room.topicVoteCount)
+    selected_topic_index = room.topicVoteCount.index(max_votes)
+    selected_topic = room.topicCandidates[selected_topic_index]
+    room.topic = selected_topic
+    room.keyword = random.choice(
+        get_game_topics()[selected_topic]["keywords"])
+    logger.info(f'投票完成，選定主題: {selected_topic}, 關鍵詞: {room.keyword}')
+    # 開始遊戲
+    room.start_game(selected_topic, room.keyword)
+
+    logger.info(
+        f'遊戲開始: {room.id}, 主題: {selected_topic}, 關鍵詞: {room.keyword}, 玩家數: {len(room.players)}')
+
+    # 打包風格資料
+    styles_data = [
+        {
+            'style_name': style.get('style_name'),
+            'introduction': style.get('introduction'),
+            'thumbnail': style.get('thumbnail')
+        }
+        for style in get_styles()
+    ]
+    # 發送遊戲開始訊息給所有玩家
+    for game_player in room.players:
+        if game_player.is_spy:
+            socketio.emit('game_started', {
+                'topic': selected_topic,
+                'keyword': '?',  # 間諜看不到關鍵詞
+                'is_spy': True,
+                'styles': styles_data,
+                'round': 1
+            }, room=game_player.socket_id)
+            logger.info(f'間諜: {game_player.name}')
+        else:
+            socketio.emit('game_started', {
+                'topic': selected_topic,
+                'keyword': room.keyword,
+                'is_spy': False,
+                'styles': styles_data,
+                'round': 1
+            }, room=game_player.socket_id)
+    room.phase += 2  # 跳過顯示階段
+    room.start_drawing_timer()
+    schedule_phase_deadline(room, room.wait_time['drawing'], expire_drawing)
+
+
+# 定期清理空房間和過期房間
+@room_event('submit_drawing_prompt')
 def handle_submit_drawing_prompt(data):
     """提交繪圖提詞"""
     try:
@@ -879,40 +1288,71 @@ def handle_submit_drawing_prompt(data):
             emit('error', {'message': '您已經提交過這輪的提詞了'})
             return
 
-        logger.info(f'開始繪圖: {player.name} (第{current_round}輪) - {prompt}')
+        submit_drawing(room, player, prompt, style_index)
+    except Exception as e:
+        logger.error(f'提交繪圖提詞錯誤: {e}')
+        emit('error', {'message': '提交失敗，請重試'})
 
-        # 通知開始繪圖
-        emit('drawing_started', {'message': 'AI 正在為您繪圖，請稍候...'})
-        socketio.emit('player_status_update', {
-            'player_id': player_id,
-            'status': "sended"
-        }, room=room_id)
 
-        player.submitted_data.append(SubmittedData(current_round, prompt))
+def submit_drawing(room, player, prompt, style_index):
+    """記錄玩家本回合的提詞並排入繪圖工作
 
-        # 使用 ComfyUI API 生成圖像
-        try:
-            api = ComfyApiWrapper(app.config['COMFY_API'])
-            wf = ComfyWorkflowWrapper("flux_devTW_checkpoint_example.json")
-            wf.set_node_param("Deep Translator Text Node",
-                              "text", prompt)
-            wf.set_node_param("style", "value",
-                              STYLES[style_index]['prompt'])
-            wf.set_node_param("player_id", "value", player_id)
-            wf.set_node_param("room_id", "value", room_id)
-            wf.set_node_param("round", "value", current_round)
-            wf.set_node_param("KSampler", "seed", secrets.randbelow(2**64))
-            results = api.queue_prompt(wf)
-            logger.info(f'繪圖結果: {results}')
-        except Exception as e:
-            logger.error(f'繪圖錯誤: {e}', exc_info=True)
-            emit('drawing_error', {'message': f'繪圖失敗：請重試'})
+    工作在房間交易結束、釋放房間鎖後才交給排程器，送到 ComfyUI 的請求不會阻塞同一房間的其他事件。
+    """
+    current_round = room.current_round
+    logger.info(f'開始繪圖: {player.name} (第{current_round}輪) - {prompt}')
+
+    # 通知開始繪圖
+    socketio.emit('drawing_started', {'message': 'AI 正在為您繪圖，請稍候...'},
+                  room=player.socket_id)
+    status_batcher.update(room.id, player.id, 'sended')
+
+    room.add_submission(player, SubmittedData(current_round, prompt))
+
+    # 使用 ComfyUI API 生成圖像
+    try:
+        wf = get_workflow_template().new_prompt()
+        wf.set_node_param("Deep Translator Text Node",
+                          "text", prompt)
+        wf.set_node_param("style", "value",
+                          get_styles()[style_index]['prompt'])
+        wf.set_node_param("player_id", "value", player.id)
+        wf.set_node_param("room_id", "value", room.id)
+        wf.set_node_param("round", "value", current_round)
+        wf.set_node_param("KSampler", "seed", secrets.randbelow(2**64))
+        if COMFY_RESULT_MODE == 'pull':
+            # 由伺服器自行取回結果，不需要 ComfyUI 回傳圖片
+            wf.remove_node("Image Send HTTP")
+        else:
+            wf.set_node_param("Image Send HTTP", "url", COMFY_CALLBACK_URL)
+        deadline = room.drawing_deadline or (
+            time.time() + room.gameConfig.DRAWING_TIME_LIMIT)
+        job = GenerationJob(room.id, player.id, current_round, wf, deadline)
     except Exception as e:
-        logger.error(f'提交繪圖提詞錯誤: {e}')
-        emit('error', {'message': '提交失敗，請重試'})
+        logger.error(f'繪圖錯誤: {e}', exc_info=True)
+        socketio.emit('drawing_error', {'message': f'繪圖失敗：請重試'}, room=player.socket_id)
+        return
+    game_manager.after_commit(lambda: generation_scheduler.submit(job))
+
+
+def expire_drawing(room):
+    """繪圖時間到：替尚未提交提詞的玩家代為送出，並限制等待繪圖完成的時間"""
+    for player in room.players:
+        if room.get_submission(player.id, room.current_round) is None:
+            submit_drawing(room, player, DEFAULT_DRAWING_PROMPT, random.randrange(len(get_styles())))
+    schedule_phase_deadline(room, generation_scheduler.job_timeout, expire_generation)
 
 
-@socketio.on('get_myArt')
+def expire_generation(room):
+    """繪圖遲遲未完成（例如生成失敗）：視為沒有圖片，讓遊戲繼續"""
+    for player in room.players:
+        submission = room.get_submission(player.id, room.current_round)
+        if submission is not None and not submission.isDrawFinished:
+            logger.warning(f'繪圖逾時: room={room.id}, player={player.name}')
+            _finish_drawing(room.id, player.id, room.current_round, [])
+
+
+@room_event('get_myArt')
 def handle_get_myArt(data):
     """獲取玩家的繪圖"""
     try:
@@ -937,7 +1377,7 @@ def handle_get_myArt(data):
         # 返回最新的繪圖資料
         emit('my_art', {
             'round': last_submit.round,
-            'image_data': last_submit.image_data,
+            'image_ids': last_submit.image_ids,
         })
 
     except Exception as e:
@@ -945,7 +1385,7 @@ def handle_get_myArt(data):
         emit('error', {'message': '獲取繪圖失敗，請重試'})
 
 
-@socketio.on('art_received')
+@room_event('art_received')
 def handle_art_received(data):
     """處理玩家接收繪圖"""
     try:
@@ -967,26 +1407,32 @@ def handle_art_received(data):
             return
 
         # 確認繪圖已經完成
-        player.submitted_data[-1].isReceived = True
+        room.mark_art_received(player_id, player.submitted_data[-1].round)
         all_received = room.check_all_art_received(room.current_round)
-        if all_received:
-            room.now_showing = 0
-            room.phase += 1
-            room.generate_show_art_order()
-            socketio.emit('start_showing', {
-                'room_id': room_id,
-                'round': room.current_round,
-                'show_art_order': room.show_art_order,
-                'now_showing': room.now_showing,
-                'show_time': room.gameConfig.SHOW_ART_TIME_LIMIT,
-                'players': [p.to_dict() for p in room.players]
-            }, room=room_id)
+        if all_received and room.phase_name == 'drawing':
+            start_showing(room)
     except Exception as e:
         logger.error(f'處理繪圖接收錯誤: {e}')
         emit('error', {'message': '處理繪圖接收失敗，請重試'})
 
 
-@socketio.on('selected_art')
+def start_showing(room):
+    """進入展示階段（全員接收繪圖或逾時），由第一位玩家開始選圖"""
+    room.now_showing = 0
+    room.phase += 1
+    room.generate_show_art_order()
+    socketio.emit('start_showing', {
+        'room_id': room.id,
+        'round': room.current_round,
+        'show_art_order': room.show_art_order,
+        'now_showing': room.now_showing,
+        'show_time': room.gameConfig.SHOW_ART_TIME_LIMIT,
+        'players': room.player_list()
+    }, room=room.id)
+    schedule_phase_deadline(room, room.gameConfig.SELECT_ART_TIME_LIMIT, expire_art_selection)
+
+
+@room_event('selected_art')
 def handle_selected_art(data):
     """處理玩家選擇繪圖"""
     try:
@@ -1008,47 +1454,51 @@ def handle_selected_art(data):
             emit('error', {'message': '玩家不存在'})
             return
 
-        # 記錄選擇
-        submit = player.submitted_data[-1]
-        player.submitted_data[-1].selectedImage = selected_art_no
-        logger.info(f'{player.name} 選擇了第 {selected_art_no} 張圖')
-
-        # 首次發送已選擇的繪圖
-        socketio.emit(
-            'art_selected',
-            {
-                'room_id': room_id,
-                'player_id': player_id,
-                'selected_art': submit.image_data[selected_art_no],
-                'show_time': room.gameConfig.SHOW_ART_TIME_LIMIT,
-                'players': [p.to_dict() for p in room.players]
-            },
-            room=room_id
-        )
+        if (room.phase_name != 'show_art'
+                or room.show_art_order[room.now_showing] != player_id):
+            emit('error', {'message': '選圖時間已結束'})
+            return
 
-        # 背景延遲任務：經過 show_time 秒後執行回調
-        socketio.start_background_task(
-            target=_delayed_next_turn,
-            room_id=room_id,
-            delay=room.gameConfig.SHOW_ART_TIME_LIMIT,
-        )
+        select_art(room, player, selected_art_no)
     except Exception as e:
         logger.error(f'處理選擇繪圖錯誤: {e}')
         emit('error', {'message': '處理選擇繪圖失敗，請重試'})
 
 
-def _delayed_next_turn(room_id, delay):
-    """背景任務：延遲後觸發下一個玩家選圖"""
-    socketio.sleep(delay)
-    call_next_player_selectArt(room_id)
+def select_art(room, player, selected_art_no):
+    """記錄玩家選擇的繪圖並展示，展示時間結束後輪到下一位玩家"""
+    submit = room.mark_art_selected(
+        player.id, player.submitted_data[-1].round, selected_art_no)
+    logger.info(f'{player.name} 選擇了第 {selected_art_no} 張圖')
 
+    # 首次發送已選擇的繪圖
+    socketio.emit(
+        'art_selected',
+        {
+            'room_id': room.id,
+            'player_id': player.id,
+            'selected_art': submit.image_ids[selected_art_no],
+            'show_time': room.gameConfig.SHOW_ART_TIME_LIMIT,
+            'players': room.player_list()
+        },
+        room=room.id
+    )
+    schedule_phase_deadline(room, room.gameConfig.SHOW_ART_TIME_LIMIT, call_next_player_selectArt)
+
+
+def expire_art_selection(room):
+    """選圖時間到：替展示中的玩家選第一張圖，沒有圖片時直接換下一位"""
+    player = room.get_player(room.show_art_order[room.now_showing])
+    submission = room.get_submission(player.id, room.current_round) if player else None
+    if submission is not None and submission.image_ids:
+        select_art(room, player, 0)
+    else:
+        call_next_player_selectArt(room)
 
-def call_next_player_selectArt(room_id):
+
+def call_next_player_selectArt(room):
     """通知下一位玩家選擇繪圖"""
-    room = game_manager.get_room(room_id)
-    if not room:
-        logger.error(f'房間 {room_id} 不存在，無法通知下一位玩家')
-        return
+    room_id = room.id
     if room.now_showing < len(room.show_art_order) - 1:
         room.now_showing += 1
         socketio.emit('start_showing', {
@@ -1057,12 +1507,15 @@ def call_next_player_selectArt(room_id):
             'show_art_order': room.show_art_order,
             'now_showing': room.now_showing,
             'show_time': room.gameConfig.SHOW_ART_TIME_LIMIT,
-            'players': [p.to_dict() for p in room.players]
+            'players': room.player_list()
         }, room=room_id)
+        schedule_phase_deadline(room, room.gameConfig.SELECT_ART_TIME_LIMIT, expire_art_selection)
     else:
         if room.phaseName[room.phase+1] == 'drawing':
             room.current_round += 1
             room.phase += 1
+            room.start_drawing_timer()
+            schedule_phase_deadline(room, room.wait_time['drawing'], expire_drawing)
             socketio.emit('write_drawing_prompt', {
                 'room_id': room_id,
                 'round': room.current_round,
@@ -1072,11 +1525,12 @@ def call_next_player_selectArt(room_id):
             socketio.emit('start_voting_spy', {
                 'room_id': room_id,
                 'round': room.current_round,
-                'players': [p.to_dict() for p in room.players]
+                'players': room.player_list()
             }, room=room_id)
+            schedule_phase_deadline(room, room.wait_time['voting'], finish_spy_vote)
 
 
-@socketio.on('submit_spy_vote')
+@room_event('submit_spy_vote')
 def handle_submit_vote(data):
     """提交投票"""
     try:
@@ -1089,6 +1543,10 @@ def handle_submit_vote(data):
             emit('error', {'message': '房間不存在'})
             return
 
+        if room.phase_name != 'voting':
+            emit('error', {'message': '投票時間已結束'})
+            return
+
         if player_id in room.votes:
             emit('error', {'message': '您已經投過票了'})
             return
@@ -1103,66 +1561,74 @@ def handle_submit_vote(data):
         voter = room.get_player(player_id)
         logger.info(f'投票: {voter.name} -> {voted_player.name}')
 
-        socketio.emit('player_status_update', {
-            'player_id': player_id,
-            'status': "finished"
-        }, room=room_id)
+        status_batcher.update(room_id, player_id, 'finished')
 
         # 檢查是否所有玩家都投票完成
         if len(room.votes) == len(room.players):
-            # 統計投票結果
-            vote_counts = {}
-            for voted_id in room.votes.values():
-                vote_counts[voted_id] = vote_counts.get(voted_id, 0) + 1
-
-            # 找出得票最多的玩家
-            most_voted_player_id = max(vote_counts, key=vote_counts.get)
-            most_voted_player = room.get_player(most_voted_player_id)
-
-            logger.info(
-                f'投票結果: {most_voted_player.name} 得票最多 ({vote_counts[most_voted_player_id]}票)')
-
-            real_spy = next(
-                (p for p in room.players if p.is_spy), room.players[0])
-            real_spy_id = real_spy.id
-            room.phase += 1
-            # 給間諜顯示猜測選項
-            correct_keyword = room.keyword
-            similar_options = [
-                kw for kw in GAME_TOPICS[room.topic]["keywords"] if kw != correct_keyword]
-            options = random.sample(similar_options, min(
-                15, len(similar_options)))  # 選取最多15個關鍵詞
-            options.append(correct_keyword)
-            random.shuffle(options)
-
-            # 檢查是否投中間諜
-            if most_voted_player_id == real_spy_id:
-                room.guess_spy_correct = True
-                logger.info(f'投中間諜: {most_voted_player.name}')
-            else:
-                room.guess_spy_correct = False
-                logger.info(f'沒投中間諜: {real_spy.name}')
-            # 將 key 和 value 對調，重複的 value 使用陣列存儲
-            inverted_votes = {}
-            for voter, voted in room.votes.items():
-                if voted not in inverted_votes:
-                    inverted_votes[voted] = []
-                inverted_votes[voted].append(voter)
-
-            socketio.emit('voting_spy_result', {
-                'most_voted_player': most_voted_player_id,
-                'spy_is': real_spy_id,
-                'guess_spy_correct': room.guess_spy_correct,
-                'vote_counts': vote_counts,
-                'vote_results': inverted_votes,  # 使用對調後的結果
-                'spy_options': options
-            }, room=room_id)
+            finish_spy_vote(room)
     except Exception as e:
         logger.error(f'投票錯誤: {e}')
         emit('error', {'message': '投票失敗，請重試'})
 
 
-@socketio.on('spy_guess')
+def finish_spy_vote(room):
+    """投票結束（全員投票或逾時），公布結果並讓間諜猜測關鍵詞"""
+    status_batcher.flush(room.id)
+    # 統計投票結果
+    vote_counts = {}
+    for voted_id in room.votes.values():
+        vote_counts[voted_id] = vote_counts.get(voted_id, 0) + 1
+
+    real_spy = next(
+        (p for p in room.players if p.is_spy), room.players[0])
+    real_spy_id = real_spy.id
+
+    # 找出得票最多的玩家（逾時且無人投票時視為沒投中）
+    most_voted_player_id = max(vote_counts, key=vote_counts.get) if vote_counts else None
+    most_voted_player = room.get_player(most_voted_player_id)
+    if most_voted_player:
+        logger.info(
+            f'投票結果: {most_voted_player.name} 得票最多 ({vote_counts[most_voted_player_id]}票)')
+
+    room.phase += 1
+    # 給間諜顯示猜測選項
+    correct_keyword = room.keyword
+    similar_options = [
+        kw for kw in get_game_topics()[room.topic]["keywords"] if kw != correct_keyword]
+    options = random.sample(similar_options, min(
+        15, len(similar_options)))  # 選取最多15個關鍵詞
+    options.append(correct_keyword)
+    random.shuffle(options)
+
+    # 檢查是否投中間諜
+    if most_voted_player_id == real_spy_id:
+        room.guess_spy_correct = True
+        logger.info(f'投中間諜: {most_voted_player.name}')
+    else:
+        room.guess_spy_correct = False
+        logger.info(f'沒投中間諜: {real_spy.name}')
+    # 將 key 和 value 對調，重複的 value 使用陣列存儲
+    inverted_votes = {}
+    for voter, voted in room.votes.items():
+        if voted not in inverted_votes:
+            inverted_votes[voted] = []
+        inverted_votes[voted].append(voter)
+
+    socketio.emit('voting_spy_result', {
+        'most_voted_player': most_voted_player_id,
+        'spy_is': real_spy_id,
+        'guess_spy_correct': room.guess_spy_correct,
+        'vote_counts': vote_counts,
+        'vote_results': inverted_votes,  # 使用對調後的結果
+        'spy_options': options
+    }, room=room.id)
+    # 猜測時間從前端顯示猜測介面後起算，逾時視為猜錯
+    schedule_phase_deadline(
+        room, room.gameConfig.VOTE_RESULT_ANIMATION_TIME + room.wait_time['spy_guess'],
+        lambda current: finish_spy_guess(current, ''))
+
+
+@room_event('spy_guess')
 def handle_spy_guess(data):
     """間諜猜測關鍵詞"""
     try:
@@ -1173,54 +1639,86 @@ def handle_spy_guess(data):
         room = game_manager.get_room(room_id)
 
         player = room.get_player(player_id)
+        if not player or room.phase_name != 'spy_guess':
+            emit('error', {'message': '猜測時間已結束'})
+            return
 
-        logger.info(
-            f'間諜猜測: {player.name} 猜測「{guessed_keyword}」(正確答案: 「{room.keyword}」)')
-        winType = None
-        # 檢查猜測結果
-        if guessed_keyword == room.keyword:
-            # 間諜獲勝
-            if room.guess_spy_correct:
-                winType = 'spyComeback'
-                logger.info(f'間諜逆轉勝: {player.name} 猜對了關鍵詞')
-            else:
-                winType = 'spyBigWin'
-                logger.info(f'間諜大獲全勝: {player.name} 猜對了關鍵詞')
-        else:
-            if room.guess_spy_correct:
-                # 平民獲勝
-                winType = 'commonVictory'
-                logger.info(f'平民獲勝: {player.name} 猜錯了關鍵詞')
-            else:
-                winType = 'spySmallWin'
-                logger.info(f'間諜小勝: {player.name} 但猜錯了關鍵詞')
-
-        # 打包每個玩家的繪圖資料
-        gallery_data = [
-            {
-                'player_name': p.name,
-                'gallery_data': [data.pack_for_gallery() for data in p.submitted_data]
-            }
-            for p in room.players
-        ]
-        logger.info(f'遊戲結束，打包畫廊資料')
-
-        # 發送畫廊資料給所有玩家
-        socketio.emit('game_ended', {
-            'winType': winType,
-            'correctAnswer': room.keyword,
-            'spyGuess': guessed_keyword,
-            'correct': guessed_keyword == room.keyword,
-            'gallery': gallery_data
-        }, room=room_id)
-        room.phase += 1
+        finish_spy_guess(room, guessed_keyword)
 
     except Exception as e:
         logger.error(f'猜測錯誤: {e}')
         emit('error', {'message': '猜測失敗，請重試'})
 
 
-@socketio.on('play_again')
+def finish_spy_guess(room, guessed_keyword):
+    """間諜猜測結束（送出猜測或逾時），公布勝負與畫廊"""
+    player = next((p for p in room.players if p.is_spy), room.players[0])
+    logger.info(
+        f'間諜猜測: {player.name} 猜測「{guessed_keyword}」(正確答案: 「{room.keyword}」)')
+    winType = None
+    # 檢查猜測結果
+    if guessed_keyword == room.keyword:
+        # 間諜獲勝
+        if room.guess_spy_correct:
+            winType = 'spyComeback'
+            logger.info(f'間諜逆轉勝: {player.name} 猜對了關鍵詞')
+        else:
+            winType = 'spyBigWin'
+            logger.info(f'間諜大獲全勝: {player.name} 猜對了關鍵詞')
+    else:
+        if room.guess_spy_correct:
+            # 平民獲勝
+            winType = 'commonVictory'
+            logger.info(f'平民獲勝: {player.name} 猜錯了關鍵詞')
+        else:
+            winType = 'spySmallWin'
+            logger.info(f'間諜小勝: {player.name} 但猜錯了關鍵詞')
+
+    # 打包每個玩家的繪圖資料，只廣播畫廊目錄，各頁由玩家另行索取
+    gallery_manifest = room.build_gallery()
+    logger.info(f'遊戲結束，打包畫廊資料')
+
+    # 發送畫廊目錄給所有玩家
+    socketio.emit('game_ended', {
+        'winType': winType,
+        'correctAnswer': room.keyword,
+        'spyGuess': guessed_keyword,
+        'correct': guessed_keyword == room.keyword,
+        'gallery': gallery_manifest
+    }, room=room.id)
+    room.phase += 1
+    phase_scheduler.cancel(room.id)
+
+
+@room_event('get_gallery_page')
+def handle_get_gallery_page(data):
+    """獲取畫廊單頁（單一玩家的所有繪圖）"""
+    try:
+        room_id = session.get('room_id')
+        player_id = session.get('player_id')
+
+        if not room_id or not player_id:
+            emit('error', {'message': '請先加入房間'})
+            return
+
+        room = game_manager.get_room(room_id)
+        if not room:
+            emit('error', {'message': '房間不存在'})
+            return
+
+        page = room.get_gallery_page(int(data.get('page', 0)))
+        if not page:
+            emit('error', {'message': '畫廊頁面不存在'})
+            return
+
+        emit('gallery_page', page)
+
+    except Exception as e:
+        logger.error(f'獲取畫廊頁面錯誤: {e}')
+        emit('error', {'message': '獲取畫廊失敗，請重試'})
+
+
+@room_event('play_again')
 def handle_play_again(data=None):
     """玩家準備再次遊玩"""
     try:
@@ -1247,11 +1745,12 @@ def handle_play_again(data=None):
         }, room=room_id)
 
         if player.is_host:
+            # 上一局的圖片留到房間回收時才釋放（其他玩家可能仍在瀏覽畫廊）
             room.reset_for_new_game()
 
             # 隨機選擇主題和關鍵詞
-            if GAME_TOPICS:
-                topics = random.sample(list(GAME_TOPICS.keys()), 6)
+            if get_game_topics():
+                topics = random.sample(list(get_game_topics().keys()), 6)
             else:
                 topics = ["default_topic"]
 
@@ -1261,49 +1760,85 @@ def handle_play_again(data=None):
             socketio.emit('start_voting_topic', {
                 'room_id': room_id,
                 'topics': topics,
-                'players': [p.to_dict() for p in room.players]
+                'players': room.player_list()
             }, room=room_id)
+            schedule_phase_deadline(room, room.wait_time['picking'], finish_topic_vote)
 
     except Exception as e:
         logger.error(f'玩家準備再次遊玩錯誤: {e}', exc_info=True)
 
 
-# 定期清理空房間和過期房間
-def cleanup_rooms():
-    """定期清理房間"""
+# 回收閒置房間（依到期索引，只在有房間到期時處理）
+def reap_rooms():
+    """回收閒置逾時的房間並釋放其圖片"""
     while True:
         try:
-            time.sleep(600)  # 每10分鐘清理一次
-            old_count = game_manager.get_room_count()
-            game_manager.cleanup_empty_rooms()
-            game_manager.cleanup_old_rooms(max_age_hours=4)  # 清理4小時以上的房間
-            new_count = game_manager.get_room_count()
-            if old_count != new_count:
-                logger.info(
-                    f'房間清理完成，清理了 {old_count - new_count} 個房間，當前房間數: {new_count}')
+            next_expiry = game_manager.next_expiry()
+            wait = ROOM_REAP_MAX_WAIT if next_expiry is None else next_expiry - time.time()
+            socketio.sleep(min(max(wait, 0.5), ROOM_REAP_MAX_WAIT))
+            for room in game_manager.expire_rooms():
+                release_room(room, expired=True)
+        except Exception as e:
+            logger.error(f'房間回收錯誤: {e}')
+
+
+# 定期更新繪圖排程（探測後端、逾時釋放名額、重試延後的工作、回報排隊位置）
+def refresh_generation_queue():
+    """定期更新繪圖排程"""
+    while True:
+        try:
+            socketio.sleep(2)
+            comfy_pool = get_comfy_pool()
+            comfy_pool.refresh()
+            generation_scheduler.tick(
+                lambda job: comfy_pool.queue_size_before(job.backend, job.prompt_id))
         except Exception as e:
-            logger.error(f'房間清理錯誤: {e}')
+            logger.error(f'繪圖排程更新錯誤: {e}')
+
+
+background_tasks_lock = threading.Lock()
+background_tasks_started = False
+
 
+def create_app():
+    """啟動背景工作並回傳 Flask 應用程式（重複呼叫不會重複啟動）
 
-# 啟動清理線程
-cleanup_thread = threading.Thread(target=cleanup_rooms, daemon=True)
-cleanup_thread.start()
+    匯入本模組不會啟動任何執行緒，部署時以本函式作為進入點，
+    例如 gunicorn 'app:create_app()'。
+    """
+    global background_tasks_started
+    with background_tasks_lock:
+        if not background_tasks_started:
+            # 建立圖片儲存目錄與 ComfyUI 後端池（匯入時不建立）
+            get_image_store()
+            get_comfy_pool()
+            # 啟動回收線程
+            socketio.start_background_task(reap_rooms)
+            phase_scheduler.start()
+            status_batcher.start()
+            socketio.start_background_task(refresh_generation_queue)
+            background_tasks_started = True
+    return app
 
 
 if __name__ == '__main__':
+    if os.environ.get('SOCKETIO_DEBUG_LOG', '1') == '1':
+        enable_socketio_debug_log()
     logger.info('伺服器啟動中...')
-    logger.info(f'ComfyUI 客戶端類型: {type(comfy_client).__name__}')
+    create_app()
+    logger.info(f'ComfyUI 客戶端類型: {type(get_comfy_client()).__name__}')
 
-    #  添加更好的啟動配置
+    # 開發用伺服器（debug 模式、自動重新載入）；正式環境請使用 gunicorn -c gunicorn.conf.py
+    # 或 python serve.py --workers N
     try:
         socketio.run(
             app,
-            debug=True,  # 在生產環境中關閉 debug
+            debug=True,
             host='0.0.0.0',
-            port=5566,
+            port=SERVER_PORT,
             log_output=True,
             allow_unsafe_werkzeug=True,
-            certfile='server.crt', keyfile='server.key'
+            certfile=TLS_CERTFILE, keyfile=TLS_KEYFILE
         )
     except Exception as e:
         logger.error(f'伺服器啟動失敗: {e}', exc_info=True)
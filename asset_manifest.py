@@ -0,0 +1,294 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # 未安裝時只提供 gzip（建置時產生的 .br 檔仍可使用）
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+def compress(data: bytes, encoding: str) -> Optional[bytes]:
+    """以指定的 Content-Encoding 壓縮內容，不支援時回傳 None"""
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+class AssetManifest:
+    """靜態檔案清單：以內容雜湊產生帶指紋的網址
+
+    啟動時掃描一次 static 資料夾，每個檔案的網址為 /assets/<內容雜湊>/<路徑>，
+    內容改變網址就改變，因此可設定為永久快取。清單版本為所有檔案雜湊的雜湊，
+    前端回報已預載的版本，版本相同時不需要重新預載。
+
+    CSS 中的 url() 會改寫為帶指紋的網址（有子集字型時另外加上子集的 @font-face），
+    文字檔案依瀏覽器的 Accept-Encoding 以 brotli 或 gzip 壓縮後回傳，
+    優先使用建置時預先壓縮的檔案，沒有時第一次請求壓縮一次並保留在記憶體中。
+
+    預載內容依遊戲階段分組（BUNDLES），前端先載入大廳需要的第一組即可開始，
+    其餘各組在空檔或進入該階段前載入。
+    """
+
+    DIGEST_LENGTH = 12
+    URL_PREFIX = '/assets'
+    # 前端預載的圖片
+    PRELOAD_IMAGE_EXTENSIONS = {'png', 'jpg', 'svg'}
+    # 依使用階段分組的預載內容，依序載入：第一組載完即可開始遊玩，其餘在空檔時載入
+    # images 為 images 下的資料夾（未列出的圖片歸入第一組），sounds 為音效名稱
+    BUNDLES = (
+        ('lobby', {
+            'images': (),
+            'sounds': ('main_menu', 'room_waiting', 'vote_topic', 'click', 'hover', 'pop',
+                       'error', 'correct', 'vinyl_stop', 'bell_multi', 'ready_play_again'),
+        }),
+        ('drawing', {
+            'images': ('styles',),
+            'sounds': ('artist_drawing', 'spy_drawing', 'evil_laugh', 'dot_printer', 'bell',
+                       'hmmm1', 'hmmm2', 'hmmm3', 'hmmm4', 'hmmm5', 'hmmm6', 'hmmm7', 'hmmm8'),
+        }),
+        ('show_art', {
+            'images': (),
+            'sounds': ('show_art1', 'show_art2'),
+        }),
+        ('voting', {
+            'images': (),
+            'sounds': ('vote_spy', 'voted_spy', 'vote_spy_correct', 'vote_spy_wrong',
+                       'drum_roll', 'gasp', 'spy_guess'),
+        }),
+        ('gallery', {
+            'images': (),
+            'sounds': ('game_end', 'party_blower', 'yay', 'cheer', 'gallery'),
+        }),
+    )
+    # asset_pipeline.py 的輸出（轉檔後的音樂與音效精靈），不存在時使用原始 mp3
+    AUDIO_BUILD_MANIFEST = 'build/sounds/audio.json'
+    # asset_pipeline.py 的字型子集清單：原字型路徑（不含副檔名）-> 子集檔案與 unicode-range
+    FONT_SUBSETS = 'build/fonts/fonts.json'
+    # asset_pipeline.py 預先壓縮的檔案（<路徑>.<內容雜湊>.<副檔名>），不列入清單
+    PRECOMPRESSED_DIR = 'build/precompressed'
+    # 傳輸時壓縮的文字檔案，其餘（圖片、音效、woff2）本身已壓縮
+    COMPRESSIBLE_EXTENSIONS = {'js', 'css', 'svg', 'json', 'html', 'txt', 'ico'}
+    # 支援的 Content-Encoding（依偏好排列）-> 預先壓縮檔的副檔名
+    ENCODINGS = (('br', 'br'), ('gzip', 'gz'))
+
+    _CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+    _FONT_FACE = re.compile(r'@font-face\s*\{[^}]*\}')
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: static 資料夾路徑
+        """
+        self.root = root
+        self.digests: Dict[str, str] = {}  # 相對路徑（以 / 分隔）-> 內容雜湊
+        for dirpath, _, files in os.walk(root):
+            for file in files:
+                path = os.path.join(dirpath, file)
+                relative_path = os.path.relpath(path, root).replace('\\', '/')
+                if relative_path.startswith(f'{self.PRECOMPRESSED_DIR}/'):
+                    continue
+                self.digests[relative_path] = self._digest(path)
+        self.font_subsets: Dict[str, Dict] = self._load_json(self.FONT_SUBSETS) or {}
+        # 改寫過的檔案內容（CSS），雜湊以改寫後的內容計算，引用的檔案改變時網址也會改變
+        self._contents: Dict[str, bytes] = {}
+        for path in [path for path in self.digests if path.endswith('.css')]:
+            self._contents[path] = self._rewrite_css(path)
+            self.digests[path] = hashlib.sha256(self._contents[path]).hexdigest()[:self.DIGEST_LENGTH]
+        self._compressed: Dict[Tuple[str, str], Optional[bytes]] = {}  # (路徑, 壓縮格式) -> 內容
+        self._compressed_lock = threading.Lock()
+        self.version = hashlib.sha256(
+            ''.join(f'{path}:{digest}\n' for path, digest in sorted(self.digests.items()))
+            .encode()).hexdigest()[:self.DIGEST_LENGTH]
+        self.audio_build = self._load_json(self.AUDIO_BUILD_MANIFEST)
+        logger.info(f'靜態檔案清單: {len(self.digests)} 個檔案，版本 {self.version}'
+                    f'{"（使用轉檔音效）" if self.audio_build else ""}')
+
+    def _load_json(self, path: str) -> Optional[Dict]:
+        """讀取建置工具的輸出清單，不存在或無法讀取時回傳 None（改用原始檔案）"""
+        if path not in self.digests:
+            return None
+        try:
+            with open(os.path.join(self.root, path), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f'無法讀取建置清單 {path}，改用原始檔案: {e}')
+            return None
+
+    def _resolve(self, base: str, reference: str) -> Optional[str]:
+        """CSS 中的相對路徑 -> 清單中的路徑，外部網址或不存在的檔案回傳 None"""
+        if reference.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return None
+        reference = reference.split('#', 1)[0].split('?', 1)[0]
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(base), reference))
+        return path if path in self.digests else None
+
+    def _add_font_subsets(self, path: str, css: str) -> str:
+        """為有子集字型的 @font-face 加上只含子集的版本
+
+        子集版本放在最後並設定 unicode-range，瀏覽器對範圍內的字優先使用子集，
+        只有出現範圍外的字（例如玩家輸入的罕用字）時才下載完整字型。
+        """
+        faces = []
+        for block in self._FONT_FACE.findall(css):
+            for match in self._CSS_URL.finditer(block):
+                target = self._resolve(path, match.group(2))
+                subset = target and self.font_subsets.get(os.path.splitext(target)[0])
+                if not subset or subset['file'] not in self.digests:
+                    continue
+                reference = posixpath.relpath(subset['file'], posixpath.dirname(path))
+                face = block.replace(match.group(0), f"url('{reference}')")
+                faces.append(f"{face[:-1].rstrip()}\n    unicode-range: {subset['unicode_range']};\n}}")
+                break
+        if not faces:
+            return css
+        return css.rstrip() + '\n\n' + '\n\n'.join(faces) + '\n'
+
+    def _rewrite_css(self, path: str) -> bytes:
+        """將 CSS 中引用的檔案改為帶指紋的網址"""
+        with open(os.path.join(self.root, path), encoding='utf-8') as f:
+            css = self._add_font_subsets(path, f.read())
+
+        def replace(match):
+            target = self._resolve(path, match.group(2))
+            return f"url('{self.url(target)}')" if target else match.group(0)
+
+        return self._CSS_URL.sub(replace, css).encode('utf-8')
+
+    @classmethod
+    def _digest(cls, path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        return sha.hexdigest()[:cls.DIGEST_LENGTH]
+
+    def url(self, path: str) -> str:
+        """取得檔案帶指紋的網址，不在清單中的檔案退回 /static/ 網址"""
+        digest = self.digests.get(path)
+        if digest is None:
+            return f'/static/{path}'
+        return f'{self.URL_PREFIX}/{digest}/{path}'
+
+    def is_current(self, digest: str, path: str) -> bool:
+        """網址中的指紋是否為檔案目前的內容"""
+        return self.digests.get(path) == digest
+
+    def content(self, path: str) -> Optional[bytes]:
+        """改寫過的檔案內容，未改寫時回傳 None（直接傳送原檔）"""
+        return self._contents.get(path)
+
+    def compressible(self, path: str) -> bool:
+        return path.rsplit('.', 1)[-1].lower() in self.COMPRESSIBLE_EXTENSIONS
+
+    def precompressed_path(self, path: str, extension: str) -> str:
+        """預先壓縮檔的相對路徑（含內容雜湊，原檔改變後舊的壓縮檔不會被使用）"""
+        return f'{self.PRECOMPRESSED_DIR}/{path}.{self.digests[path]}.{extension}'
+
+    def read(self, path: str) -> bytes:
+        """檔案傳送給瀏覽器的內容（未壓縮）"""
+        content = self._contents.get(path)
+        if content is None:
+            with open(os.path.join(self.root, path), 'rb') as f:
+                content = f.read()
+        return content
+
+    def _compressed_content(self, path: str, encoding: str, extension: str) -> Optional[bytes]:
+        key = (path, encoding)
+        with self._compressed_lock:
+            if key in self._compressed:
+                return self._compressed[key]
+        try:
+            with open(os.path.join(self.root, self.precompressed_path(path, extension)), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = compress(self.read(path), encoding)
+        with self._compressed_lock:
+            self._compressed[key] = data
+        return data
+
+    def negotiate(self, path: str, accepted: Iterable[str]) -> Tuple[Optional[str], Optional[bytes]]:
+        """依瀏覽器接受的壓縮格式選擇回傳內容
+
+        Args:
+            path: 清單中的檔案路徑
+            accepted: 瀏覽器接受的 Content-Encoding
+
+        Returns:
+            (壓縮格式, 內容)，不壓縮時壓縮格式為 None，內容為 None 表示直接傳送原檔
+        """
+        accepted = set(accepted)
+        if self.compressible(path):
+            for encoding, extension in self.ENCODINGS:
+                if encoding in accepted:
+                    data = self._compressed_content(path, encoding, extension)
+                    if data is not None:
+                        return encoding, data
+        return None, self.content(path)
+
+    def urls(self) -> Dict[str, str]:
+        """所有檔案的相對路徑 -> 帶指紋的網址"""
+        return {path: self.url(path) for path in self.digests}
+
+    def _bundle_images(self) -> Dict[str, List[str]]:
+        """各組預載的圖片網址"""
+        folders = {folder: name for name, bundle in self.BUNDLES for folder in bundle['images']}
+        images = {name: [] for name, _ in self.BUNDLES}
+        for path in sorted(self.digests):
+            parts = path.split('/')
+            if parts[0] != 'images' or parts[-1].rsplit('.', 1)[-1].lower() \
+                    not in self.PRELOAD_IMAGE_EXTENSIONS:
+                continue
+            folder = parts[1] if len(parts) > 2 else None
+            images[folders.get(folder, self.BUNDLES[0][0])].append(self.url(path))
+        return images
+
+    def _urls(self, paths: Dict[str, str]) -> Dict[str, str]:
+        return {fmt: self.url(path) for fmt, path in paths.items()}
+
+    def bundles(self) -> List[Dict]:
+        """依載入順序排列的預載分組
+
+        每組包含 images（網址清單）、sounds（音效名稱 -> 網址，或格式 -> 網址）
+        與 sprite（合併的短音效：各格式網址與每個音效的起點、長度，未建置時為 None）
+        """
+        images = self._bundle_images()
+        music = (self.audio_build or {}).get('music', {})
+        sprites = (self.audio_build or {}).get('sprites', {})
+        bundles = []
+        for name, bundle in self.BUNDLES:
+            sounds = {}
+            for sound in bundle['sounds']:
+                if sound in music:
+                    sounds[sound] = self._urls(music[sound])
+                elif self.audio_build is None and f'sounds/{sound}.mp3' in self.digests:
+                    sounds[sound] = self.url(f'sounds/{sound}.mp3')
+            sprite = sprites.get(name)
+            bundles.append({
+                'name': name,
+                'images': images[name],
+                'sounds': sounds,
+                'sprite': sprite and {'files': self._urls(sprite['files']),
+                                      'clips': sprite['clips']},
+            })
+        return bundles
+
+    def handshake(self, client_version: Optional[str]) -> Optional[Dict]:
+        """依前端回報的已預載版本決定要送出的清單，版本相同時回傳 None"""
+        if client_version == self.version:
+            return None
+        return {
+            'version': self.version,
+            'files': self.urls(),
+            'bundles': self.bundles(),
+        }
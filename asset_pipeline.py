@@ -0,0 +1,296 @@
+"""靜態檔案建置工具
+
+輸出到 static/build，由 AssetManifest 讀取；沒有執行本工具時伺服器直接使用原始檔案。
+
+- audio：將 static/sounds 的原始 mp3 轉成較小的格式（需要 ffmpeg 與 ffprobe）
+  - 背景音樂逐首轉成 Opus（webm）與 AAC（m4a）
+  - 每個預載分組（AssetManifest.BUNDLES）中的短音效合併成一個音效精靈，
+    音效之間插入短暫靜音，並記錄每個音效的起點與長度
+- fonts：將 static/ttf 的字型裁成頁面、腳本與題目用到的字，輸出 woff2 子集
+  （需要 fonttools 與 brotli 套件）；範圍外的字仍由完整字型顯示
+- compress：將文字檔案（JS、CSS、SVG 等）預先以 gzip 與 brotli 最高壓縮率壓縮
+  （brotli 需要 brotli 套件），應在其他步驟之後執行
+
+用法：
+    python asset_pipeline.py
+    python asset_pipeline.py --steps fonts compress
+    python asset_pipeline.py --static static --opus-bitrate 64k --aac-bitrate 96k
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Set, Tuple
+
+from asset_manifest import AssetManifest, compress
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger(__name__)
+
+# 以 HTMLAudioElement 串流播放的背景音樂，其餘音效合併為音效精靈
+MUSIC = {
+    'main_menu', 'room_waiting', 'vote_topic', 'artist_drawing', 'spy_drawing',
+    'show_art1', 'show_art2', 'vote_spy', 'spy_guess', 'game_end', 'gallery',
+}
+# 音效精靈中相鄰音效之間的靜音秒數（避免解碼誤差播到下一個音效）
+SPRITE_GAP = 0.25
+SAMPLE_RATE = 48000
+STEPS = ('audio', 'fonts', 'compress')
+FORMATS = {
+    # 格式 -> (副檔名, ffmpeg 編碼參數)
+    'opus': ('webm', ['-c:a', 'libopus']),
+    'aac': ('m4a', ['-c:a', 'aac', '-movflags', '+faststart']),
+}
+
+
+def run_ffmpeg(args: List[str]):
+    subprocess.run(['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y'] + args, check=True)
+
+
+def duration(path: str) -> float:
+    """音檔長度（秒）"""
+    output = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+         '-of', 'default=noprint_wrappers=1:nokey=1', path],
+        check=True, capture_output=True, text=True).stdout
+    return float(output.strip())
+
+
+def encode(source: str, target_base: str, bitrates: Dict[str, str]) -> Dict[str, str]:
+    """將音檔轉成所有輸出格式，回傳格式 -> 輸出路徑"""
+    outputs = {}
+    for fmt, (extension, codec) in FORMATS.items():
+        target = f'{target_base}.{extension}'
+        run_ffmpeg(['-i', source, '-vn', '-ar', str(SAMPLE_RATE)] + codec
+                   + ['-b:a', bitrates[fmt], target])
+        outputs[fmt] = target
+    return outputs
+
+
+def build_sprite(sources: List[Tuple[str, str]], target_base: str, work_dir: str,
+                 bitrates: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, List[float]]]:
+    """將多個短音效依序接成一個音檔
+
+    Args:
+        sources: [(音效名稱, 原始檔路徑)]
+        target_base: 輸出路徑（不含副檔名）
+
+    Returns:
+        (格式 -> 輸出路徑, 音效名稱 -> [起點秒數, 長度秒數])
+    """
+    clips = {}
+    parts = []
+    offset = 0.0
+    silence = os.path.join(work_dir, 'silence.wav')
+    run_ffmpeg(['-f', 'lavfi', '-i', f'anullsrc=r={SAMPLE_RATE}:cl=stereo',
+                '-t', str(SPRITE_GAP), silence])
+    for i, (name, source) in enumerate(sources):
+        # 先解碼成相同取樣率的 wav，接合時長度才精確
+        part = os.path.join(work_dir, f'{i:03d}.wav')
+        run_ffmpeg(['-i', source, '-ar', str(SAMPLE_RATE), '-ac', '2', part])
+        length = duration(part)
+        clips[name] = [round(offset, 3), round(length, 3)]
+        parts += [part, silence]
+        offset += length + SPRITE_GAP
+    concat_list = os.path.join(work_dir, 'concat.txt')
+    with open(concat_list, 'w', encoding='utf-8') as f:
+        f.writelines(f"file '{part}'\n" for part in parts)
+    joined = os.path.join(work_dir, 'sprite.wav')
+    run_ffmpeg(['-f', 'concat', '-safe', '0', '-i', concat_list, '-c', 'copy', joined])
+    return encode(joined, target_base, bitrates), clips
+
+
+def build_audio(static_root: str, bitrates: Dict[str, str]) -> Dict:
+    """建置所有音效並寫入 audio.json，回傳其內容"""
+    sounds_dir = os.path.join(static_root, 'sounds')
+    build_manifest = os.path.join(static_root, AssetManifest.AUDIO_BUILD_MANIFEST)
+    output_dir = os.path.dirname(build_manifest)
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    def relative(path: str) -> str:
+        return os.path.relpath(path, static_root).replace('\\', '/')
+
+    result = {'music': {}, 'sprites': {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for bundle_name, bundle in AssetManifest.BUNDLES:
+            effects = []
+            for name in bundle['sounds']:
+                source = os.path.join(sounds_dir, f'{name}.mp3')
+                if not os.path.exists(source):
+                    logger.warning(f'找不到音效 {source}，略過')
+                    continue
+                if name in MUSIC:
+                    outputs = encode(source, os.path.join(output_dir, name), bitrates)
+                    result['music'][name] = {fmt: relative(p) for fmt, p in outputs.items()}
+                else:
+                    effects.append((name, source))
+            if not effects:
+                continue
+            sprite_dir = os.path.join(work_dir, bundle_name)
+            os.makedirs(sprite_dir)
+            outputs, clips = build_sprite(effects, os.path.join(output_dir, f'sprite_{bundle_name}'),
+                                          sprite_dir, bitrates)
+            result['sprites'][bundle_name] = {
+                'files': {fmt: relative(p) for fmt, p in outputs.items()},
+                'clips': clips,
+            }
+            logger.info(f'音效精靈 {bundle_name}: {len(clips)} 個音效')
+
+    with open(build_manifest, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return result
+
+
+# 子集一律保留的字元：ASCII、全形標點與 CJK 標點
+BASE_CODEPOINTS = set(range(0x20, 0x7F)) | set(range(0x3000, 0x3040)) | set(range(0xFF00, 0xFFF0))
+# 收集用字的來源：頁面、腳本、樣式與題目
+TEXT_SOURCES = ('templates', 'static/js', 'static/css', 'key_word.json', 'comfy_style.json')
+TEXT_EXTENSIONS = ('.html', '.js', '.css', '.json')
+
+
+def collect_codepoints() -> Set[int]:
+    """收集介面與題目中出現的所有字元"""
+    codepoints = set(BASE_CODEPOINTS)
+    for source in TEXT_SOURCES:
+        path = os.path.join(ROOT, source)
+        files = [path] if os.path.isfile(path) else [
+            os.path.join(dirpath, file) for dirpath, _, names in os.walk(path)
+            for file in names if file.endswith(TEXT_EXTENSIONS)]
+        for file in files:
+            with open(file, encoding='utf-8') as f:
+                codepoints.update(ord(char) for char in f.read())
+    return codepoints
+
+
+def unicode_range(codepoints: Set[int]) -> str:
+    """將字元集合轉成 CSS unicode-range（連續的字元合併為區間）"""
+    ranges = []
+    for codepoint in sorted(codepoints):
+        if ranges and ranges[-1][1] == codepoint - 1:
+            ranges[-1][1] = codepoint
+        else:
+            ranges.append([codepoint, codepoint])
+    return ', '.join(f'U+{start:X}' if start == end else f'U+{start:X}-{end:X}'
+                     for start, end in ranges)
+
+
+def build_fonts(static_root: str) -> Dict:
+    """將每個 TTF 字型裁成用到的字，輸出 woff2 子集並寫入 fonts.json"""
+    try:
+        from fontTools import subset
+    except ImportError:
+        sys.exit('字型子集需要安裝 fonttools 與 brotli 套件: pip install fonttools brotli')
+    fonts_manifest = os.path.join(static_root, AssetManifest.FONT_SUBSETS)
+    output_dir = os.path.dirname(fonts_manifest)
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    codepoints = collect_codepoints()
+    result = {}
+    fonts_dir = os.path.join(static_root, 'ttf')
+    for file in sorted(os.listdir(fonts_dir)):
+        name, extension = os.path.splitext(file)
+        if extension.lower() != '.ttf':
+            continue
+        options = subset.Options()
+        options.flavor = 'woff2'
+        options.layout_features = ['*']
+        font = subset.load_font(os.path.join(fonts_dir, file), options)
+        # unicode-range 只列出字型本身有的字，其餘字交給完整字型或後備字型
+        available = codepoints & set(font.getBestCmap())
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=available)
+        subsetter.subset(font)
+        target = os.path.join(output_dir, f'{name}.subset.woff2')
+        subset.save_font(font, target, options)
+        result[f'ttf/{name}'] = {
+            'file': os.path.relpath(target, static_root).replace('\\', '/'),
+            'unicode_range': unicode_range(available),
+        }
+        logger.info(f'字型子集 {file}: {len(available)} 個字，'
+                    f'{os.path.getsize(target) / 1024:,.0f} KB')
+
+    with open(fonts_manifest, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return result
+
+
+def build_compressed(static_root: str) -> int:
+    """預先壓縮所有文字檔案（內容與伺服器回傳的相同，CSS 為改寫網址後的版本），回傳檔案數"""
+    output_dir = os.path.join(static_root, AssetManifest.PRECOMPRESSED_DIR)
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    encodings = []
+    for encoding, extension in AssetManifest.ENCODINGS:
+        if compress(b'', encoding) is None:
+            logger.warning(f'無法以 {encoding} 壓縮（未安裝 brotli 套件？），略過')
+        else:
+            encodings.append((encoding, extension))
+    manifest = AssetManifest(static_root)
+    count = 0
+    for path in sorted(manifest.digests):
+        if not manifest.compressible(path):
+            continue
+        data = manifest.read(path)
+        for encoding, extension in encodings:
+            compressed = compress(data, encoding)
+            target = os.path.join(static_root, manifest.precompressed_path(path, extension))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(compressed)
+            count += 1
+        logger.info(f'{path}: {len(data) / 1024:,.1f} KB')
+    return count
+
+
+def directory_size(path: str, extensions: Tuple[str, ...]) -> int:
+    return sum(os.path.getsize(os.path.join(dirpath, file))
+               for dirpath, _, files in os.walk(path)
+               for file in files if file.endswith(extensions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--static', default=os.path.join(ROOT, 'static'))
+    parser.add_argument('--steps', nargs='+', choices=STEPS, default=list(STEPS),
+                        help='要執行的步驟（依 audio、fonts、compress 的順序執行）')
+    parser.add_argument('--opus-bitrate', default='64k')
+    parser.add_argument('--aac-bitrate', default='96k')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if 'audio' in args.steps:
+        for tool in ('ffmpeg', 'ffprobe'):
+            if shutil.which(tool) is None:
+                sys.exit(f'找不到 {tool}，請先安裝 ffmpeg')
+        result = build_audio(args.static, {'opus': args.opus_bitrate, 'aac': args.aac_bitrate})
+        output_dir = os.path.dirname(os.path.join(args.static, AssetManifest.AUDIO_BUILD_MANIFEST))
+        original = directory_size(os.path.join(args.static, 'sounds'), ('.mp3',))
+        for fmt, (extension, _) in FORMATS.items():
+            size = directory_size(output_dir, (f'.{extension}',))
+            print(f'{fmt}: {size / 1024:,.0f} KB（原始 mp3 {original / 1024:,.0f} KB）')
+        sound_count = sum(len(bundle['sounds']) for _, bundle in AssetManifest.BUNDLES)
+        print(f'預載音效請求數: {len(result["music"]) + len(result["sprites"])}（原本 {sound_count}）')
+
+    if 'fonts' in args.steps:
+        build_fonts(args.static)
+        output_dir = os.path.dirname(os.path.join(args.static, AssetManifest.FONT_SUBSETS))
+        original = directory_size(os.path.join(args.static, 'ttf'), ('.woff2',))
+        size = directory_size(output_dir, ('.woff2',))
+        print(f'字型子集: {size / 1024:,.0f} KB（完整 woff2 {original / 1024:,.0f} KB）')
+
+    if 'compress' in args.steps:
+        count = build_compressed(args.static)
+        print(f'預先壓縮: {count} 個檔案')
+
+
+if __name__ == '__main__':
+    main()
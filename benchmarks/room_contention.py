@@ -0,0 +1,223 @@
+"""房間併發壓力測試
+
+以 Socket.IO 測試客戶端與 Flask 測試客戶端直接觸發真正的事件處理，多個執行緒同時對
+多個房間送出：
+- submit_drawing_prompt：排入繪圖工作（排程器會通知其他房間的排隊位置）
+- /upload：ComfyUI 回傳圖片，完成繪圖並送出下一個排隊中的工作
+- submit_spy_vote：間諜投票，全員投票後進入下一階段
+ComfyUI 以本機的假伺服器代替。檢查每個房間的「全員完成繪圖」與「進入下一階段」
+是否都恰好發生一次、沒有遺失投票，並回報處理時間最長的事件（等待房間鎖逾時的
+死結會在這裡出現）。加上 --unlocked 可對照沒有房間鎖時的結果。
+
+用法：
+    python benchmarks/room_contention.py --rooms 50 --players 8 --threads 32
+    python benchmarks/room_contention.py --unlocked
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class StubComfyHandler(BaseHTTPRequestHandler):
+    """假的 ComfyUI：接受所有提示，佇列永遠是空的"""
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.reply({'queue_running': [], 'queue_pending': []})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.reply({'prompt_id': str(uuid.uuid4())})
+
+
+def start_stub_comfy() -> str:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubComfyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}/'
+
+
+def load_app(args):
+    """設定環境變數後才匯入 app（執行緒模式、假的 ComfyUI、暫存的圖片目錄）"""
+    os.environ.update({
+        'COMFY_API': start_stub_comfy(),
+        'SOCKETIO_ASYNC_MODE': 'threading',
+        'SOCKETIO_DEBUG_LOG': '0',
+        'UPLOAD_FOLDER': tempfile.mkdtemp(prefix='room-contention-'),
+        'TRANSCODE_MAX_PENDING': str(args.rooms * args.players),  # 不測試轉檔佇列滿載
+    })
+    os.chdir(ROOT)
+    import app
+    logging.disable(logging.CRITICAL)  # 事件處理的日誌不列入量測
+    if args.unlocked:
+        app.game_manager.store.lock = lambda room_id: nullcontext()
+    return app
+
+
+def make_png() -> bytes:
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 64), 'red').save(buf, format='PNG')
+    return buf.getvalue()
+
+
+class Timed:
+    """記錄每個事件的處理時間"""
+
+    def __init__(self):
+        self.durations = []
+        self._lock = threading.Lock()
+
+    def __call__(self, fn, *args):
+        start = time.perf_counter()
+        fn(*args)
+        with self._lock:
+            self.durations.append(time.perf_counter() - start)
+
+
+def setup(app, args):
+    """以真正的事件建立房間與加入玩家，再把房間直接設為繪圖階段"""
+    rooms = []
+    for r in range(args.rooms):
+        clients = []
+        for i in range(args.players):
+            http = app.app.test_client()
+            client = app.socketio.test_client(app.app, flask_test_client=http)
+            if i == 0:
+                client.emit('create_room', {'player_name': f'host{r}'})
+                created = [e for e in client.get_received() if e['name'] == 'room_created']
+                room_id = created[0]['args'][0]['room_id']
+            else:
+                client.emit('join_room', {'room_id': room_id, 'player_name': f'p{i}'})
+            clients.append((client, http))
+        with app.game_manager.transaction():
+            room = app.game_manager.get_room(room_id)
+            room.phase = room.phaseName.index('drawing')
+            room.current_round = 1
+            player_ids = [player.id for player in room.players]
+        for client, _ in clients:
+            client.get_received()
+        rooms.append((room_id, list(zip(player_ids, clients))))
+    return rooms
+
+
+def upload(http, room_id, player_id, png):
+    response = http.post('/upload', base_url='https://localhost',
+                         data={'files': (io.BytesIO(png), 'art.png')},
+                         headers={'room': room_id, 'player': player_id, 'round': '1'})
+    assert response.status_code == 202, response.status_code
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def run(app, args) -> dict:
+    rooms = setup(app, args)
+    png = make_png()
+    timed = Timed()
+    start = time.perf_counter()
+
+    def drawing_done():
+        return all(app.game_manager.peek_room(room_id).check_all_drawing_finished(1)
+                   for room_id, _ in rooms)
+
+    with ThreadPoolExecutor(args.threads) as pool:
+        # 所有房間的玩家同時送出提詞，ComfyUI 一回傳就上傳結果
+        futures = [pool.submit(timed, client.emit, 'submit_drawing_prompt',
+                               {'prompt': '貓', 'selected_style': 0})
+                   for _, players in rooms for _, (client, _) in players]
+        futures += [pool.submit(timed, upload, http, room_id, player_id, png)
+                    for room_id, players in rooms for player_id, (_, http) in players]
+        for future in futures:
+            future.result()
+        drawn = wait_for(drawing_done, args.timeout)
+
+        with app.game_manager.transaction():
+            for room_id, _ in rooms:
+                room = app.game_manager.get_room(room_id)
+                room.phase = room.phaseName.index('voting')
+        votes = [pool.submit(timed, client.emit, 'submit_spy_vote',
+                             {'voted_player_id': players[0][0]})
+                 for _, players in rooms for _, (client, _) in players]
+        for future in votes:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    finished_events = advances = lost_votes = 0
+    for room_id, players in rooms:
+        host = players[0][1][0]
+        finished_events += sum(1 for e in host.get_received() if e['name'] == 'drawing_finished')
+        room = app.game_manager.peek_room(room_id)
+        advances += room.phase_name == 'spy_guess'
+        lost_votes += len(players) - len(room.votes)
+    timed.durations.sort()
+    return {
+        'elapsed': elapsed,
+        'events': len(futures) + len(votes),
+        'drawn': drawn,
+        'finished_events': finished_events,
+        'advances': advances,
+        'lost_votes': lost_votes,
+        'p50': timed.durations[len(timed.durations) // 2],
+        'max': timed.durations[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=50)
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--timeout', type=float, default=60, help='等待所有繪圖完成的秒數上限')
+    parser.add_argument('--unlocked', action='store_true', help='不使用房間鎖（對照組）')
+    args = parser.parse_args()
+
+    app = load_app(args)
+    sys.stdout, stdout = open(os.devnull, 'w'), sys.stdout  # Room 的進度訊息不列入量測
+    result = run(app, args)
+    sys.stdout = stdout
+
+    print(f'{"無鎖" if args.unlocked else "房間鎖"}：{args.rooms} 個房間 × {args.players} 位玩家，'
+          f'{result["events"]:,} 個事件，{result["elapsed"]:.2f} 秒'
+          f'（{result["events"] / result["elapsed"]:,.0f} 事件/秒）')
+    print(f'  單一事件處理時間 中位數 {result["p50"] * 1000:.1f} ms、最長 {result["max"] * 1000:.1f} ms')
+    print(f'  全員完成繪圖廣播 {result["finished_events"]} 次（應為 {args.rooms}）')
+    print(f'  進入下一階段 {result["advances"]} 次（應為 {args.rooms}）')
+    print(f'  遺失投票 {result["lost_votes"]} 票（應為 0）')
+    ok = (result['drawn'] and result['finished_events'] == args.rooms
+          and result['advances'] == args.rooms and result['lost_votes'] == 0)
+    print('  結果：' + ('正確' if ok else '發生競爭或逾時'))
+    sys.exit(0 if ok or args.unlocked else 1)
+
+
+if __name__ == '__main__':
+    main()
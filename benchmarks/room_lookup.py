@@ -0,0 +1,127 @@
+"""房間玩家查詢效能測試
+
+以 Socket.IO 測試客戶端直接觸發真正的事件處理，高頻率操作滿員房間：
+投票（handle_submit_vote 每次依玩家ID查詢多次）、查詢房間資訊、更換頭像，
+並穿插重新連線（以新的 socket ID rejoin_room）與玩家離開後由新玩家加入，
+量測每秒可處理的事件數。
+
+用法：
+    python benchmarks/room_lookup.py --events 20000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def load_app():
+    """設定環境變數後才匯入 app（執行緒模式、暫存的圖片目錄）"""
+    os.environ.update({
+        'SOCKETIO_ASYNC_MODE': 'threading',
+        'SOCKETIO_DEBUG_LOG': '0',
+        'UPLOAD_FOLDER': tempfile.mkdtemp(prefix='room-lookup-'),
+    })
+    os.chdir(ROOT)
+    import app
+    logging.disable(logging.CRITICAL)  # 事件處理的日誌不列入量測
+    return app
+
+
+def connect(app):
+    return app.socketio.test_client(app.app, flask_test_client=app.app.test_client())
+
+
+def received(client, name):
+    return [e['args'][0] for e in client.get_received() if e['name'] == name]
+
+
+def set_phase(app, room_id, phase_name):
+    with app.game_manager.transaction():
+        room = app.game_manager.get_room(room_id)
+        room.phase = room.phaseName.index(phase_name)
+
+
+def build_room(app, player_count):
+    """以真正的事件建立房間與加入玩家，回傳房間ID與 [(玩家ID, 客戶端)]"""
+    host = connect(app)
+    host.emit('create_room', {'player_name': 'host'})
+    created = received(host, 'room_created')[0]
+    room_id = created['room_id']
+    players = [(created['player']['id'], host)]
+    for i in range(1, player_count):
+        players.append(join(app, room_id, f'p{i}'))
+    return room_id, players
+
+
+def join(app, room_id, name):
+    client = connect(app)
+    client.emit('join_room', {'room_id': room_id, 'player_name': name})
+    return received(client, 'join_room_success')[0]['player']['id'], client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = load_app()
+    sys.stdout, stdout = open(os.devnull, 'w'), sys.stdout  # Room 的進度訊息不列入量測
+    rng = random.Random(args.seed)
+    room_id, players = build_room(app, args.players)
+    set_phase(app, room_id, 'voting')
+    counts = {'vote': 0, 'info': 0, 'avatar': 0, 'rejoin': 0, 'replace': 0}
+    start = time.perf_counter()
+    for n in range(args.events):
+        index = rng.randrange(len(players))
+        player_id, client = players[index]
+        kind = n % 100
+        if kind == 0:
+            # 重新連線：以新的 socket ID 重新加入
+            client.disconnect()
+            client = connect(app)
+            client.emit('rejoin_room', {'room_id': room_id, 'player_id': player_id})
+            players[index] = (player_id, client)
+            counts['rejoin'] += 1
+        elif kind == 1 and index > 0:
+            # 玩家離開後由新玩家補上（加入只在等待階段允許）
+            client.emit('leave_room')
+            client.disconnect()
+            set_phase(app, room_id, 'waiting')
+            players[index] = join(app, room_id, f'n{n}')
+            set_phase(app, room_id, 'voting')
+            counts['replace'] += 1
+        elif kind % 2:
+            room = app.game_manager.peek_room(room_id)
+            if player_id in room.votes or len(room.votes) == len(room.players) - 1:
+                # 不讓投票結束，持續停在投票階段
+                with app.game_manager.transaction():
+                    app.game_manager.get_room(room_id).votes = {}
+            client.emit('submit_spy_vote', {'voted_player_id': players[rng.randrange(len(players))][0]})
+            counts['vote'] += 1
+        elif kind % 4:
+            client.emit('get_room_info')
+            counts['info'] += 1
+        else:
+            client.emit('change_avatar', {'avatar_id': 0})
+            counts['avatar'] += 1
+        if n % 64 == 0:
+            for _, other in players:
+                other.get_received()
+    elapsed = time.perf_counter() - start
+    sys.stdout = stdout
+
+    print(f'{args.events} 個事件（{args.players} 位玩家：投票 {counts["vote"]}、查詢 {counts["info"]}、'
+          f'換頭像 {counts["avatar"]}、重新連線 {counts["rejoin"]}、換人 {counts["replace"]}）'
+          f'耗時 {elapsed:.3f}s，{args.events / elapsed:,.0f} 事件/秒')
+
+
+if __name__ == '__main__':
+    main()
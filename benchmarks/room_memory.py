@@ -0,0 +1,52 @@
+"""閒置大廳記憶體測試
+
+建立大量只有房主的等待中房間，以 tracemalloc 量測每個房間佔用的位元組數。
+先建立一批暖身房間再開始計算，GameManager 本身與第一次建立房間時的延遲初始化
+（模組快取、房間儲存等）等固定成本不會被平均到每個房間。
+
+用法：
+    python benchmarks/room_memory.py --rooms 1000 10000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from game_logic import GameManager, Player, Room  # noqa: E402
+
+
+WARMUP_ROOMS = 100
+
+
+def add_rooms(manager: GameManager, start: int, count: int):
+    for i in range(start, start + count):
+        host = Player(f'sid-{i}', f'host{i}', is_host=True)
+        manager.add_room(Room(f'{i:06d}', host))
+
+
+def measure(room_count: int) -> float:
+    """回傳每個閒置房間（含房主）的平均位元組數（不含固定成本）"""
+    gc.collect()
+    tracemalloc.start()
+    manager = GameManager()
+    add_rooms(manager, 0, WARMUP_ROOMS)
+    before = tracemalloc.get_traced_memory()[0]
+    add_rooms(manager, WARMUP_ROOMS, room_count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del manager
+    return (after - before) / room_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, nargs='+', default=[1000, 10000])
+    args = parser.parse_args()
+    for room_count in args.rooms:
+        print(f'{room_count:>6} 個閒置房間：每房 {measure(room_count):,.0f} bytes')
+
+
+if __name__ == '__main__':
+    main()
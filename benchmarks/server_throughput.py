@@ -0,0 +1,141 @@
+"""伺服器吞吐量比較
+
+依序以各種模式啟動伺服器，多個連線（keep-alive）在固定時間內反覆送出
+遊戲主頁面、帶指紋的靜態檔案與 Socket.IO 長輪詢握手請求，比較每秒請求數與延遲：
+- dev：目前的 python app.py（Werkzeug／debug 模式）
+- eventlet、gthread：gunicorn -c gunicorn.conf.py
+
+需要 TLS 憑證（預設 server.crt / server.key，與伺服器相同）。
+
+用法：
+    python benchmarks/server_throughput.py --modes dev eventlet gthread --clients 32 --seconds 10
+"""
+import argparse
+import gzip
+import http.client
+import os
+import re
+import signal
+import ssl
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('dev', 'eventlet', 'gthread')
+
+
+def start_server(mode: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port))
+    if mode == 'dev':
+        command = [sys.executable, 'app.py']
+    else:
+        env['SERVER_WORKER_CLASS'] = mode
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py']
+    # 獨立的行程群組，結束時連同 debug 模式的重新載入子行程一起停止
+    return subprocess.Popen(command, cwd=ROOT, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_server(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def connect(port: int) -> http.client.HTTPSConnection:
+    return http.client.HTTPSConnection('127.0.0.1', port, timeout=30,
+                                       context=ssl._create_unverified_context())
+
+
+def get(connection, path: str) -> bytes:
+    connection.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+    response = connection.getresponse()
+    body = response.read()
+    if response.status != 200:
+        raise RuntimeError(f'{path}: HTTP {response.status}')
+    return body
+
+
+def wait_ready(port: int, timeout: float = 60) -> str:
+    """等待伺服器可以回應，回傳頁面中第一個帶指紋的 JS 網址"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            page = get(connect(port), '/playgame')
+            break
+        except (OSError, RuntimeError, http.client.HTTPException):
+            if time.monotonic() > deadline:
+                raise RuntimeError('伺服器啟動逾時')
+            time.sleep(0.5)
+    # 頁面可能以 gzip 壓縮
+    if page[:2] == b'\x1f\x8b':
+        page = gzip.decompress(page)
+    match = re.search(rb'/assets/[0-9a-f]+/js/[\w.-]+\.js', page)
+    return match.group(0).decode() if match else '/static/js/utils.js'
+
+
+def client(port: int, paths, deadline: float, latencies: list, errors: list):
+    connection = connect(port)
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            get(connection, path)
+            latencies.append(time.perf_counter() - start)
+        except (OSError, RuntimeError, http.client.HTTPException):
+            errors.append(path)
+            connection.close()
+            connection = connect(port)
+
+
+def run(mode: str, args) -> dict:
+    process = start_server(mode, args.port)
+    try:
+        asset = wait_ready(args.port)
+        paths = ['/playgame', asset, '/socket.io/?EIO=4&transport=polling']
+        latencies, errors = [], []
+        deadline = time.monotonic() + args.seconds
+        threads = [threading.Thread(target=client, args=(args.port, paths, deadline, latencies, errors))
+                   for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop_server(process)
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / args.seconds,
+        'p50': statistics.median(latencies) * 1000 if latencies else 0,
+        'p99': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=5590)
+    args = parser.parse_args()
+
+    print(f'{args.clients} 個連線，每種模式 {args.seconds:g} 秒')
+    for mode in args.modes:
+        result = run(mode, args)
+        print(f'{mode:>8}：{result["rps"]:>8,.0f} 請求/秒  p50 {result["p50"]:>7.1f} ms  '
+              f'p99 {result["p99"]:>7.1f} ms  錯誤 {result["errors"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""分片模式擴展性測試
+
+每個 worker 行程各自持有一組房間（與分片模式相同，不共用狀態），
+反覆建立房間並跑完一局的房間狀態操作，量測 worker 數增加時的
+每秒房間數與每秒事件數。
+
+用法：
+    python benchmarks/shard_scaling.py --workers 1 2 4 --seconds 3
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from game_logic import GameManager, Player, Room, SubmittedData  # noqa: E402
+from sharding import ShardMap  # noqa: E402
+
+PLAYERS_PER_ROOM = 6
+
+
+def play_room(manager: GameManager, shard_map: ShardMap) -> int:
+    """建立一個房間並跑完一局，回傳處理的事件數"""
+    events = 0
+    room_id = shard_map.new_room_id()
+    assert shard_map.owns(room_id)
+    with manager.transaction():
+        host = Player(f'{room_id}-0', 'host', is_host=True)
+        manager.add_room(Room(room_id, host))
+        events += 1
+    for i in range(1, PLAYERS_PER_ROOM):
+        with manager.transaction():
+            manager.get_room(room_id).add_player(Player(f'{room_id}-{i}', f'p{i}'))
+            events += 1
+    for round in (1, 2):
+        for step in ('submit', 'finished', 'received', 'selected'):
+            for i in range(PLAYERS_PER_ROOM):
+                with manager.transaction():
+                    room = manager.get_room(room_id)
+                    player = room.get_player_by_socket(f'{room_id}-{i}')
+                    if step == 'submit':
+                        room.add_submission(player, SubmittedData(round, 'prompt'))
+                    elif step == 'finished':
+                        room.mark_drawing_finished(player.id, round)
+                        room.check_all_drawing_finished(round)
+                    elif step == 'received':
+                        room.mark_art_received(player.id, round)
+                        room.check_all_art_received(round)
+                    else:
+                        room.mark_art_selected(player.id, round, 0)
+                    events += 1
+    with manager.transaction():
+        room = manager.get_room(room_id)
+        for player in room.players:
+            room.votes[player.id] = room.players[0].id
+        room.build_gallery()
+        manager.remove_room(room_id)
+        events += 1
+    return events
+
+
+def worker(args) -> tuple:
+    shard_id, count, seconds = args
+    sys.stdout = open(os.devnull, 'w')  # Room 的進度訊息不列入量測
+    shard_map = ShardMap(count, shard_id)
+    manager = GameManager()
+    rooms = events = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        events += play_room(manager, shard_map)
+        rooms += 1
+    return rooms, events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=[1, 2, 4, min(8, os.cpu_count() or 1)])
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    print(f'CPU 核心數: {os.cpu_count()}')
+    baseline = None
+    for count in args.workers:
+        with multiprocessing.Pool(count) as pool:
+            results = pool.map(worker, [(i, count, args.seconds) for i in range(count)])
+        rooms = sum(r for r, _ in results) / args.seconds
+        events = sum(e for _, e in results) / args.seconds
+        baseline = baseline or events / count
+        print(f'{count:>2} 個 worker：{rooms:>9,.0f} 房間/秒  {events:>11,.0f} 事件/秒  '
+              f'（單 worker 的 {events / baseline:.2f} 倍）')
+
+
+if __name__ == '__main__':
+    main()
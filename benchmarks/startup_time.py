@@ -0,0 +1,80 @@
+"""伺服器啟動時間測試
+
+在全新的子行程中量測：
+- 匯入 app 模組的時間，並以 python -X importtime 列出最慢的模組
+- create_app()（啟動背景工作）的時間
+- 第一個請求（遊戲主頁面，會建立靜態檔案清單並渲染頁面）的回應時間
+
+用法：
+    python benchmarks/startup_time.py --runs 5
+    python benchmarks/startup_time.py --top 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子行程中執行，輸出各階段耗時（秒）的 JSON
+PROBE = '''
+import json, logging, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+logging.disable(logging.CRITICAL)  # 啟動訊息不列入量測
+application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get('/playgame', base_url='https://localhost',
+                                         headers={'Accept-Encoding': 'gzip'})
+responded = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import': imported - start, 'create_app': created - imported,
+                  'first_request': responded - created, 'total': responded - start}),
+      file=sys.stderr)
+'''
+
+
+def measure() -> dict:
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    return json.loads(result.stderr.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int) -> list:
+    """以 -X importtime 取得累計時間最長的模組 [(毫秒, 模組名稱)]"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # 只列出 app 與它直接匯入的模組（縮排表示匯入層級）
+        if len(name) - len(name.lstrip()) <= 3:
+            modules.append((int(cumulative) / 1000, name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='列出匯入最慢的模組數')
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    print(f'{args.runs} 次冷啟動（中位數 / 最大值）：')
+    for key, label in (('import', '匯入 app'), ('create_app', 'create_app()'),
+                       ('first_request', '第一個請求'), ('total', '合計')):
+        values = [run[key] * 1000 for run in runs]
+        print(f'  {label:<12} {statistics.median(values):>8.1f} ms  {max(values):>8.1f} ms')
+
+    print(f'匯入最慢的 {args.top} 個模組（累計）：')
+    for milliseconds, name in slowest_imports(args.top):
+        print(f'  {milliseconds:>8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main()
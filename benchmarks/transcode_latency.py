@@ -0,0 +1,83 @@
+"""上傳圖片轉檔延遲測試
+
+模擬多位玩家同時上傳一批 PNG，量測轉檔工作池的完成延遲與被拒絕（503）的數量。
+
+用法：
+    python benchmarks/transcode_latency.py --players 8 --images 3 --workers 2
+    python benchmarks/transcode_latency.py --mode process
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import wait
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from image_transcoder import TRANSCODE_MODES, ImageTranscoder, TranscoderBusy  # noqa: E402
+
+
+def make_png(size: int) -> bytes:
+    """產生一張有雜訊的 PNG（接近生成圖片的壓縮難度）"""
+    img = Image.frombytes('RGB', (size, size), os.urandom(size * size * 3))
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--images', type=int, default=3, help='每位玩家每次上傳的圖片數')
+    parser.add_argument('--size', type=int, default=1024)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-pending', type=int, default=16)
+    parser.add_argument('--quality', type=int, default=75)
+    parser.add_argument('--progressive', action='store_true')
+    parser.add_argument('--subsampling', default=None)
+    parser.add_argument('--mode', choices=TRANSCODE_MODES, default='auto', help='工作池模式')
+    args = parser.parse_args()
+
+    png = make_png(args.size)
+    batch = [(f'{i}.png', png) for i in range(args.images)]
+    transcoder = ImageTranscoder(
+        max_workers=args.workers,
+        max_pending=args.max_pending,
+        quality=args.quality,
+        progressive=args.progressive,
+        subsampling=args.subsampling,
+        mode=args.mode,
+    )
+
+    latencies = []
+    rejected = 0
+    futures = []
+    start = time.perf_counter()
+    for _ in range(args.players):
+        submitted = time.perf_counter()
+        try:
+            future = transcoder.submit(batch)
+        except TranscoderBusy:
+            rejected += 1
+            continue
+        future.add_done_callback(
+            lambda _, t=submitted: latencies.append(time.perf_counter() - t))
+        futures.append(future)
+    wait(futures)
+    total = time.perf_counter() - start
+    transcoder.shutdown()
+
+    print(f'玩家 {args.players}、每批 {args.images} 張 {args.size}px、工作數 {args.workers}')
+    print(f'總耗時 {total:.2f}s，拒絕 {rejected} 批')
+    if latencies:
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f'延遲 平均 {statistics.mean(latencies) * 1000:.0f}ms、'
+              f'p95 {p95 * 1000:.0f}ms、最大 {latencies[-1] * 1000:.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,28 +4,243 @@ import uuid
 import logging
 import websockets
 import asyncio
+import aiohttp
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from requests.compat import urljoin, urlencode
-from comfy_api_simplified.comfy_workflow_wrapper import ComfyWorkflowWrapper
+from comfy_workflow import WorkflowPrompt
 import os
 
 _log = logging.getLogger(__name__)
 
 
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds
+DEFAULT_POOL_SIZE = 10
+
+
+class ComfyEventStream:
+    def __init__(
+        self,
+        ws_url: str,
+        history_lookup: Callable[[str], dict] | None = None,
+        reconnect_delay: float = 1.0,
+        max_finished: int = 256,
+    ):
+        """
+        One long-lived websocket per ComfyUI backend, shared by every prompt.
+
+        Prompts must be queued with this stream's ``client_id`` so that ComfyUI
+        sends their ``executing`` / ``execution_error`` / ``progress`` messages
+        here. Each message is decoded once and routed to the future registered
+        for its prompt_id. The socket runs on a dedicated event loop thread that
+        is started on first use and reconnects on its own.
+
+        Args:
+            ws_url (str): The websocket URL template with a ``{}`` placeholder for the client ID.
+            history_lookup (Callable): Optional ``get_history`` callable, used after a reconnect
+                to settle prompts whose completion message was missed while disconnected.
+            reconnect_delay (float): Seconds to wait before reconnecting. Defaults to 1.0.
+            max_finished (int): How many outcomes to remember for prompts that finished before
+                anyone waited on them. Defaults to 256.
+        """
+        self.client_id = str(uuid.uuid4())
+        self.ws_url = ws_url.format(self.client_id)
+        self.history_lookup = history_lookup
+        self.reconnect_delay = reconnect_delay
+        self.max_finished = max_finished
+        self.connected = threading.Event()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._waiters: dict[str, Future] = {}
+        self._progress: dict[str, Callable[[int, int], None]] = {}
+        self._finished: OrderedDict[str, Exception | None] = OrderedDict()
+
+    def start(self):
+        """
+        Starts the websocket thread if it is not running yet.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self.loop.run_forever, name="comfy-event-stream", daemon=True
+            )
+            self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._run(), self.loop)
+
+    def wait_connected(self, timeout: float | None = None) -> bool:
+        """
+        Starts the stream and blocks until the websocket is connected.
+
+        Args:
+            timeout (float): Maximum seconds to wait. Defaults to no limit.
+
+        Returns:
+            bool: Whether the websocket is connected.
+        """
+        self.start()
+        return self.connected.wait(timeout)
+
+    def wait(
+        self, prompt_id: str, on_progress: Callable[[int, int], None] | None = None
+    ) -> Future:
+        """
+        Returns a future that resolves when the prompt finishes executing.
+
+        Args:
+            prompt_id (str): The ID of the prompt.
+            on_progress (Callable): Optional callback receiving (value, max) progress updates.
+                It runs on the stream thread.
+
+        Returns:
+            Future: Resolves to the prompt ID, or raises if execution failed.
+        """
+        self.start()
+        future = Future()
+        with self._lock:
+            if prompt_id in self._finished:
+                error = self._finished.pop(prompt_id)
+                self._settle(future, prompt_id, error)
+                return future
+            self._waiters[prompt_id] = future
+            if on_progress is not None:
+                self._progress[prompt_id] = on_progress
+        return future
+
+    def cancel(self, prompt_id: str):
+        """
+        Stops waiting for a prompt.
+
+        Args:
+            prompt_id (str): The ID of the prompt.
+        """
+        with self._lock:
+            future = self._waiters.pop(prompt_id, None)
+            self._progress.pop(prompt_id, None)
+        if future is not None:
+            future.cancel()
+
+    @staticmethod
+    def _settle(future: Future, prompt_id: str, error: Exception | None):
+        if future.done():
+            return
+        if error is None:
+            future.set_result(prompt_id)
+        else:
+            future.set_exception(error)
+
+    def _finish(self, prompt_id: str, error: Exception | None = None):
+        with self._lock:
+            future = self._waiters.pop(prompt_id, None)
+            self._progress.pop(prompt_id, None)
+            if future is None:
+                # Nobody is waiting yet (e.g. the prompt finished before wait()).
+                self._finished[prompt_id] = error
+                while len(self._finished) > self.max_finished:
+                    self._finished.popitem(last=False)
+                return
+        self._settle(future, prompt_id, error)
+
+    def _dispatch(self, raw: str):
+        # Skip the monitoring spam without decoding it (the type sits near the start
+        # however the server orders keys or spaces its JSON).
+        if '"crystools.monitor"' in raw[:64]:
+            return
+        message = json.loads(raw)
+        message_type = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if prompt_id is None:
+            return
+        if message_type == "executing":
+            if data.get("node") is None:
+                self._finish(prompt_id)
+        elif message_type == "execution_success":
+            self._finish(prompt_id)
+        elif message_type == "execution_error":
+            self._finish(prompt_id, Exception(f"Execution error occurred: {data}"))
+        elif message_type == "progress":
+            callback = self._progress.get(prompt_id)
+            if callback is not None:
+                try:
+                    callback(data.get("value", 0), data.get("max", 0))
+                except Exception as e:
+                    _log.warning(f"Progress callback failed for {prompt_id}: {e}")
+
+    async def _recover(self):
+        """
+        Settles waiters whose completion message was missed while disconnected.
+        """
+        if self.history_lookup is None:
+            return
+        with self._lock:
+            pending = list(self._waiters)
+        for prompt_id in pending:
+            try:
+                history = await self.loop.run_in_executor(
+                    None, self.history_lookup, prompt_id
+                )
+            except Exception as e:
+                _log.warning(f"History lookup failed for {prompt_id}: {e}")
+                continue
+            entry = history.get(prompt_id)
+            if not entry:
+                continue
+            status = entry.get("status", {})
+            if status.get("status_str") == "error":
+                self._finish(prompt_id, Exception("Execution error occurred."))
+            elif status.get("completed", True):
+                self._finish(prompt_id)
+
+    async def _run(self):
+        while True:
+            try:
+                _log.info(f"Connecting to {self.ws_url.split('@')[-1]}")
+                async with websockets.connect(uri=self.ws_url, max_size=None) as websocket:
+                    self.connected.set()
+                    await self._recover()
+                    async for out in websocket:
+                        # Binary frames are latent previews, nobody needs them here.
+                        if isinstance(out, str):
+                            self._dispatch(out)
+            except Exception as e:
+                _log.warning(f"Event stream disconnected: {e}")
+            self.connected.clear()
+            await asyncio.sleep(self.reconnect_delay)
+
+
 class ComfyApiWrapper:
     def __init__(
-        self, url: str = "http://127.0.0.1:8188", user: str = "", password: str = ""
+        self,
+        url: str = "http://127.0.0.1:8188",
+        user: str = "",
+        password: str = "",
+        timeout: float | tuple = DEFAULT_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE,
     ):
         """
         Initializes the ComfyApiWrapper object.
 
+        All HTTP calls go through one keep-alive session, so repeated calls
+        (polling history, fetching several images) reuse pooled connections.
+
         Args:
             url (str): The URL of the Comfy API server. Defaults to "http://127.0.0.1:8188".
             user (str): The username for authentication. Defaults to an empty string.
             password (str): The password for authentication. Defaults to an empty string.
+            timeout (float | tuple): Request timeout, either one value or a (connect, read) tuple.
+                Defaults to (5, 30).
+            pool_size (int): Maximum number of pooled connections kept open. Defaults to 10.
         """
         self.url = url
         self.auth = None
+        self.timeout = timeout
         url_without_protocol = url.split("//")[-1]
 
         if "https" in url:
@@ -40,6 +255,29 @@ class ComfyApiWrapper:
             ws_url_base = f"{ws_protocol}://{url_without_protocol}"
         self.ws_url = urljoin(ws_url_base, "/ws?clientId={}")
 
+        self.session = requests.Session()
+        self.session.auth = self.auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._events: ComfyEventStream | None = None
+
+    @property
+    def events(self) -> ComfyEventStream:
+        """
+        Returns the shared websocket event stream for this server, starting it on first use.
+        """
+        if self._events is None:
+            self._events = ComfyEventStream(self.ws_url, history_lookup=self.get_history)
+        self._events.start()
+        return self._events
+
+    def close(self):
+        """
+        Closes the pooled HTTP session.
+        """
+        self.session.close()
+
     def queue_prompt(self, prompt: dict, client_id: str | None = None) -> dict:
         """
         Queues a prompt for execution.
@@ -59,7 +297,9 @@ class ComfyApiWrapper:
             p["client_id"] = client_id
         data = json.dumps(p).encode("utf-8")
         _log.info(f"Posting prompt to {self.url}/prompt")
-        resp = requests.post(urljoin(self.url, "/prompt"), data=data, auth=self.auth)
+        resp = self.session.post(
+            urljoin(self.url, "/prompt"), data=data, timeout=self.timeout
+        )
         _log.info(f"{resp.status_code}: {resp.reason}")
         if resp.status_code == 200:
             return resp.json()
@@ -72,6 +312,9 @@ class ComfyApiWrapper:
         """
         Queues a prompt for execution and waits for the result.
 
+        The wait goes through the shared event stream instead of opening a
+        websocket per prompt.
+
         Args:
             prompt (dict): The prompt to be executed.
 
@@ -81,42 +324,24 @@ class ComfyApiWrapper:
         Raises:
             Exception: If an execution error occurs.
         """
-        client_id = str(uuid.uuid4())
-        resp = self.queue_prompt(prompt, client_id)
+        events = self.events
+        await asyncio.get_running_loop().run_in_executor(None, events.wait_connected)
+        resp = self.queue_prompt(prompt, events.client_id)
         _log.debug(resp)
         prompt_id = resp["prompt_id"]
-        _log.info(f"Connecting to {self.ws_url.format(client_id).split('@')[-1]}")
-        async with websockets.connect(uri=self.ws_url.format(client_id)) as websocket:
-            while True:
-                # out = ws.recv()
-                out = await websocket.recv()
-                if isinstance(out, str):
-                    message = json.loads(out)
-                    if message["type"] == "crystools.monitor":
-                        continue
-                    _log.debug(message)
-                    if message["type"] == "execution_error":
-                        data = message["data"]
-                        if data["prompt_id"] == prompt_id:
-                            raise Exception("Execution error occurred.")
-                    if message["type"] == "status":
-                        data = message["data"]
-                        if data["status"]["exec_info"]["queue_remaining"] == 0:
-                            return prompt_id
-                    if message["type"] == "executing":
-                        data = message["data"]
-                        if data["node"] is None and data["prompt_id"] == prompt_id:
-                            return prompt_id
+        return await asyncio.wrap_future(events.wait(prompt_id))
 
     def queue_and_wait_images(
-        self, prompt: ComfyWorkflowWrapper, output_node_title: str, loop:asyncio.BaseEventLoop = asyncio.get_event_loop()
+        self, prompt: WorkflowPrompt, output_node_title: str, loop: asyncio.AbstractEventLoop | None = None
     ) -> dict:
         """
-        Queues a prompt with a ComfyWorkflowWrapper object and waits for the images to be generated.
+        Queues a prompt with a WorkflowPrompt object and waits for the images to be generated.
 
         Args:
-            prompt (ComfyWorkflowWrapper): The ComfyWorkflowWrapper object representing the prompt.
+            prompt (WorkflowPrompt): The WorkflowPrompt object representing the prompt.
             output_node_title (str): The title of the output node.
+            loop (asyncio.AbstractEventLoop): The event loop to wait on. Defaults to a new one per call
+                (resolving a default loop at import time fails under eventlet's monkey patching).
 
         Returns:
             dict: A dictionary mapping image filenames to their content.
@@ -125,7 +350,8 @@ class ComfyApiWrapper:
             Exception: If the request fails with a non-200 status code.
         """
 
-        prompt_id = loop.run_until_complete(self.queue_prompt_and_wait(prompt))
+        wait = self.queue_prompt_and_wait(prompt)
+        prompt_id = loop.run_until_complete(wait) if loop else asyncio.run(wait)
         history = self.get_history(prompt_id)
         image_node_id = prompt.get_node_id(output_node_title)
         images = history[prompt_id]["outputs"][image_node_id]["images"]
@@ -148,7 +374,7 @@ class ComfyApiWrapper:
         """
         url = urljoin(self.url, f"/queue")
         _log.info(f"Getting queue from {url}")
-        resp = requests.get(url, auth=self.auth)
+        resp = self.session.get(url, timeout=self.timeout)
         if resp.status_code == 200:
             return resp.json()
         else:
@@ -156,12 +382,31 @@ class ComfyApiWrapper:
                 f"Request failed with status code {resp.status_code}: {resp.reason}"
             )
 
-    def get_queue_size_before(self, prompt_id: str) -> int:
+    def test_connection(self, timeout: float = 5) -> bool:
+        """
+        Checks whether the Comfy API server is reachable.
+
+        Args:
+            timeout (float): Request timeout in seconds. Defaults to 5.
+
+        Returns:
+            bool: True if the server answered /queue with status 200.
+        """
+        try:
+            resp = self.session.get(urljoin(self.url, "/queue"), timeout=timeout)
+            return resp.status_code == 200
+        except Exception as e:
+            _log.warning(f"Connection test to {self.url} failed: {e}")
+            return False
+
+    def get_queue_size_before(self, prompt_id: str, queue: dict | None = None) -> int:
         """
         Retrieves the number of prompt in the queue before a prompt.
 
         Args:
             prompt_id (str): The ID of the prompt.
+            queue (dict): A response from get_queue to reuse, so several prompts can be
+                looked up with one request. Defaults to fetching the queue.
 
         Returns:
             int: The number of prompt in the queue before the prompt, 0 means the prompt is running.
@@ -170,7 +415,7 @@ class ComfyApiWrapper:
             Exception: If the request fails with a non-200 status code.
             ValueError: If prompt_id is not in the queue.
         """
-        resp = self.get_queue()
+        resp = queue if queue is not None else self.get_queue()
         for elem in resp["queue_running"]:
             if elem[1] == prompt_id:
                 return 0
@@ -197,7 +442,7 @@ class ComfyApiWrapper:
         """
         url = urljoin(self.url, f"/history/{prompt_id}")
         _log.info(f"Getting history from {url}")
-        resp = requests.get(url, auth=self.auth)
+        resp = self.session.get(url, timeout=self.timeout)
         if resp.status_code == 200:
             return resp.json()
         else:
@@ -223,7 +468,7 @@ class ComfyApiWrapper:
         params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
         url = urljoin(self.url, f"/view?{urlencode(params)}")
         _log.info(f"Getting image from {url}")
-        resp = requests.get(url, auth=self.auth)
+        resp = self.session.get(url, timeout=self.timeout)
         _log.debug(f"{resp.status_code}: {resp.reason}")
         if resp.status_code == 200:
             return resp.content
@@ -251,9 +496,10 @@ class ComfyApiWrapper:
         url = urljoin(self.url, "/upload/image")
         serv_file = os.path.basename(filename)
         data = {"subfolder": subfolder}
-        files = {"image": (serv_file, open(filename, "rb"))}
         _log.info(f"Posting {filename} to {url} with data {data}")
-        resp = requests.post(url, files=files, data=data, auth=self.auth)
+        with open(filename, "rb") as f:
+            files = {"image": (serv_file, f)}
+            resp = self.session.post(url, files=files, data=data, timeout=self.timeout)
         _log.debug(f"{resp.status_code}: {resp.reason}, {resp.text}")
         if resp.status_code == 200:
             return resp.json()
@@ -261,3 +507,227 @@ class ComfyApiWrapper:
             raise Exception(
                 f"Request failed with status code {resp.status_code}: {resp.reason}"
             )
+
+
+class AsyncComfyApiWrapper:
+    def __init__(
+        self,
+        url: str = "http://127.0.0.1:8188",
+        user: str = "",
+        password: str = "",
+        timeout: float = DEFAULT_TIMEOUT[1],
+        pool_size: int = DEFAULT_POOL_SIZE,
+        events: ComfyEventStream | None = None,
+    ):
+        """
+        Initializes the AsyncComfyApiWrapper object.
+
+        The aiohttp session is created lazily on the first request, inside the
+        event loop that uses it, and keeps its connections alive between calls.
+        Prompt completions are read from one shared ComfyEventStream.
+
+        Args:
+            url (str): The URL of the Comfy API server. Defaults to "http://127.0.0.1:8188".
+            user (str): The username for authentication. Defaults to an empty string.
+            password (str): The password for authentication. Defaults to an empty string.
+            timeout (float): Total timeout for a single request in seconds. Defaults to 30.
+            pool_size (int): Maximum number of pooled connections kept open. Defaults to 10.
+            events (ComfyEventStream): An existing event stream for this server to share,
+                e.g. the one of a ComfyApiWrapper. Defaults to a stream created on first use.
+        """
+        self.url = url
+        self.auth = aiohttp.BasicAuth(user, password) if user else None
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=DEFAULT_TIMEOUT[0])
+        self.pool_size = pool_size
+        self.ws_url = urljoin(url.replace("http", "ws", 1), "/ws?clientId={}")
+        self._session: aiohttp.ClientSession | None = None
+        self._events = events
+
+    @property
+    def events(self) -> ComfyEventStream:
+        """
+        Returns the shared websocket event stream for this server, starting it on first use.
+        """
+        if self._events is None:
+            self._events = ComfyEventStream(self.ws_url, history_lookup=self._history_lookup)
+        self._events.start()
+        return self._events
+
+    def _history_lookup(self, prompt_id: str) -> dict:
+        """
+        Blocking history lookup for the event stream, which calls it from an executor
+        thread where this wrapper's aiohttp session cannot be used.
+        """
+        auth = HTTPBasicAuth(self.auth.login, self.auth.password) if self.auth else None
+        resp = requests.get(
+            urljoin(self.url, f"/history/{prompt_id}"), auth=auth, timeout=DEFAULT_TIMEOUT
+        )
+        if resp.status_code == 200:
+            return resp.json()
+        raise Exception(
+            f"Request failed with status code {resp.status_code}: {resp.reason}"
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Returns the pooled session, creating it on first use.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(
+                connector=connector, auth=self.auth, timeout=self.timeout
+            )
+        return self._session
+
+    async def close(self):
+        """
+        Closes the pooled session.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _get_json(self, path: str) -> dict:
+        url = urljoin(self.url, path)
+        _log.info(f"Getting {url}")
+        async with self.session.get(url) as resp:
+            if resp.status == 200:
+                return await resp.json()
+            raise Exception(
+                f"Request failed with status code {resp.status}: {resp.reason}"
+            )
+
+    async def queue_prompt(self, prompt: dict, client_id: str | None = None) -> dict:
+        """
+        Queues a prompt for execution.
+
+        Args:
+            prompt (dict): The prompt to be executed.
+            client_id (str): The client ID for the prompt. Defaults to None.
+
+        Returns:
+            dict: The response JSON object.
+
+        Raises:
+            Exception: If the request fails with a non-200 status code.
+        """
+        p = {"prompt": prompt}
+        if client_id:
+            p["client_id"] = client_id
+        _log.info(f"Posting prompt to {self.url}/prompt")
+        async with self.session.post(urljoin(self.url, "/prompt"), json=p) as resp:
+            _log.info(f"{resp.status}: {resp.reason}")
+            if resp.status == 200:
+                return await resp.json()
+            raise Exception(
+                f"Request failed with status code {resp.status}: {resp.reason}"
+            )
+
+    async def queue_prompt_and_wait(self, prompt: dict) -> str:
+        """
+        Queues a prompt for execution and waits for the result.
+
+        The wait goes through the shared event stream instead of opening a
+        websocket per prompt.
+
+        Args:
+            prompt (dict): The prompt to be executed.
+
+        Returns:
+            str: The prompt ID.
+
+        Raises:
+            Exception: If an execution error occurs.
+        """
+        events = self.events
+        await asyncio.get_running_loop().run_in_executor(None, events.wait_connected)
+        resp = await self.queue_prompt(prompt, events.client_id)
+        _log.debug(resp)
+        prompt_id = resp["prompt_id"]
+        return await asyncio.wrap_future(events.wait(prompt_id))
+
+    async def get_queue(self) -> dict:
+        """
+        Retrieves the entire prompt queue.
+
+        Returns:
+            dict: The response JSON object.
+
+        Raises:
+            Exception: If the request fails with a non-200 status code.
+        """
+        return await self._get_json("/queue")
+
+    async def get_queue_size_before(self, prompt_id: str) -> int:
+        """
+        Retrieves the number of prompt in the queue before a prompt.
+
+        Args:
+            prompt_id (str): The ID of the prompt.
+
+        Returns:
+            int: The number of prompt in the queue before the prompt, 0 means the prompt is running.
+
+        Raises:
+            Exception: If the request fails with a non-200 status code.
+            ValueError: If prompt_id is not in the queue.
+        """
+        resp = await self.get_queue()
+        for elem in resp["queue_running"]:
+            if elem[1] == prompt_id:
+                return 0
+
+        result = 1
+        for elem in resp["queue_pending"]:
+            if elem[1] == prompt_id:
+                return result
+            result = result + 1
+        raise ValueError("prompt_id is not in the queue")
+
+    async def get_history(self, prompt_id: str) -> dict:
+        """
+        Retrieves the execution history for a prompt.
+
+        Args:
+            prompt_id (str): The ID of the prompt.
+
+        Returns:
+            dict: The response JSON object.
+
+        Raises:
+            Exception: If the request fails with a non-200 status code.
+        """
+        return await self._get_json(f"/history/{prompt_id}")
+
+    async def get_image(self, filename: str, subfolder: str, folder_type: str) -> bytes:
+        """
+        Retrieves an image from the Comfy API server.
+
+        Args:
+            filename (str): The filename of the image.
+            subfolder (str): The subfolder of the image.
+            folder_type (str): The type of the folder.
+
+        Returns:
+            bytes: The content of the image.
+
+        Raises:
+            Exception: If the request fails with a non-200 status code.
+        """
+        params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+        url = urljoin(self.url, f"/view?{urlencode(params)}")
+        _log.info(f"Getting image from {url}")
+        async with self.session.get(url) as resp:
+            _log.debug(f"{resp.status}: {resp.reason}")
+            if resp.status == 200:
+                return await resp.read()
+            raise Exception(
+                f"Request failed with status code {resp.status}: {resp.reason}"
+            )
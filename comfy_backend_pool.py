@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from urllib.parse import urlparse
+
+from comfy_api_wrapper import AsyncComfyApiWrapper, ComfyApiWrapper
+
+logger = logging.getLogger(__name__)
+
+
+class NoBackendAvailable(Exception):
+    """目前沒有可用（健康且有空位）的 ComfyUI 後端"""
+
+
+class ComfyBackend:
+    """單一 ComfyUI 後端的狀態"""
+
+    def __init__(self, url: str, api: ComfyApiWrapper):
+        self.url = url
+        self.api = api
+        self.healthy = True
+        self.in_flight = 0  # 本伺服器送出、尚未完成的工作數
+        self.queue: Optional[dict] = None  # 最近一次 /queue 的回應
+        self.queue_size = 0  # ComfyUI 佇列中（執行中 + 等待中）的工作數
+        self.last_probe = 0.0
+        self.last_error: Optional[str] = None
+        self._async_api: Optional[AsyncComfyApiWrapper] = None
+
+    @property
+    def async_api(self) -> AsyncComfyApiWrapper:
+        """非同步 API 客戶端（只在該後端的事件迴圈上使用）"""
+        if self._async_api is None:
+            self._async_api = AsyncComfyApiWrapper(self.url, events=self.api.events)
+        return self._async_api
+
+    async def fetch_outputs(self, done: Future, prompt_id: str, node_id: str,
+                            poll: bool = False, poll_interval: float = 2) -> List[bytes]:
+        """等待提示執行完畢，下載指定節點輸出的所有圖片
+
+        Args:
+            done: 事件串流上等待該提示完成的 Future
+            poll: 提示送出時事件串流尚未連線（完成訊息可能遺失），定期查詢歷史紀錄
+            poll_interval: 輪詢間隔（秒）；事件串流斷線期間也會輪詢
+        """
+        waiter = asyncio.wrap_future(done)
+        while True:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), poll_interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+            if not poll and self.api.events.connected.is_set():
+                continue
+            if await self._finished(prompt_id):
+                self.api.events.cancel(prompt_id)
+                break
+        history = await self.async_api.get_history(prompt_id)
+        images = history[prompt_id]['outputs'][node_id]['images']
+        return list(await asyncio.gather(*(
+            self.async_api.get_image(image['filename'], image['subfolder'], image['type'])
+            for image in images)))
+
+    async def _finished(self, prompt_id: str) -> bool:
+        """以歷史紀錄確認提示是否已執行完畢（執行失敗時拋出例外）"""
+        status = (await self.async_api.get_history(prompt_id)).get(prompt_id, {}).get('status')
+        if status is None:
+            return False
+        if status.get('status_str') == 'error':
+            self.api.events.cancel(prompt_id)
+            raise Exception('Execution error occurred.')
+        return status.get('completed', True)
+
+    @property
+    def load(self) -> int:
+        """尚未完成的工作量（取本地追蹤與 ComfyUI 佇列中較大者）"""
+        return max(self.in_flight, self.queue_size)
+
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'in_flight': self.in_flight,
+            'queue_size': self.queue_size,
+            'last_error': self.last_error
+        }
+
+
+class ComfyBackendPool:
+    """多台 ComfyUI 後端的負載平衡池
+
+    - 依尚未完成的工作量挑選後端（參考 /queue）
+    - 送出失敗即標記為離線，定期以 test_connection 探測恢復
+    """
+
+    def __init__(self,
+                 urls: Iterable[str],
+                 max_in_flight: int = 2,
+                 probe_interval: float = 10,
+                 connect_timeout: float = 2,
+                 api_factory: Callable[[str], ComfyApiWrapper] = ComfyApiWrapper):
+        """
+        Args:
+            urls: ComfyUI 伺服器網址列表
+            max_in_flight: 每台後端同時處理的工作上限
+            probe_interval: 離線後端的探測間隔（秒）
+            connect_timeout: 以事件串流送出時，等待串流連線的最長時間（秒）
+            api_factory: 建立 API 客戶端的函式
+        """
+        self.max_in_flight = max_in_flight
+        self.probe_interval = probe_interval
+        self.connect_timeout = connect_timeout
+        self.backends: Dict[str, ComfyBackend] = {
+            url: ComfyBackend(url, api_factory(url)) for url in urls
+        }
+        if not self.backends:
+            raise ValueError('至少需要一台 ComfyUI 後端')
+        self._lock = threading.Lock()
+        # 送出時事件串流尚未連線的提示，取結果時改以輪詢歷史紀錄確認完成
+        self._unconfirmed: Set[str] = set()
+
+    @property
+    def capacity(self) -> int:
+        """所有後端的同時工作上限總和"""
+        return self.max_in_flight * len(self.backends)
+
+    def get(self, url: str) -> Optional[ComfyBackend]:
+        """根據網址取得後端"""
+        return self.backends.get(url)
+
+    def acquire(self, exclude: Iterable[str] = ()) -> ComfyBackend:
+        """挑選負載最低的健康後端並佔用一個名額
+
+        Raises:
+            NoBackendAvailable: 沒有健康且有空位的後端
+        """
+        exclude = set(exclude)
+        with self._lock:
+            candidates = [b for b in self.backends.values()
+                          if b.healthy and b.url not in exclude
+                          and b.in_flight < self.max_in_flight]
+            if not candidates:
+                raise NoBackendAvailable('沒有可用的 ComfyUI 後端')
+            backend = min(candidates, key=lambda b: b.load)
+            backend.in_flight += 1
+            backend.queue_size += 1
+            return backend
+
+    def release(self, url: str):
+        """釋放後端名額"""
+        with self._lock:
+            backend = self.backends.get(url)
+            if backend and backend.in_flight > 0:
+                backend.in_flight -= 1
+
+    def mark_down(self, url: str, error: Exception):
+        """標記後端離線"""
+        with self._lock:
+            backend = self.backends.get(url)
+            if not backend:
+                return
+            if backend.healthy:
+                logger.warning(f'ComfyUI 後端離線: {url}: {error}')
+            backend.healthy = False
+            backend.last_error = str(error)
+            backend.last_probe = time.time()
+
+    def queue_prompt(self, prompt: dict, use_events: bool = False) -> tuple:
+        """送出提示到負載最低的後端，失敗時改送其他健康後端
+
+        Args:
+            prompt: 工作流程
+            use_events: 以後端事件串流的 client_id 送出（之後可用 fetch_outputs 取回結果）
+
+        Returns:
+            (後端網址, prompt_id)
+
+        Raises:
+            NoBackendAvailable: 所有後端都無法送出
+        """
+        tried: Set[str] = set()
+        while True:
+            backend = self.acquire(exclude=tried)
+            tried.add(backend.url)
+            try:
+                client_id = None
+                connected = True
+                if use_events:
+                    # 串流連線後才送出，否則 ComfyUI 送給這個 client_id 的完成訊息會遺失
+                    connected = backend.api.events.wait_connected(self.connect_timeout)
+                    if not connected:
+                        logger.warning(f'{backend.url} 事件串流尚未連線，改以輪詢取得結果')
+                    client_id = backend.api.events.client_id
+                resp = backend.api.queue_prompt(prompt, client_id)
+                if not connected:
+                    with self._lock:
+                        self._unconfirmed.add(resp['prompt_id'])
+                return backend.url, resp['prompt_id']
+            except Exception as e:
+                self.release(backend.url)
+                self.mark_down(backend.url, e)
+
+    def refresh(self):
+        """更新各後端佇列狀態，並探測離線後端"""
+        now = time.time()
+        for backend in list(self.backends.values()):
+            if not backend.healthy:
+                if now - backend.last_probe < self.probe_interval:
+                    continue
+                backend.last_probe = now
+                if not backend.api.test_connection():
+                    continue
+                logger.info(f'ComfyUI 後端恢復: {backend.url}')
+            try:
+                queue = backend.api.get_queue()
+            except Exception as e:
+                self.mark_down(backend.url, e)
+                continue
+            with self._lock:
+                backend.healthy = True
+                backend.last_error = None
+                backend.queue = queue
+                backend.queue_size = (len(queue.get('queue_running', [])) +
+                                      len(queue.get('queue_pending', [])))
+
+    def fetch_outputs(self, url: str, prompt_id: str, node_id: str) -> Future:
+        """在後端共用的事件迴圈上等待提示完成並下載輸出圖片
+
+        Returns:
+            Future，結果為圖片內容列表
+        """
+        events = self.backends[url].api.events
+        done = events.wait(prompt_id)
+        with self._lock:
+            poll = prompt_id in self._unconfirmed
+            self._unconfirmed.discard(prompt_id)
+        return asyncio.run_coroutine_threadsafe(
+            self.backends[url].fetch_outputs(done, prompt_id, node_id, poll=poll), events.loop)
+
+    def queue_size_before(self, url: str, prompt_id: str) -> int:
+        """根據最近一次 /queue 回應，計算提示在該後端佇列中前方的數量"""
+        backend = self.backends.get(url)
+        if not backend or backend.queue is None:
+            return 0
+        return backend.api.get_queue_size_before(prompt_id, backend.queue)
+
+    def callback_addresses(self) -> Set[str]:
+        """後端主機的 IP 位址（允許這些位址回傳圖片到 /upload）"""
+        addresses = set()
+        for url in self.backends:
+            host = urlparse(url).hostname
+            if not host:
+                continue
+            try:
+                addresses.add(socket.gethostbyname(host))
+            except OSError as e:
+                logger.warning(f'無法解析 ComfyUI 後端位址 {host}: {e}')
+        return addresses
+
+    def status(self) -> List[Dict]:
+        """各後端狀態"""
+        with self._lock:
+            return [backend.to_dict() for backend in self.backends.values()]
@@ -12,6 +12,7 @@ import time
 from typing import Optional, Dict, Any
 import io
 from PIL import Image
+from comfy_api_wrapper import ComfyEventStream
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
@@ -50,6 +51,10 @@ class ComfyUIClient:
         else:
             self.ws_url_base = f"{ws_protocol}://{url_without_protocol}"
         
+        # 共用的 WebSocket 事件串流（所有提示共用同一條連線與 clientId）
+        self.events = ComfyEventStream(f"{self.ws_url_base}/ws?clientId={{}}",
+                                       history_lookup=self.get_history)
+
         # 載入工作流程範本
         self.workflow_template = self.load_workflow_template()
     
@@ -171,12 +176,12 @@ class ComfyUIClient:
             if "3" in workflow and "inputs" in workflow["3"]:
                 workflow["3"]["inputs"]["seed"] = seed
             
-            # 提交工作流程並等待結果
-            client_id = str(uuid.uuid4())
-            prompt_id = self.queue_prompt(workflow, client_id)
+            # 提交工作流程並等待結果（使用事件串流的 clientId 才能收到執行訊息）
+            self.events.wait_connected(timeout=10)
+            prompt_id = self.queue_prompt(workflow, self.events.client_id)
             
             # 等待完成並獲取圖像
-            image_data = asyncio.run(self.wait_for_completion(prompt_id, client_id))
+            image_data = asyncio.run(self.wait_for_completion(prompt_id))
             
             return image_data
             
@@ -221,44 +226,29 @@ class ComfyUIClient:
         else:
             raise Exception(f"提交工作流程失敗: {response.status_code} - {response.text}")
     
-    async def wait_for_completion(self, prompt_id: str, client_id: str) -> str:
-        """等待工作流程完成並獲取結果"""
-        ws_url = f"{self.ws_url_base}/ws?clientId={client_id}"
-        
+    async def wait_for_completion(self, prompt_id: str, client_id: Optional[str] = None) -> str:
+        """等待工作流程完成並獲取結果（透過共用事件串流，不再為每個提示建立連線）"""
         try:
-            async with websockets.connect(ws_url) as websocket:
-                while True:
-                    message = await websocket.recv()
-                    data = json.loads(message)
-                    
-                    if data["type"] == "execution_error":
-                        if data["data"]["prompt_id"] == prompt_id:
-                            raise Exception(f"執行錯誤: {data['data']}")
-                    
-                    elif data["type"] == "executing":
-                        if data["data"]["node"] is None and data["data"]["prompt_id"] == prompt_id:
-                            # 工作流程完成，獲取圖像
-                            return await self.get_generated_image(prompt_id)
-                    
-                    elif data["type"] == "status":
-                        status = data["data"]["status"]
-                        if status["exec_info"]["queue_remaining"] == 0:
-                            continue
-                            
+            await asyncio.wrap_future(self.events.wait(prompt_id))
         except Exception as e:
-            logger.error(f"WebSocket 連接錯誤: {str(e)}")
+            logger.error(f"等待工作流程錯誤: {str(e)}")
             raise Exception(f"等待完成時發生錯誤: {str(e)}")
-    
-    async def get_generated_image(self, prompt_id: str) -> str:
-        """獲取生成的圖像"""
-        # 獲取歷史記錄
+
+        # 工作流程完成，獲取圖像
+        return await self.get_generated_image(prompt_id)
+
+    def get_history(self, prompt_id: str) -> Dict[str, Any]:
+        """獲取提示的執行歷史記錄"""
         history_url = urljoin(self.server_url, f"/history/{prompt_id}")
         response = requests.get(history_url, auth=self.auth)
-        
         if response.status_code != 200:
             raise Exception(f"獲取歷史記錄失敗: {response.status_code}")
-        
-        history = response.json()
+        return response.json()
+    
+    async def get_generated_image(self, prompt_id: str) -> str:
+        """獲取生成的圖像"""
+        # 獲取歷史記錄
+        history = self.get_history(prompt_id)
         
         # 找到輸出圖像
         if prompt_id not in history:
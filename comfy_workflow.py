@@ -0,0 +1,77 @@
+import json
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class WorkflowTemplate:
+    """預先載入的 ComfyUI 工作流程範本（每個行程只讀取、解析一次）"""
+
+    def __init__(self, workflow_path: str):
+        """
+        載入工作流程範本
+
+        Args:
+            workflow_path: 工作流程檔案路徑
+        """
+        self.workflow_path = workflow_path
+        with open(workflow_path, 'r', encoding='utf-8') as f:
+            self._nodes: Dict[str, Dict[str, Any]] = json.load(f)
+
+        # 節點標題 -> 節點ID 索引，重複標題以第一個節點為準
+        self._titles: Dict[str, str] = {}
+        for node_id, node in self._nodes.items():
+            title = node.get('_meta', {}).get('title')
+            if title is not None:
+                self._titles.setdefault(title, node_id)
+        logger.info(f'工作流程範本已載入: {workflow_path} ({len(self._nodes)} 個節點)')
+
+    def get_node_id(self, title: str) -> str:
+        """根據節點標題取得節點ID"""
+        try:
+            return self._titles[title]
+        except KeyError:
+            raise ValueError(f'工作流程中找不到節點: {title}')
+
+    def new_prompt(self) -> 'WorkflowPrompt':
+        """建立一份可修改的工作流程（與範本共用未修改的節點）"""
+        return WorkflowPrompt(self)
+
+
+class WorkflowPrompt(dict):
+    """由範本產生的單次工作流程，只在設定參數時複製被修改的節點"""
+
+    def __init__(self, template: WorkflowTemplate):
+        super().__init__(template._nodes)
+        self._template = template
+        self._copied = set()
+
+    def get_node_id(self, title: str) -> str:
+        """根據節點標題取得節點ID"""
+        return self._template.get_node_id(title)
+
+    def set_node_param(self, title: str, param: str, value: Any):
+        """設定節點參數（寫入前先複製該節點，範本本身不會被修改）"""
+        node_id = self.get_node_id(title)
+        if node_id not in self._copied:
+            node = self[node_id]
+            self[node_id] = {**node, 'inputs': dict(node['inputs'])}
+            self._copied.add(node_id)
+        self[node_id]['inputs'][param] = value
+
+    def remove_node(self, title: str):
+        """移除節點，以及所有（直接或間接）使用其輸出的節點"""
+        removed = {self.get_node_id(title)}
+        while True:
+            dependents = {
+                node_id for node_id, node in self.items()
+                if node_id not in removed and any(
+                    isinstance(value, list) and value and value[0] in removed
+                    for value in node.get('inputs', {}).values())
+            }
+            if not dependents:
+                break
+            removed |= dependents
+        for node_id in removed:
+            self.pop(node_id, None)
@@ -1,12 +1,46 @@
+import heapq
 import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import uuid
+from types import MappingProxyType
+
+
+# 遊戲配置
+class GameConfig:
+    """遊戲配置類別"""
+    MIN_PLAYERS = 3
+    MAX_PLAYERS = 8
+    DRAWING_ROUNDS = 2
+    SHOW_ART_TIME_LIMIT = 10
+    VOTING_TIME_LIMIT = 60  # 秒
+    DRAWING_TIME_LIMIT = 120  # 秒
+    SPY_GUESS_TIME_LIMIT = 30  # 秒
+    TOPIC_VOTE_TIME_LIMIT = 30  # 秒
+    SELECT_ART_TIME_LIMIT = 30  # 秒
+    ART_RECEIVE_TIME_LIMIT = 15  # 秒，繪圖完成後等待所有玩家接收
+    VOTE_RESULT_ANIMATION_TIME = 16  # 秒，前端公布投票結果到顯示猜測介面的時間
+    GAME_STAGES = ('waiting', 'voting_topic', 'show_topic', 'drawing', 'show_art',
+                   'drawing', 'show_art', 'voting', 'spy_guess', 'ended')
+
+    # 頭像配置
+    AVATAR_COUNT = 12
+
+    # 提詞限制
+    MAX_PROMPT_LENGTH = 30
+    MIN_PROMPT_LENGTH = 5
 
 
 class Player:
     """玩家類別"""
 
+    __slots__ = ('id', 'socket_id', 'name', 'is_host', 'is_spy', 'avatar_id',
+                 'connected', 'topic_voted', 'submitted_data')
+
     def __init__(self, socket_id: str, name: str, is_host: bool = False):
         self.id = str(uuid.uuid4())
         self.socket_id = socket_id
@@ -32,15 +66,32 @@ class Player:
             'connected': self.connected
         }
 
+    def to_state(self) -> Dict:
+        """序列化完整狀態（供房間儲存使用）"""
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['submitted_data'] = [data.to_state() for data in self.submitted_data]
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'Player':
+        """由 to_state 的結果還原"""
+        player = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(player, name, state[name])
+        player.submitted_data = [SubmittedData.from_state(data) for data in state['submitted_data']]
+        return player
+
 
 class SubmittedData:
     """玩家提交的數據類別"""
 
+    __slots__ = ('round', 'prompt', 'isDrawFinished', 'image_ids', 'isReceived', 'selectedImage')
+
     def __init__(self, round: int, prompt: str):
         self.round = round
         self.prompt = prompt
         self.isDrawFinished = False  # 繪圖是否完成
-        self.image_data = []  # 圖片數據
+        self.image_ids = []  # 圖片ID（圖片本體存於 ImageStore）
         self.isReceived = False  # 是否已接收
         self.selectedImage = None  # 用於選擇的圖片ID
         # debug
@@ -59,7 +110,7 @@ class SubmittedData:
             'round': self.round,
             'prompt': self.prompt,
             'isDrawFinished': self.isDrawFinished,
-            'image_data': self.image_data,
+            'image_ids': self.image_ids,
             'isReceived': self.isReceived,
             'selectedImage': self.selectedImage
         }
@@ -69,70 +120,172 @@ class SubmittedData:
         return {
             'round': self.round,
             'prompt': self.prompt,
-            'image_data': self.image_data,
+            'image_ids': self.image_ids,
             'selectedImage': self.selectedImage
         }
 
+    def to_state(self) -> Dict:
+        """序列化完整狀態（供房間儲存使用）"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'SubmittedData':
+        """由 to_state 的結果還原"""
+        data = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(data, name, state[name])
+        return data
+
 
 class Room:
     """遊戲房間類別"""
 
+    # 所有房間共用的常數資料
+    gameConfig = GameConfig()  # 遊戲配置
+    phaseName = GameConfig.GAME_STAGES  # 階段名稱，phase 為其索引
+    wait_time = MappingProxyType({
+        'drawing': GameConfig.DRAWING_TIME_LIMIT,  # 繪圖時間限制
+        'picking': GameConfig.TOPIC_VOTE_TIME_LIMIT,  # 選擇主題時間限制
+        'showing': GameConfig.SHOW_ART_TIME_LIMIT,  # 展示時間限制
+        'voting': GameConfig.VOTING_TIME_LIMIT,  # 投票時間限制
+        'spy_guess': GameConfig.SPY_GUESS_TIME_LIMIT  # 間諜猜測時間限制
+    })
+    max_rounds = GameConfig.DRAWING_ROUNDS
+
+    __slots__ = ('id', 'players', '_players_by_id', '_players_by_socket', '_submissions',
+                 '_round_counts', 'phase', 'created_at', 'topicCandidates', 'topicVoteCount',
+                 'topic', 'keyword', 'current_round', 'show_art_order', 'now_showing', 'timer',
+                 'drawing_deadline', 'guess_spy_correct', 'gallery', 'votes', 'last_active',
+                 'retired_image_ids', '_player_list')
+
     def __init__(self, room_id: str, host_player: Player):
         self.id = room_id
-        self.gameConfig = GameConfig()  # 遊戲配置
         self.players: List[Player] = [host_player]
-        self.phaseName = ['waiting', 'voting_topic', 'show_topic', 'drawing',
-                          'show_art', 'drawing', 'show_art', 'voting', 'spy_guess', 'ended']  # 階段數組
-        self.phase = 0  # 'waiting', 'voting_topic', 'show_topic', 'drawing', 'show_art','drawing', 'show_art', 'voting', 'spy_guess', 'ended'
-        self.wait_time = {
-            'drawing': 120,  # 繪圖時間限制
-            'picking': 30,   # 選擇主題時間限制
-            'showing': 10,  # 展示時間限制
-            'voting': 60,    # 投票時間限制
-            'spy_guess': 30  # 間諜猜測時間限制
-        }
+        # 玩家索引，需與 players 保持一致（透過 add_player / remove_player / set_player_socket 修改）
+        self._players_by_id: Dict[str, Player] = {host_player.id: host_player}
+        self._players_by_socket: Dict[str, Player] = {host_player.socket_id: host_player}
+        self._player_list: Optional[List[Dict]] = None  # player_list() 的快取，玩家資料改變時清除
+        # 回合 -> 玩家ID -> 提交資料，以及各回合完成/接收/選圖的玩家數（透過 add_submission / mark_* 修改）
+        self._submissions: Dict[int, Dict[str, SubmittedData]] = {}
+        self._round_counts: Dict[int, Dict[str, int]] = {}
+        self.phase = 0  # phaseName 的索引
         self.created_at = datetime.now()
         self.topicCandidates = []
         self.topicVoteCount = []
         self.topic = '電玩遊戲'
         self.keyword = 'Minecraft'
         self.current_round = 1
-        self.max_rounds = 2
         self.show_art_order = []  # 繪圖展示順序
         self.now_showing = 0  # 當前展示的玩家ID
         self.timer = None  # 用於計時的定時器
+        self.drawing_deadline = None  # 本回合繪圖截止時間（time.time()）
         self.guess_spy_correct = False  # 間諜猜測是否正確
+        self.gallery = []  # 遊戲結束時的畫廊資料快照（每位玩家一頁）
 
         self.votes: Dict[str, str] = {}  # 玩家投票
+        self.last_active = time.time()  # 最後一次有事件的時間（time.time()），決定閒置多久後回收
+        self.retired_image_ids: List[str] = []  # 已離開玩家與前幾局的圖片ID，房間回收時一併釋放
 
     def add_player(self, player: Player):
         """添加玩家到房間"""
         if len(self.players) < 8:
             self.players.append(player)
+            self._players_by_id[player.id] = player
+            self._players_by_socket[player.socket_id] = player
+            self._player_list = None
             return True
         return False
 
     def remove_player(self, player_id: str):
         """從房間移除玩家"""
-        self.players = [p for p in self.players if p.id != player_id]
+        player = self._players_by_id.pop(player_id, None)
+        if player is None:
+            return
+        self.players.remove(player)
+        self._player_list = None
+        self.retired_image_ids.extend(
+            image_id for data in player.submitted_data for image_id in data.image_ids)
+        if self._players_by_socket.get(player.socket_id) is player:
+            del self._players_by_socket[player.socket_id]
+        # 離開的玩家不再計入各回合的完成數
+        for round, submissions in self._submissions.items():
+            data = submissions.pop(player.id, None)
+            if data is not None:
+                counts = self._round_counts[round]
+                for key, done in self._submission_flags(data).items():
+                    counts[key] -= done
 
         # 如果房主離開，指派新房主
         if not any(p.is_host for p in self.players) and self.players:
             self.players[0].is_host = True
 
+    def set_player_avatar(self, player: Player, avatar_id: int):
+        """更換玩家頭像"""
+        player.avatar_id = avatar_id
+        self._player_list = None
+
+    def player_list(self) -> List[Dict]:
+        """廣播用的玩家列表（快取至玩家加入、離開或資料改變為止，呼叫端不可修改）"""
+        if self._player_list is None:
+            self._player_list = [player.to_dict() for player in self.players]
+        return self._player_list
+
+    def set_player_socket(self, player: Player, socket_id: str):
+        """更新玩家的 socket ID（重新連線時）"""
+        if self._players_by_socket.get(player.socket_id) is player:
+            del self._players_by_socket[player.socket_id]
+        player.socket_id = socket_id
+        self._players_by_socket[socket_id] = player
+
+    # 由其他欄位推導、或只存在於行程內的欄位，不序列化
+    _TRANSIENT = ('_players_by_id', '_players_by_socket', '_submissions', '_round_counts', 'timer',
+                  '_player_list')
+
+    def to_state(self) -> Dict:
+        """序列化完整狀態（供房間儲存使用）"""
+        state = {name: getattr(self, name) for name in self.__slots__
+                 if name not in self._TRANSIENT}
+        state['players'] = [player.to_state() for player in self.players]
+        state['created_at'] = self.created_at.isoformat()
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'Room':
+        """由 to_state 的結果還原，並重建玩家與提交索引"""
+        room = cls.__new__(cls)
+        for name, value in state.items():
+            setattr(room, name, value)
+        room.players = [Player.from_state(player) for player in state['players']]
+        room.created_at = datetime.fromisoformat(state['created_at'])
+        room.timer = None
+        room._player_list = None
+        room._reindex()
+        return room
+
+    def _reindex(self):
+        """依 players 重建玩家索引與各回合計數"""
+        self._players_by_id = {player.id: player for player in self.players}
+        self._players_by_socket = {player.socket_id: player for player in self.players}
+        self._submissions = {}
+        self._round_counts = {}
+        for player in self.players:
+            submitted_data = player.submitted_data
+            player.submitted_data = []
+            for data in submitted_data:
+                self.add_submission(player, data)
+
+    @property
+    def phase_name(self) -> str:
+        """目前階段名稱"""
+        return self.phaseName[self.phase]
+
     def get_player(self, player_id: str) -> Optional[Player]:
         """根據ID獲取玩家"""
-        for player in self.players:
-            if player.id == player_id:
-                return player
-        return None
+        return self._players_by_id.get(player_id)
 
     def get_player_by_socket(self, socket_id: str) -> Optional[Player]:
         """根據socket ID獲取玩家"""
-        for player in self.players:
-            if player.socket_id == socket_id:
-                return player
-        return None
+        return self._players_by_socket.get(socket_id)
 
     def start_game(self, topic: str, keyword: str):
         """開始遊戲"""
@@ -146,20 +299,58 @@ class Room:
         for i, player in enumerate(self.players):
             player.is_spy = (i == spy_index)
 
+    @staticmethod
+    def _submission_flags(data: SubmittedData) -> Dict[str, bool]:
+        return {
+            'finished': data.isDrawFinished,
+            'received': data.isReceived,
+            'selected': data.selectedImage is not None,
+        }
+
+    def add_submission(self, player: Player, data: SubmittedData):
+        """記錄玩家本回合的提交"""
+        player.submitted_data.append(data)
+        self._submissions.setdefault(data.round, {})[player.id] = data
+        counts = self._round_counts.setdefault(
+            data.round, {'finished': 0, 'received': 0, 'selected': 0})
+        for key, done in self._submission_flags(data).items():
+            counts[key] += done
+
+    def get_submission(self, player_id: str, round: int) -> Optional[SubmittedData]:
+        """獲取玩家在指定回合的提交"""
+        return self._submissions.get(round, {}).get(player_id)
+
+    def _mark(self, player_id: str, round: int, key: str, update) -> Optional[SubmittedData]:
+        data = self.get_submission(player_id, round)
+        if data is None:
+            return None
+        was_done = self._submission_flags(data)[key]
+        update(data)
+        self._round_counts[round][key] += self._submission_flags(data)[key] - was_done
+        return data
+
+    def mark_drawing_finished(self, player_id: str, round: int) -> Optional[SubmittedData]:
+        """標記玩家本回合繪圖完成"""
+        return self._mark(player_id, round, 'finished',
+                          lambda data: setattr(data, 'isDrawFinished', True))
+
+    def mark_art_received(self, player_id: str, round: int) -> Optional[SubmittedData]:
+        """標記玩家本回合已接收繪圖"""
+        return self._mark(player_id, round, 'received',
+                          lambda data: setattr(data, 'isReceived', True))
+
+    def mark_art_selected(self, player_id: str, round: int, index: int) -> Optional[SubmittedData]:
+        """記錄玩家本回合選擇的圖片"""
+        return self._mark(player_id, round, 'selected',
+                          lambda data: setattr(data, 'selectedImage', index))
+
+    def _all_done(self, round: int, key: str) -> bool:
+        """所有玩家在指定回合是否都已完成某項（計數只包含仍在房間的玩家）"""
+        return self._round_counts.get(round, {}).get(key, 0) >= len(self.players)
+
     def check_all_drawing_finished(self, round: int):
         """處理玩家繪圖完成"""
-        # 檢查每位玩家在指定回合是否有完成繪圖的提交
-        all_finished = True
-        for player in self.players:
-            # 找出該玩家在本回合的所有提交資料
-            round_data = [
-                data for data in player.submitted_data if data.round == round]
-            # 判斷是否有任何一筆資料已完成繪圖
-            has_finished = any(data.isDrawFinished for data in round_data)
-            if not has_finished:
-                all_finished = False
-                break  # 有玩家未完成則直接跳出
-        if all_finished:
+        if self._all_done(round, 'finished'):
             print(f"所有玩家在第 {round} 輪繪圖已完成，進入展示階段。")
             return True
         else:
@@ -168,34 +359,15 @@ class Room:
 
     def check_all_get_art(self, round: int):
         """檢查所有玩家是否已獲得繪圖"""
-        all_received = True
-        for player in self.players:
-            # 找出該玩家在本回合的所有提交資料
-            round_data = [
-                data for data in player.submitted_data if data.round == round]
-            # 判斷是否有任何一筆資料已接收
-            has_received = any(data.isReceived for data in round_data)
-            if not has_received:
-                all_received = False
-                break
-        if all_received:
-            return True
-        else:
-            return False
+        return self.check_all_art_received(round)
 
     def check_all_art_received(self, round: int):
         """檢查所有玩家是否已接收繪圖"""
-        all_received = True
-        for player in self.players:
-            # 找出該玩家在本回合的所有提交資料
-            round_data = [
-                data for data in player.submitted_data if data.round == round]
-            # 判斷是否有任何一筆資料已接收
-            has_received = any(data.isReceived for data in round_data)
-            if not has_received:
-                all_received = False
-                break
-        return all_received
+        return self._all_done(round, 'received')
+
+    def check_all_art_selected(self, round: int):
+        """檢查所有玩家是否已選擇繪圖"""
+        return self._all_done(round, 'selected')
 
     def generate_show_art_order(self):
         """生成繪圖展示順序"""
@@ -203,13 +375,17 @@ class Room:
         self.show_art_order = random.sample(
             [player.id for player in self.players], len(self.players))
 
+    def start_drawing_timer(self):
+        """記錄本回合繪圖截止時間"""
+        self.drawing_deadline = time.time() + self.gameConfig.DRAWING_TIME_LIMIT
+
     def start_second_round(self):
         """開始第二輪繪圖"""
         self.current_round = 2
 
     def start_voting(self):
         """開始投票階段"""
-        self.phase = 'voting'
+        self.phase = self.phaseName.index('voting')
 
     def get_all_drawings(self):
         """獲取所有繪圖作品"""
@@ -225,6 +401,40 @@ class Room:
                 })
         return all_drawings
 
+    def build_gallery(self) -> List[Dict]:
+        """打包畫廊資料快照，回傳畫廊目錄（不含各玩家的繪圖資料）"""
+        self.gallery = [
+            {
+                'page': page,
+                'player_id': player.id,
+                'player_name': player.name,
+                'gallery_data': [data.pack_for_gallery() for data in player.submitted_data]
+            }
+            for page, player in enumerate(self.players)
+        ]
+        return [
+            {
+                'page': item['page'],
+                'player_id': item['player_id'],
+                'player_name': item['player_name'],
+                'entry_count': len(item['gallery_data']),
+                # 各回合選出的圖片ID，前端先以縮圖顯示畫廊格子
+                'thumbnails': [
+                    data['image_ids'][data['selectedImage']]
+                    for data in item['gallery_data']
+                    if data['selectedImage'] is not None
+                    and data['selectedImage'] < len(data['image_ids'])
+                ]
+            }
+            for item in self.gallery
+        ]
+
+    def get_gallery_page(self, page: int) -> Optional[Dict]:
+        """獲取畫廊中單一玩家的繪圖資料"""
+        if 0 <= page < len(self.gallery):
+            return self.gallery[page]
+        return None
+
     def get_spy(self) -> Optional[Player]:
         """獲取間諜玩家"""
         for player in self.players:
@@ -232,8 +442,20 @@ class Room:
                 return player
         return None
 
+    def image_ids(self) -> set:
+        """房間引用的所有圖片ID（含已離開玩家與畫廊快照）"""
+        image_ids = set(self.retired_image_ids)
+        for player in self.players:
+            for data in player.submitted_data:
+                image_ids.update(data.image_ids)
+        for page in self.gallery:
+            for data in page['gallery_data']:
+                image_ids.update(data['image_ids'])
+        return image_ids
+
     def reset_for_new_game(self):
-        """重置房間以開始新遊戲"""
+        """重置房間以開始新遊戲（上一局的圖片ID保留到房間回收時釋放）"""
+        self.retired_image_ids = sorted(self.image_ids())
         self.phase = 0
         self.topicCandidates = []
         self.topicVoteCount = []
@@ -243,8 +465,12 @@ class Room:
         self.show_art_order = []
         self.now_showing = 0
         self.timer = None
+        self.drawing_deadline = None
         self.guess_spy_correct = False
+        self.gallery = []
         self.votes = {}
+        self._submissions = {}
+        self._round_counts = {}
         for player in self.players:
             player.is_spy = False
             player.topic_voted = False
@@ -252,33 +478,185 @@ class Room:
 
 
 class GameManager:
-    """遊戲管理器"""
-
-    def __init__(self):
-        self.rooms: Dict[str, Room] = {}
+    """遊戲管理器
+
+    房間狀態存放在可替換的房間儲存中（預設為行程內儲存）。
+    在 transaction() 內讀取的房間會取得房間鎖，離開時寫回儲存；
+    在 transaction() 外讀取的房間只供查看，修改不會被保存（使用行程內儲存時除外）。
+    耗時的外部呼叫（例如送出繪圖工作）以 after_commit() 延到寫回並釋放房間鎖之後。
+
+    寫回房間時更新其最後活動時間，並記入以到期時間排序的最小堆積，
+    expire_rooms() 只需查看堆積頂端即可找出閒置逾時的房間，不必掃描所有房間。
+    到期索引只記錄本行程寫入過的房間（共用 Redis 時其餘房間由 Redis 的存活時間回收）。
+    """
+
+    def __init__(self, store=None, idle_timeout: float = 1800, empty_timeout: float = 60):
+        """
+        Args:
+            store: 房間儲存，未提供時使用行程內儲存
+            idle_timeout: 有玩家的房間閒置多少秒後回收
+            empty_timeout: 沒有玩家的房間閒置多少秒後回收
+        """
+        if store is None:
+            from room_store import MemoryRoomStore
+            store = MemoryRoomStore()
+        self.store = store
+        self.idle_timeout = idle_timeout
+        self.empty_timeout = empty_timeout
+        # 目前 transaction 讀取的房間、持有的鎖與結束後的回呼（ContextVar 在執行緒與 green thread 間各自獨立）
+        self._work: ContextVar[Optional[tuple]] = ContextVar(f'room_work_{id(self)}', default=None)
+        # 到期索引：(到期時間, 房間ID) 的最小堆積，以及各房間目前有效的到期時間
+        self._expiry: List[tuple] = []
+        self._expires_at: Dict[str, float] = {}
+        self._expiry_lock = threading.Lock()
+
+    @property
+    def rooms(self) -> Dict[str, Room]:
+        """所有房間（房間ID -> 房間）"""
+        if hasattr(self.store, 'rooms'):
+            return self.store.rooms
+        rooms = {}
+        for room_id in self.store.room_ids():
+            room = self.store.get(room_id)
+            if room is not None:
+                rooms[room_id] = room
+        return rooms
+
+    @contextmanager
+    def transaction(self):
+        """在此區塊內讀取的房間會被鎖定，結束時寫回房間儲存（可巢狀，由最外層寫回）
+
+        寫回並釋放房間鎖後依序呼叫 after_commit() 登記的回呼（區塊拋出例外時不呼叫）。
+        """
+        if self._work.get() is not None:
+            yield
+            return
+        work, locks, callbacks = {}, ExitStack(), []
+        token = self._work.set((work, locks, callbacks))
+        try:
+            with locks:
+                yield
+                for room in work.values():
+                    if room is not None:
+                        self._touch(room)
+                        self.store.save(room)
+        finally:
+            self._work.reset(token)
+        for callback in callbacks:
+            callback()
+
+    def after_commit(self, callback: Callable[[], None]):
+        """在目前 transaction 寫回房間並釋放房間鎖後呼叫 callback，不在 transaction 中時立即呼叫"""
+        current = self._work.get()
+        if current is None:
+            callback()
+        else:
+            current[2].append(callback)
 
     def add_room(self, room: Room):
         """添加房間"""
-        self.rooms[room.id] = room
+        self._touch(room)
+        self.store.save(room)
+        current = self._work.get()
+        if current is not None:
+            current[0][room.id] = room
 
     def get_room(self, room_id: str) -> Optional[Room]:
         """獲取房間"""
-        return self.rooms.get(room_id)
+        current = self._work.get()
+        if current is None:
+            return self.store.get(room_id)
+        work, locks, _ = current
+        if room_id not in work:
+            locks.enter_context(self.store.lock(room_id))
+            work[room_id] = self.store.get(room_id)
+        return work[room_id]
+
+    def peek_room(self, room_id: str) -> Optional[Room]:
+        """讀取房間但不取得房間鎖（只供查看，修改不會被保存）
+
+        在 transaction() 內處理某個房間時，用來查看其他房間（例如通知其他房間的玩家），
+        避免同時鎖定多個房間；兩個事件以相反順序鎖定房間時會互相等待到鎖逾時。
+        """
+        current = self._work.get()
+        if current is not None and room_id in current[0]:
+            return current[0][room_id]
+        return self.store.get(room_id)
 
     def remove_room(self, room_id: str):
         """移除房間"""
-        if room_id in self.rooms:
-            del self.rooms[room_id]
+        self.store.delete(room_id)
+        with self._expiry_lock:
+            self._expires_at.pop(room_id, None)
+        current = self._work.get()
+        if current is not None:
+            current[0][room_id] = None
+
+    def _touch(self, room: Room):
+        """記錄房間有新活動"""
+        room.last_active = time.time()
+        self._index(room)
+
+    def _index(self, room: Room):
+        """依房間的最後活動時間更新到期索引（舊項目留在堆積中，取出時略過）"""
+        timeout = self.idle_timeout if room.players else self.empty_timeout
+        expires_at = room.last_active + timeout
+        with self._expiry_lock:
+            self._expires_at[room.id] = expires_at
+            heapq.heappush(self._expiry, (expires_at, room.id))
+            if len(self._expiry) > 2 * len(self._expires_at) + 64:
+                self._expiry = [(t, room_id) for room_id, t in self._expires_at.items()]
+                heapq.heapify(self._expiry)
+
+    def next_expiry(self) -> Optional[float]:
+        """最早到期的房間的到期時間（time.time()），沒有房間時回傳 None"""
+        with self._expiry_lock:
+            while self._expiry:
+                expires_at, room_id = self._expiry[0]
+                if self._expires_at.get(room_id) == expires_at:
+                    return expires_at
+                heapq.heappop(self._expiry)
+        return None
+
+    def tracked_room_count(self) -> int:
+        """到期索引中的房間數"""
+        with self._expiry_lock:
+            return len(self._expires_at)
+
+    def expire_rooms(self, now: Optional[float] = None) -> List[Room]:
+        """移除閒置逾時的房間並回傳，由呼叫端釋放房間的圖片等資源"""
+        now = time.time() if now is None else now
+        expired = []
+        while True:
+            with self._expiry_lock:
+                if not self._expiry or self._expiry[0][0] > now:
+                    break
+                expires_at, room_id = heapq.heappop(self._expiry)
+                if self._expires_at.get(room_id) != expires_at:
+                    continue
+                del self._expires_at[room_id]
+            with self.store.lock(room_id):
+                room = self.store.get(room_id)
+                if room is None:
+                    continue
+                if room.last_active + (self.idle_timeout if room.players
+                                       else self.empty_timeout) > now:
+                    # 其他 worker 剛更新過這個房間
+                    self._index(room)
+                    continue
+                self.store.delete(room_id)
+            expired.append(room)
+        return expired
 
     def get_room_count(self) -> int:
         """獲取房間總數"""
-        return len(self.rooms)
+        return len(self.store)
 
     def get_active_rooms(self) -> List[Dict]:
         """獲取活躍房間列表"""
         active_rooms = []
         for room in self.rooms.values():
-            if room.phase != 'ended':
+            if room.phase_name != 'ended':
                 active_rooms.append({
                     'id': room.id,
                     'player_count': len(room.players),
@@ -293,7 +671,7 @@ class GameManager:
         empty_rooms = [room_id for room_id,
                        room in self.rooms.items() if len(room.players) == 0]
         for room_id in empty_rooms:
-            del self.rooms[room_id]
+            self.store.delete(room_id)
 
     def cleanup_old_rooms(self, max_age_hours: int = 24):
         """清理過舊的房間"""
@@ -306,29 +684,7 @@ class GameManager:
                 old_rooms.append(room_id)
 
         for room_id in old_rooms:
-            del self.rooms[room_id]
-
-# 遊戲配置
-
-
-class GameConfig:
-    """遊戲配置類別"""
-    MIN_PLAYERS = 3
-    MAX_PLAYERS = 8
-    DRAWING_ROUNDS = 2
-    SHOW_ART_TIME_LIMIT = 10
-    VOTING_TIME_LIMIT = 60  # 秒
-    DRAWING_TIME_LIMIT = 120  # 秒
-    SPY_GUESS_TIME_LIMIT = 30  # 秒
-    GAME_STAGES = ['waiting', 'voting_topic', 'show_topic', 'drawing', 'show_art',
-                   'drawing', 'show_art', 'voting', 'spy_guess', 'ended']
-
-    # 頭像配置
-    AVATAR_COUNT = 12
-
-    # 提詞限制
-    MAX_PROMPT_LENGTH = 30
-    MIN_PROMPT_LENGTH = 5
+            self.store.delete(room_id)
 
 # 遊戲統計
 
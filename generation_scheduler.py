@@ -0,0 +1,237 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchDeferred(Exception):
+    """暫時無法送出工作（例如沒有可用後端），工作留在佇列中稍後重試"""
+
+
+class GenerationJob:
+    """單次繪圖生成工作"""
+
+    def __init__(self, room_id: str, player_id: str, round: int, workflow: dict, deadline: float):
+        """
+        Args:
+            room_id: 房間ID
+            player_id: 玩家ID
+            round: 回合數
+            workflow: 要送出的 ComfyUI 工作流程
+            deadline: 本回合繪圖截止時間（time.time()）
+        """
+        self.room_id = room_id
+        self.player_id = player_id
+        self.round = round
+        self.workflow = workflow
+        self.deadline = deadline
+        self.submitted_at = time.time()
+        self.dispatched_at: Optional[float] = None
+        self.prompt_id: Optional[str] = None
+        self.backend: Optional[str] = None  # 負責此工作的 ComfyUI 後端
+        self.position: Optional[int] = None  # 最後一次回報給玩家的排隊位置
+
+    @property
+    def key(self) -> Tuple[str, str, int]:
+        return (self.room_id, self.player_id, self.round)
+
+
+class GenerationScheduler:
+    """ComfyUI 繪圖工作排程器
+
+    - 各房間各自排隊，房間之間輪流送出，避免單一房間佔滿 GPU 佇列
+    - 限制同時送到 ComfyUI 的工作數量
+    - 截止時間逼近的工作優先送出
+    - 回報每個工作的排隊位置
+
+    排程器本身不建立執行緒：狀態改變（提交、完成）時立即分派，
+    另由呼叫端定期呼叫 tick() 處理逾時與排隊位置更新。
+    """
+
+    def __init__(self,
+                 dispatch: Callable[[GenerationJob], str],
+                 max_in_flight: int = 2,
+                 urgent_window: float = 30,
+                 job_timeout: float = 300,
+                 on_position: Optional[Callable[[GenerationJob, int], None]] = None,
+                 on_error: Optional[Callable[[GenerationJob, Exception], None]] = None,
+                 on_release: Optional[Callable[[GenerationJob], None]] = None):
+        """
+        Args:
+            dispatch: 將工作送到 ComfyUI 的函式，回傳 prompt_id；
+                拋出 DispatchDeferred 表示稍後重試
+            max_in_flight: 同時送到 ComfyUI 的工作上限
+            urgent_window: 距離截止時間少於此秒數的工作優先送出
+            job_timeout: 已送出但遲遲未完成的工作，超過此秒數即釋放名額
+            on_position: 排隊位置改變時的回呼（0 表示正在繪圖）
+            on_error: 送出失敗時的回呼
+            on_release: 已送出的工作完成或逾時後的回呼
+        """
+        self.dispatch = dispatch
+        self.max_in_flight = max_in_flight
+        self.urgent_window = urgent_window
+        self.job_timeout = job_timeout
+        self.on_position = on_position
+        self.on_error = on_error
+        self.on_release = on_release
+
+        self._lock = threading.Lock()
+        self._rooms: Dict[str, Deque[GenerationJob]] = {}  # 各房間尚未送出的工作
+        self._last_served: Dict[str, int] = {}  # 各房間最後一次被分派的序號（輪流依據）
+        self._serve_seq = 0
+        self._in_flight: Dict[Tuple[str, str, int], GenerationJob] = {}
+
+    def submit(self, job: GenerationJob):
+        """提交繪圖工作"""
+        with self._lock:
+            self._rooms.setdefault(job.room_id, deque()).append(job)
+        logger.info(f'繪圖工作排入佇列: room={job.room_id}, player={job.player_id}, round={job.round}')
+        self._pump()
+        self._report_positions()
+
+    def complete(self, room_id: str, player_id: str, round: int):
+        """標記工作完成，釋放名額"""
+        with self._lock:
+            job = self._in_flight.pop((room_id, player_id, round), None)
+        if job:
+            logger.info(f'繪圖工作完成: room={room_id}, player={player_id}, '
+                        f'耗時 {time.time() - job.submitted_at:.1f} 秒')
+            self._release(job)
+            self._pump()
+            self._report_positions()
+
+    def cancel_room(self, room_id: str):
+        """移除房間所有尚未送出的工作"""
+        with self._lock:
+            self._rooms.pop(room_id, None)
+            self._last_served.pop(room_id, None)
+
+    def tick(self, queue_size_before: Optional[Callable[[GenerationJob], int]] = None):
+        """定期呼叫：釋放逾時工作、重試延後的工作並更新排隊位置
+
+        Args:
+            queue_size_before: 查詢已送出工作在 ComfyUI 佇列中前方數量的函式，
+                用於計算已送出工作的實際排隊位置
+        """
+        now = time.time()
+        with self._lock:
+            stale = [job for job in self._in_flight.values()
+                     if now - job.dispatched_at > self.job_timeout]
+            for job in stale:
+                logger.warning(f'繪圖工作逾時，釋放名額: {job.key}')
+                del self._in_flight[job.key]
+        for job in stale:
+            self._release(job)
+        self._pump()
+        self._report_positions(queue_size_before)
+
+    def in_flight_prompt_ids(self) -> List[str]:
+        """已送出工作的 prompt_id"""
+        with self._lock:
+            return [job.prompt_id for job in self._in_flight.values() if job.prompt_id]
+
+    def pending_count(self) -> int:
+        """尚未送出的工作數"""
+        with self._lock:
+            return sum(len(jobs) for jobs in self._rooms.values())
+
+    def _pick(self, rooms: Dict[str, Deque[GenerationJob]], last_served: Dict[str, int],
+              seq: int, now: float) -> Optional[GenerationJob]:
+        """依排程規則從 rooms 取出下一個工作（需持有鎖）"""
+        if not rooms:
+            return None
+        # 截止時間逼近的房間優先，其次輪到最久沒被分派的房間
+        urgent = [(jobs[0].deadline, room_id) for room_id, jobs in rooms.items()
+                  if jobs[0].deadline - now <= self.urgent_window]
+        if urgent:
+            room_id = min(urgent)[1]
+        else:
+            room_id = min(rooms, key=lambda r: last_served.get(r, -1))
+        jobs = rooms[room_id]
+        job = jobs.popleft()
+        if not jobs:
+            del rooms[room_id]
+        last_served[room_id] = seq
+        return job
+
+    def _release(self, job: GenerationJob):
+        if self.on_release:
+            try:
+                self.on_release(job)
+            except Exception as e:
+                logger.error(f'釋放繪圖工作失敗: {e}')
+
+    def _pump(self):
+        """在名額允許下分派工作"""
+        while True:
+            with self._lock:
+                if len(self._in_flight) >= self.max_in_flight:
+                    return
+                job = self._pick(self._rooms, self._last_served, self._serve_seq, time.time())
+                if job is None:
+                    return
+                self._serve_seq += 1
+                job.dispatched_at = time.time()
+                self._in_flight[job.key] = job
+            # 送出工作時不持有排程器的鎖，避免 HTTP 請求阻塞其他提交
+            # （submit／complete 的呼叫端也不應持有房間鎖，app.py 在房間交易結束後才呼叫）
+            try:
+                job.prompt_id = self.dispatch(job)
+                logger.info(f'繪圖工作已送出: {job.key} -> {job.prompt_id}')
+            except DispatchDeferred as e:
+                logger.info(f'繪圖工作延後送出: {job.key}: {e}')
+                with self._lock:
+                    self._in_flight.pop(job.key, None)
+                    self._rooms.setdefault(job.room_id, deque()).appendleft(job)
+                return
+            except Exception as e:
+                logger.error(f'繪圖工作送出失敗: {job.key}: {e}')
+                with self._lock:
+                    self._in_flight.pop(job.key, None)
+                if self.on_error:
+                    self.on_error(job, e)
+
+    def _dispatch_order(self) -> List[GenerationJob]:
+        """模擬排程規則，預估尚未送出工作的送出順序（需持有鎖）"""
+        rooms = {room_id: deque(jobs) for room_id, jobs in self._rooms.items()}
+        last_served = dict(self._last_served)
+        seq = self._serve_seq
+        now = time.time()
+        order = []
+        job = self._pick(rooms, last_served, seq, now)
+        while job is not None:
+            order.append(job)
+            seq += 1
+            job = self._pick(rooms, last_served, seq, now)
+        return order
+
+    def _report_positions(self, queue_size_before: Optional[Callable[[GenerationJob], int]] = None):
+        """計算並回報排隊位置（只回報有變動的工作）"""
+        if not self.on_position:
+            return
+        with self._lock:
+            positions = []
+            ahead = 0
+            for job in self._in_flight.values():
+                position = 0
+                if queue_size_before is not None and job.prompt_id:
+                    try:
+                        position = queue_size_before(job)
+                    except ValueError:
+                        position = 0  # 已不在佇列中（執行完畢，等待回傳圖片）
+                ahead = max(ahead, position)
+                positions.append((job, position))
+            for index, job in enumerate(self._dispatch_order()):
+                positions.append((job, ahead + index + 1))
+            changed = [(job, position) for job, position in positions if job.position != position]
+            for job, position in changed:
+                job.position = position
+        for job, position in changed:
+            try:
+                self.on_position(job, position)
+            except Exception as e:
+                logger.error(f'回報排隊位置失敗: {e}')
+
@@ -0,0 +1,43 @@
+"""gunicorn 設定（正式環境）
+
+用法：
+    gunicorn -c gunicorn.conf.py
+    SERVER_WORKER_CLASS=gthread SERVER_THREADS=200 gunicorn -c gunicorn.conf.py
+
+Socket.IO 的連線狀態保存在行程內，gunicorn 無法把同一連線的請求固定送到同一個
+worker，因此每個 gunicorn 只啟動一個 worker；要使用多核心時以分片模式啟動多個
+gunicorn（見 serve.py 與 deploy/nginx_shards.conf）。
+
+worker 類型：
+- eventlet（預設）：協程模式，一個行程可處理大量 WebSocket 連線
+- gthread：執行緒模式，每個 WebSocket 連線佔用一個執行緒；pull 模式
+  （COMFY_RESULT_MODE=pull）在背景執行緒中執行 asyncio 事件迴圈，應使用此模式
+"""
+import os
+
+# Socket.IO 對應的非同步模式
+ASYNC_MODES = {'eventlet': 'eventlet', 'gthread': 'threading'}
+
+worker_class = os.environ.get('SERVER_WORKER_CLASS', 'eventlet')
+if worker_class not in ASYNC_MODES:
+    raise ValueError(f'不支援的 worker 類型: {worker_class}（可用: {", ".join(ASYNC_MODES)}）')
+# 設定在匯入 app 前（worker 啟動時才載入 app），讓 Socket.IO 與 worker 使用相同的模式
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', ASYNC_MODES[worker_class])
+
+wsgi_app = 'app:create_app()'
+workers = 1
+threads = int(os.environ.get('SERVER_THREADS', 100))  # gthread：同時處理的連線數
+worker_connections = int(os.environ.get('SERVER_CONNECTIONS', 1000))  # eventlet
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:" \
+       f"{os.environ.get('PORT', 5566 + int(os.environ.get('SHARD_ID', 0)))}"
+# 遊戲只接受 HTTPS 請求（反向代理也以 HTTPS 轉送到 worker）
+certfile = os.environ.get('TLS_CERTFILE', 'server.crt')
+keyfile = os.environ.get('TLS_KEYFILE', 'server.key')
+
+# 長輪詢請求最長約 25 秒，逾時需大於此值
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+reload = False
+accesslog = os.environ.get('SERVER_ACCESS_LOG') or None  # 設為 - 時輸出到標準輸出
+loglevel = os.environ.get('SERVER_LOG_LEVEL', 'info')
@@ -0,0 +1,236 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows：只在行程內互斥
+    fcntl = None
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """內容定址圖片儲存：以內容雜湊作為圖片ID，同一張圖只寫入磁碟一次
+
+    寫入時另外產生縮圖（各尺寸皆有 WebP 與 JPEG），與原圖放在同一目錄；
+    縮圖編碼是 CPU 密集工作，交給 offload 執行（例如 eventlet 的 tpool）。
+
+    同一張圖可能被多個房間引用，以擁有者（房間ID）記錄引用：put(data, owner) 加入引用，
+    release(image_id, owner) 移除引用，最後一個擁有者釋放時才刪除檔案。
+    引用記錄在磁碟上（原圖旁的 .refs 目錄），同一台主機的多個 worker 共用。
+    """
+
+    ID_LENGTH = 20  # sha256 十六進位前 20 碼
+    # 縮圖尺寸名稱 -> 最長邊像素
+    RENDITIONS = {'thumb': 128, 'display': 768}
+    # 縮圖格式 -> (PIL 格式, MIME 類型, 儲存參數)
+    RENDITION_FORMATS = {
+        'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+        'jpg': ('JPEG', 'image/jpeg', {'quality': 85, 'progressive': True}),
+    }
+    # 檔案開頭 -> MIME 類型（檔案不帶副檔名，依內容判斷）
+    _SIGNATURES = (
+        (b'\xff\xd8\xff', 'image/jpeg'),
+        (b'\x89PNG\r\n\x1a\n', 'image/png'),
+        (b'GIF8', 'image/gif'),
+    )
+    _ID_PATTERN = re.compile(r'^[0-9a-f]{%d}$' % ID_LENGTH)
+    _OWNER_PATTERN = re.compile(r'^[\w-]{1,64}$')
+
+    def __init__(self, root: str, offload: Optional[Callable] = None):
+        """
+        初始化圖片儲存
+
+        Args:
+            root: 儲存根目錄
+            offload: 以 offload(函式, *參數) 執行寫入與縮圖編碼並回傳結果，None 時直接執行
+        """
+        self.root = root
+        self._offload = offload or (lambda fn, *args: fn(*args))
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @classmethod
+    def make_id(cls, data: bytes) -> str:
+        """根據圖片內容計算圖片ID"""
+        return hashlib.sha256(data).hexdigest()[:cls.ID_LENGTH]
+
+    @classmethod
+    def is_valid_id(cls, image_id: str) -> bool:
+        """檢查圖片ID格式（避免路徑穿越）"""
+        return isinstance(image_id, str) and bool(cls._ID_PATTERN.match(image_id))
+
+    def path(self, image_id: str) -> str:
+        """取得圖片在磁碟上的路徑（以前兩碼分目錄，避免單一資料夾檔案過多）"""
+        if not self.is_valid_id(image_id):
+            raise ValueError(f'無效的圖片ID: {image_id}')
+        return os.path.join(self.root, image_id[:2], image_id)
+
+    def rendition_path(self, image_id: str, size: str, fmt: str) -> str:
+        """取得縮圖在磁碟上的路徑"""
+        if size not in self.RENDITIONS or fmt not in self.RENDITION_FORMATS:
+            raise ValueError(f'無效的縮圖規格: {size}.{fmt}')
+        return f'{self.path(image_id)}.{size}.{fmt}'
+
+    def refs_path(self, image_id: str) -> str:
+        """記錄引用者的目錄（每個擁有者一個空檔案）"""
+        return f'{self.path(image_id)}.refs'
+
+    @contextmanager
+    def _locked(self, image_id: str):
+        """同一子目錄內的引用增減與刪除互斥（跨行程以 flock）"""
+        directory = os.path.dirname(self.path(image_id))
+        os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            with self._lock:
+                yield
+            return
+        with open(os.path.join(directory, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _add_ref(self, image_id: str, owner: str) -> bool:
+        """加入引用，回傳原圖是否已存在（之後的 release 不會刪除這張圖）"""
+        if not self._OWNER_PATTERN.match(owner):
+            raise ValueError(f'無效的圖片擁有者: {owner}')
+        with self._locked(image_id):
+            refs = self.refs_path(image_id)
+            os.makedirs(refs, exist_ok=True)
+            open(os.path.join(refs, owner), 'a').close()
+            return os.path.exists(self.path(image_id))
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        """先寫入暫存檔再原子性改名，避免讀到寫一半的檔案"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put(self, data: bytes, owner: Optional[str] = None) -> str:
+        """寫入圖片與縮圖並回傳圖片ID，內容相同的圖片不會重複寫入
+
+        Args:
+            data: 圖片內容
+            owner: 引用這張圖的擁有者（房間ID），之後以 release 釋放
+        """
+        image_id = self.make_id(data)
+        if owner is not None:
+            exists = self._add_ref(image_id, owner)
+        else:
+            exists = os.path.exists(self.path(image_id))
+        if not exists:
+            self._offload(self._store, image_id, data)
+        return image_id
+
+    def _store(self, image_id: str, data: bytes):
+        """寫入原圖與縮圖"""
+        self._write(self.path(image_id), data)
+        logger.info(f'圖片已儲存: {image_id} ({len(data)} bytes)')
+        self._write_renditions(image_id, data)
+
+    def _write_renditions(self, image_id: str, data: bytes):
+        """產生各尺寸、各格式的縮圖（失敗時仍保留原圖）"""
+        try:
+            original = Image.open(io.BytesIO(data)).convert('RGB')
+        except Exception as e:
+            logger.warning(f'無法產生縮圖: {image_id}: {e}')
+            return
+        for size, max_side in self.RENDITIONS.items():
+            img = original.copy()
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+            for fmt, (pil_format, _, options) in self.RENDITION_FORMATS.items():
+                buf = io.BytesIO()
+                img.save(buf, format=pil_format, **options)
+                self._write(self.rendition_path(image_id, size, fmt), buf.getvalue())
+
+    def find_rendition(self, image_id: str, size: str, formats: List[str]) -> Optional[tuple]:
+        """依偏好順序找出已存在的縮圖
+
+        Returns:
+            (路徑, MIME 類型)，都不存在時回傳 None
+        """
+        if not self.is_valid_id(image_id) or size not in self.RENDITIONS:
+            return None
+        for fmt in formats:
+            path = self.rendition_path(image_id, size, fmt)
+            if os.path.exists(path):
+                return path, self.RENDITION_FORMATS[fmt][1]
+        return None
+
+    def exists(self, image_id: str) -> bool:
+        """檢查圖片是否存在"""
+        return self.is_valid_id(image_id) and os.path.exists(self.path(image_id))
+
+    def mimetype(self, image_id: str) -> str:
+        """依檔案開頭判斷圖片的 MIME 類型"""
+        with open(self.path(image_id), 'rb') as f:
+            head = f.read(12)
+        for signature, mimetype in self._SIGNATURES:
+            if head.startswith(signature):
+                return mimetype
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return 'image/webp'
+        return 'application/octet-stream'
+
+    def get(self, image_id: str) -> Optional[bytes]:
+        """讀取圖片內容，不存在時回傳 None"""
+        if not self.exists(image_id):
+            return None
+        with open(self.path(image_id), 'rb') as f:
+            return f.read()
+
+    def get_many(self, image_ids: List[str]) -> List[Optional[bytes]]:
+        """依序讀取多張圖片"""
+        return [self.get(image_id) for image_id in image_ids]
+
+    def release(self, image_id: str, owner: str) -> int:
+        """移除擁有者的引用，沒有其他擁有者時刪除圖片，回傳釋放的位元組數"""
+        if not self.is_valid_id(image_id) or not self._OWNER_PATTERN.match(owner):
+            return 0
+        with self._locked(image_id):
+            refs = self.refs_path(image_id)
+            try:
+                os.remove(os.path.join(refs, owner))
+            except FileNotFoundError:
+                pass
+            try:
+                os.rmdir(refs)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                return 0  # 仍有其他擁有者引用
+            return self.delete(image_id)
+
+    def delete(self, image_id: str) -> int:
+        """刪除圖片與其縮圖，回傳釋放的位元組數
+
+        圖片以內容定址，不檢查引用；有擁有者的圖片應改用 release
+        """
+        if not self.is_valid_id(image_id):
+            return 0
+        paths = [self.path(image_id)] + [
+            self.rendition_path(image_id, size, fmt)
+            for size in self.RENDITIONS for fmt in self.RENDITION_FORMATS]
+        freed = 0
+        for path in paths:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            freed += size
+        return freed
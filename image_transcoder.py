@@ -0,0 +1,151 @@
+import io
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+JPEG_EXTENSIONS = ('jpg', 'jpeg')
+# 工作池模式：auto 在 eventlet 下使用 tpool，否則使用執行緒池
+TRANSCODE_MODES = ('auto', 'thread', 'tpool', 'process')
+
+
+class TranscoderBusy(Exception):
+    """轉檔佇列已滿，請稍後重試"""
+
+
+def transcode_to_jpeg(images: List[Tuple[str, bytes]],
+                      quality: int = 75,
+                      progressive: bool = False,
+                      subsampling: Optional[Union[int, str]] = None) -> List[Optional[bytes]]:
+    """將一批圖片轉為 JPEG（已是 JPEG 的直接沿用），轉檔失敗的位置為 None
+
+    Args:
+        images: (檔名, 圖片內容) 列表
+        quality: JPEG 品質（1-95）
+        progressive: 是否輸出漸進式 JPEG
+        subsampling: 色度抽樣（0=4:4:4、1=4:2:2、2=4:2:0），None 為 PIL 預設
+    """
+    options = {'quality': quality, 'progressive': progressive}
+    if subsampling is not None:
+        options['subsampling'] = subsampling
+    results = []
+    for filename, data in images:
+        try:
+            if filename.rsplit('.', 1)[-1].lower() in JPEG_EXTENSIONS:
+                results.append(data)
+                continue
+            img = Image.open(io.BytesIO(data)).convert('RGB')
+            buf = io.BytesIO()
+            img.save(buf, format='JPEG', **options)
+            results.append(buf.getvalue())
+        except Exception as e:
+            logger.info(f'圖片轉檔失敗: {filename}, 錯誤: {str(e)}')
+            results.append(None)
+    return results
+
+
+def eventlet_patched() -> bool:
+    """執行緒是否已被 eventlet 換成協程（gunicorn 的 eventlet worker 會 monkey patch）"""
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched('thread')
+
+
+def run_off_hub(fn, *args):
+    """執行 CPU 密集的函式並等待結果：eventlet 下交給 tpool，事件迴圈在等待期間繼續運作"""
+    if eventlet_patched():
+        from eventlet import tpool
+        return tpool.execute(fn, *args)
+    return fn(*args)
+
+
+class TpoolExecutor(ThreadPoolExecutor):
+    """在 eventlet 的 tpool（真正的作業系統執行緒）中執行工作
+
+    monkey patch 後 ThreadPoolExecutor 的執行緒只是協程，CPU 密集的編碼仍會卡住
+    事件迴圈；這裡的協程只負責等待 tpool 執行完畢。
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        from eventlet import tpool
+        return super().submit(tpool.execute, fn, *args, **kwargs)
+
+
+def create_executor(mode: str, max_workers: int):
+    """依模式建立工作池（auto：eventlet 下為 tpool，否則為執行緒池）"""
+    if mode not in TRANSCODE_MODES:
+        raise ValueError(f'不支援的轉檔模式: {mode}（可用: {", ".join(TRANSCODE_MODES)}）')
+    if mode == 'auto':
+        mode = 'tpool' if eventlet_patched() else 'thread'
+    elif mode == 'process' and eventlet_patched():
+        # ProcessPoolExecutor 的管理執行緒與管線在 monkey patch 後會卡住
+        logger.warning('eventlet 下無法使用行程池，改用 tpool')
+        mode = 'tpool'
+    logger.info(f'轉檔工作池模式: {mode}（{max_workers} 個工作）')
+    if mode == 'tpool':
+        return TpoolExecutor(max_workers=max_workers)
+    if mode == 'process':
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers)
+
+
+class ImageTranscoder:
+    """圖片轉檔工作池
+
+    轉檔是 CPU 密集工作，放在請求處理之外執行，避免卡住 eventlet 的事件迴圈。
+    等待中的工作數有上限，超過時 submit 直接拋出 TranscoderBusy 讓呼叫端回覆稍後重試。
+    """
+
+    def __init__(self,
+                 max_workers: int = 2,
+                 max_pending: int = 16,
+                 quality: int = 75,
+                 progressive: bool = False,
+                 subsampling: Optional[Union[int, str]] = None,
+                 mode: str = 'auto'):
+        """
+        Args:
+            max_workers: 同時轉檔的工作數
+            max_pending: 排隊中加執行中的工作上限
+            quality: JPEG 品質
+            progressive: 是否輸出漸進式 JPEG
+            subsampling: 色度抽樣，None 為 PIL 預設
+            mode: 工作池模式（見 TRANSCODE_MODES）：thread 為執行緒池、tpool 為 eventlet
+                的作業系統執行緒池、process 為行程池（可用多核心）、auto 依環境選擇
+        """
+        self.max_pending = max_pending
+        self.quality = quality
+        self.progressive = progressive
+        self.subsampling = subsampling
+        self._executor = create_executor(mode, max_workers)
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, images: List[Tuple[str, bytes]]) -> Future:
+        """提交一批圖片轉檔
+
+        Returns:
+            Future，結果為與 images 對應的 JPEG 內容列表（失敗者為 None）
+
+        Raises:
+            TranscoderBusy: 佇列已滿
+        """
+        if not self._slots.acquire(blocking=False):
+            raise TranscoderBusy(f'轉檔佇列已滿（{self.max_pending}）')
+        try:
+            future = self._executor.submit(
+                transcode_to_jpeg, images, self.quality, self.progressive, self.subsampling)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self):
+        """停止工作池"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,129 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseScheduler:
+    """所有房間共用的階段截止時間排程器
+
+    以單一執行緒與最小堆積管理所有房間的截止時間，取代每個等待各開一個
+    背景任務的作法。每個房間同時只有一個有效的截止時間：重新排程會取代
+    舊的，階段提前結束時呼叫 cancel() 取消。被取代或取消的項目不會立即
+    從堆積移除，輪到它時直接略過（堆積中的無效項目過多時才整理一次）。
+
+    回呼在排程器執行緒上依序執行，應盡快完成。
+    eventlet 等協程模式下傳入 start_background_task 與 sleep（例如 socketio 的同名函式），
+    排程改在背景任務中執行，等待時以 sleep 短暫讓出事件迴圈再重新檢查，不阻塞同一執行緒上的其他任務。
+    """
+
+    def __init__(self,
+                 start_background_task: Optional[Callable[[Callable[[], None]], object]] = None,
+                 sleep: Optional[Callable[[float], None]] = None,
+                 poll_interval: float = 0.05):
+        """
+        Args:
+            start_background_task: 啟動排程迴圈的函式，未提供時使用 daemon 執行緒
+            sleep: 協程模式下等待時使用的 sleep 函式，未提供時以條件變數阻塞等待
+            poll_interval: 使用 sleep 時重新檢查新截止時間的間隔（秒）
+        """
+        self.start_background_task = start_background_task
+        self.sleep = sleep
+        self.poll_interval = poll_interval
+        self._heap: List[Tuple[float, int, str, Callable[[], None]]] = []
+        self._current: Dict[str, Tuple[int, float]] = {}  # 房間ID -> (有效的排程序號, 截止時間)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, room_id: str, delay: float, callback: Callable[[], None]) -> float:
+        """設定房間的截止時間（取代既有的），回傳截止時間（time.monotonic()）"""
+        when = time.monotonic() + delay
+        with self._cond:
+            seq = next(self._seq)
+            self._current[room_id] = (seq, when)
+            heapq.heappush(self._heap, (when, seq, room_id, callback))
+            if len(self._heap) > 2 * len(self._current) + 64:
+                self._compact()
+            if self._heap[0][1] == seq:
+                # 新的截止時間最早，喚醒排程執行緒重新計算等待時間
+                self._cond.notify()
+        return when
+
+    def cancel(self, room_id: str) -> bool:
+        """取消房間的截止時間，回傳是否有被取消的項目"""
+        with self._cond:
+            return self._current.pop(room_id, None) is not None
+
+    def remaining(self, room_id: str) -> Optional[float]:
+        """房間距離截止時間的秒數，沒有截止時間時回傳 None"""
+        with self._cond:
+            entry = self._current.get(room_id)
+        if entry is None:
+            return None
+        return max(0.0, entry[1] - time.monotonic())
+
+    def pending_count(self) -> int:
+        """有截止時間的房間數"""
+        with self._cond:
+            return len(self._current)
+
+    def start(self):
+        """啟動排程執行緒（重複呼叫不會重複啟動）"""
+        with self._cond:
+            if self._thread is None:
+                if self.start_background_task is None:
+                    self._thread = threading.Thread(target=self._run, name='phase-scheduler',
+                                                    daemon=True)
+                    self._thread.start()
+                else:
+                    self._thread = self.start_background_task(self._run)
+
+    def _valid(self, entry) -> bool:
+        current = self._current.get(entry[2])
+        return current is not None and current[0] == entry[1]
+
+    def _compact(self):
+        """移除堆積中已被取代或取消的項目"""
+        self._heap = [entry for entry in self._heap if self._valid(entry)]
+        heapq.heapify(self._heap)
+
+    def _wait(self, timeout: Optional[float]):
+        """等待新的截止時間或逾時（需持有 self._cond）"""
+        if self.sleep is None:
+            self._cond.wait(timeout)
+            return
+        # 協程模式：放開鎖讓出事件迴圈，醒來後由呼叫端重新檢查
+        self._cond.release()
+        try:
+            self.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+        finally:
+            self._cond.acquire()
+
+    def _next_due(self):
+        """等到最早的有效截止時間到期，取出並回傳該項目"""
+        with self._cond:
+            while True:
+                while self._heap and not self._valid(self._heap[0]):
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._wait(None)
+                    continue
+                wait = self._heap[0][0] - time.monotonic()
+                if wait <= 0:
+                    entry = heapq.heappop(self._heap)
+                    del self._current[entry[2]]
+                    return entry
+                self._wait(wait)
+
+    def _run(self):
+        while True:
+            _, _, room_id, callback = self._next_due()
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f'房間 {room_id} 階段逾時處理錯誤: {e}', exc_info=True)
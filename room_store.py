@@ -0,0 +1,216 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Dict, List, Optional
+
+from game_logic import Room
+
+logger = logging.getLogger(__name__)
+
+
+class RoomStore:
+    """房間狀態儲存介面"""
+
+    def get(self, room_id: str) -> Optional[Room]:
+        """讀取房間，不存在時回傳 None"""
+        raise NotImplementedError
+
+    def save(self, room: Room):
+        """寫入房間"""
+        raise NotImplementedError
+
+    def delete(self, room_id: str):
+        """刪除房間"""
+        raise NotImplementedError
+
+    def room_ids(self) -> List[str]:
+        """所有房間ID"""
+        raise NotImplementedError
+
+    def lock(self, room_id: str) -> ContextManager:
+        """房間鎖，持有期間其他 worker 不會修改同一房間"""
+        return nullcontext()
+
+    def __len__(self) -> int:
+        return len(self.room_ids())
+
+
+class RoomLocks:
+    """行程內的房間鎖，每個房間一把，沒有人持有或等待時自動移除
+
+    執行緒模式下直接阻塞等待；eventlet 等協程模式下傳入 sleep（例如 socketio.sleep），
+    等待時改為短暫讓出事件迴圈再重試，避免卡住同一執行緒上的其他 green thread。
+    同一把鎖不可重入。
+    """
+
+    def __init__(self,
+                 sleep: Optional[Callable[[float], None]] = None,
+                 timeout: float = 30,
+                 poll_interval: float = 0.005):
+        """
+        Args:
+            sleep: 協程模式下等待時使用的 sleep 函式，None 表示直接阻塞
+            timeout: 等待鎖的秒數上限，超過時拋出 TimeoutError
+            poll_interval: 協程模式下重試的間隔秒數
+        """
+        self.sleep = sleep
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._locks: Dict[str, list] = {}  # 房間ID -> [鎖, 持有與等待的數量]
+        self._guard = threading.Lock()
+
+    def _acquire(self, lock: threading.Lock) -> bool:
+        if self.sleep is None:
+            return lock.acquire(timeout=self.timeout)
+        deadline = time.monotonic() + self.timeout
+        while not lock.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                return False
+            self.sleep(self.poll_interval)
+        return True
+
+    @contextmanager
+    def lock(self, room_id: str):
+        with self._guard:
+            entry = self._locks.setdefault(room_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            if not self._acquire(entry[0]):
+                raise TimeoutError(f'等待房間鎖逾時: {room_id}')
+            try:
+                yield
+            finally:
+                entry[0].release()
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[room_id]
+
+    def __len__(self) -> int:
+        with self._guard:
+            return len(self._locks)
+
+
+class MemoryRoomStore(RoomStore):
+    """行程內的房間儲存（預設，只適用單一 worker）
+
+    讀取到的就是房間物件本身，修改立即生效，save 不需要做任何事；
+    同一房間的事件以 RoomLocks 依序處理
+    """
+
+    def __init__(self, sleep: Optional[Callable[[float], None]] = None):
+        """
+        Args:
+            sleep: 協程模式下等待房間鎖時使用的 sleep 函式（見 RoomLocks）
+        """
+        self.rooms: Dict[str, Room] = {}
+        self._locks = RoomLocks(sleep)
+
+    def get(self, room_id: str) -> Optional[Room]:
+        return self.rooms.get(room_id)
+
+    def save(self, room: Room):
+        self.rooms[room.id] = room
+
+    def delete(self, room_id: str):
+        self.rooms.pop(room_id, None)
+
+    def room_ids(self) -> List[str]:
+        return list(self.rooms)
+
+    def lock(self, room_id: str) -> ContextManager:
+        return self._locks.lock(room_id)
+
+    def __len__(self) -> int:
+        return len(self.rooms)
+
+
+class RedisRoomStore(RoomStore):
+    """以 Redis 儲存房間狀態，讓多個 worker 共用同一批房間
+
+    房間以 JSON 序列化（計時器等行程內物件不會保存），
+    修改房間前需先以 lock() 取得該房間的分散式鎖。
+    """
+
+    def __init__(self,
+                 url: str,
+                 prefix: str = 'ai-art-spy:',
+                 lock_timeout: float = 30,
+                 room_ttl: int = 24 * 3600,
+                 client=None):
+        """
+        Args:
+            url: Redis 連線網址，例如 redis://127.0.0.1:6379/0
+            prefix: 鍵名前綴
+            lock_timeout: 房間鎖的逾時秒數（持有者當掉時自動釋放）
+            room_ttl: 房間資料保存秒數，每次寫入重新計算
+            client: 已建立的 Redis 客戶端（例如 fakeredis），未提供時依 url 建立
+        """
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImportError('RedisRoomStore 需要安裝 redis 套件: pip install redis')
+            client = redis.Redis.from_url(url)
+        self.redis = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.room_ttl = room_ttl
+        self._index_key = f'{prefix}rooms'
+
+    def _key(self, room_id: str) -> str:
+        return f'{self.prefix}room:{room_id}'
+
+    def get(self, room_id: str) -> Optional[Room]:
+        data = self.redis.get(self._key(room_id))
+        if data is None:
+            return None
+        return Room.from_state(json.loads(data))
+
+    def save(self, room: Room):
+        data = json.dumps(room.to_state(), ensure_ascii=False)
+        pipe = self.redis.pipeline()
+        pipe.set(self._key(room.id), data, ex=self.room_ttl)
+        pipe.sadd(self._index_key, room.id)
+        pipe.execute()
+
+    def delete(self, room_id: str):
+        pipe = self.redis.pipeline()
+        pipe.delete(self._key(room_id))
+        pipe.srem(self._index_key, room_id)
+        pipe.execute()
+
+    def room_ids(self) -> List[str]:
+        room_ids = []
+        for room_id in self.redis.smembers(self._index_key):
+            room_id = room_id.decode() if isinstance(room_id, bytes) else room_id
+            if self.redis.exists(self._key(room_id)):
+                room_ids.append(room_id)
+            else:
+                # 房間資料已過期，順便清掉索引
+                self.redis.srem(self._index_key, room_id)
+        return room_ids
+
+    def lock(self, room_id: str) -> ContextManager:
+        return self.redis.lock(f'{self.prefix}lock:{room_id}',
+                               timeout=self.lock_timeout,
+                               blocking_timeout=self.lock_timeout)
+
+
+def create_room_store(url: Optional[str],
+                      sleep: Optional[Callable[[float], None]] = None) -> RoomStore:
+    """依網址建立房間儲存：未設定時使用行程內儲存，redis:// 使用 Redis
+
+    Args:
+        url: 房間儲存網址
+        sleep: 協程模式下等待行程內房間鎖時使用的 sleep 函式
+    """
+    if not url:
+        return MemoryRoomStore(sleep)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        logger.info(f'房間狀態儲存於 Redis: {url.rsplit("@", 1)[-1]}')
+        return RedisRoomStore(url)
+    raise ValueError(f'不支援的房間儲存網址: {url}')
@@ -0,0 +1,78 @@
+"""正式環境啟動工具：以分片模式啟動多個 gunicorn
+
+每個分片是一個只有單一 worker 的 gunicorn（設定見 gunicorn.conf.py），
+以 SHARD_COUNT / SHARD_ID 區分，監聽 --port + SHARD_ID，前方以
+deploy/nginx_shards.conf 的規則轉送。任一分片結束時停止所有分片。
+
+用法：
+    python serve.py --workers 4
+    python serve.py --workers 2 --worker-class gthread --port 5566
+"""
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_shard(shard_id: int, args) -> subprocess.Popen:
+    env = dict(os.environ,
+               SHARD_COUNT=str(args.workers),
+               SHARD_ID=str(shard_id),
+               PORT=str(args.port + shard_id),
+               SERVER_WORKER_CLASS=args.worker_class)
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py')]
+    logger.info(f'啟動分片 {shard_id}/{args.workers}，埠號 {args.port + shard_id}')
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+def stop_all(processes):
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGTERM)
+    for process in processes:
+        try:
+            process.wait(timeout=35)  # 大於 gunicorn 的 graceful_timeout
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SHARD_COUNT', 1)),
+                        help='分片（gunicorn 行程）數，需與反向代理設定一致')
+    parser.add_argument('--port', type=int, default=5566, help='第一個分片的埠號')
+    parser.add_argument('--worker-class', default=os.environ.get('SERVER_WORKER_CLASS', 'eventlet'),
+                        choices=('eventlet', 'gthread'))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    processes = [start_shard(shard_id, args) for shard_id in range(args.workers)]
+    stopping = False
+
+    def handle_signal(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    try:
+        while not stopping:
+            exited = [i for i, process in enumerate(processes) if process.poll() is not None]
+            if exited:
+                logger.error(f'分片 {exited} 已結束，停止所有分片')
+                break
+            time.sleep(1)
+    finally:
+        stop_all(processes)
+    sys.exit(0 if stopping else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import logging
+import uuid
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ShardMap:
+    """房間分片：每個 worker 只負責自己建立的房間
+
+    房間ID第一碼為建立該房間的分片編號（十六進位），前端與反向代理依此把
+    Socket.IO 連線與 ComfyUI 的 /upload 回傳送到擁有該房間的 worker，
+    房間狀態、計時器都只存在於該 worker 的記憶體中。
+    """
+
+    MAX_SHARDS = 16  # 房間ID第一碼為一個十六進位字元
+
+    def __init__(self, count: int = 1, shard_id: int = 0):
+        """
+        Args:
+            count: 分片（worker）數量，1 表示不分片
+            shard_id: 本 worker 的分片編號（0 ~ count-1）
+        """
+        if not 1 <= count <= self.MAX_SHARDS:
+            raise ValueError(f'分片數量需在 1-{self.MAX_SHARDS} 之間: {count}')
+        if not 0 <= shard_id < count:
+            raise ValueError(f'分片編號需在 0-{count - 1} 之間: {shard_id}')
+        self.count = count
+        self.shard_id = shard_id
+
+    @property
+    def enabled(self) -> bool:
+        return self.count > 1
+
+    def new_room_id(self) -> str:
+        """產生房間ID（分片模式下第一碼為本分片編號）"""
+        room_id = str(uuid.uuid4())[:8].upper()
+        if self.enabled:
+            room_id = f'{self.shard_id:X}{room_id[1:]}'
+        return room_id
+
+    def owner(self, room_id: Optional[str]) -> int:
+        """房間所屬的分片編號（無法判斷時視為本分片）"""
+        if not self.enabled or not room_id:
+            return self.shard_id
+        try:
+            return int(room_id[0], 16) % self.count
+        except ValueError:
+            return self.shard_id
+
+    def owns(self, room_id: Optional[str]) -> bool:
+        """房間是否由本分片負責"""
+        return self.owner(room_id) == self.shard_id
@@ -18,6 +18,24 @@ class AudioManager {
             "gallery"
         ];
         this.nowBackgroundMusic = null;
+        this.format = AudioManager.pickFormat(); // 轉檔音效使用的格式（opus 或 aac）
+        this.clips = {}; // 音效精靈中的音效：名稱 -> { sprite, start, duration }
+        this.spriteData = {}; // 音效精靈網址 -> 尚未解碼的音檔（等待 AudioContext 建立）
+        this.spriteBuffers = {}; // 音效精靈網址 -> 解碼後的 AudioBuffer
+    }
+
+    // 依瀏覽器支援選擇轉檔格式
+    static pickFormat() {
+        const probe = document.createElement('audio');
+        if (probe.canPlayType('audio/webm; codecs="opus"')) return 'opus';
+        if (probe.canPlayType('audio/mp4; codecs="mp4a.40.2"')) return 'aac';
+        return null;
+    }
+
+    // 音效網址可能是單一網址或 { 格式: 網址 }
+    pickUrl(source) {
+        if (typeof source === 'string') return source;
+        return source[this.format] || Object.values(source)[0];
     }
 
     // 初始化音效系統
@@ -36,6 +54,9 @@ class AudioManager {
             this.gainNode.connect(this.audioContext.destination);
             this.gainNode.gain.value = this.volume;
 
+            // 解碼在使用者互動前已下載的音效精靈
+            Object.keys(this.spriteData).forEach(url => this.decodeSprite(url));
+
             this.initialized = true;
             console.log('音效系統初始化完成');
         } catch (error) {
@@ -47,9 +68,9 @@ class AudioManager {
     async loadSounds(fileDict) {
 
         await Promise.all(
-            Object.entries(fileDict).map(([name, url]) => {
+            Object.entries(fileDict).map(([name, source]) => {
                 return new Promise((resolve, reject) => {
-                    const audio = new Audio(url);
+                    const audio = new Audio(this.pickUrl(source));
                     audio.volume = this.volume;
 
                     // 如果是需要重複播放的音效
@@ -58,7 +79,12 @@ class AudioManager {
                     }
 
                     audio.oncanplaythrough = () => {
+                        audio.oncanplaythrough = null;
                         this.sounds[name] = audio;
+                        // 進入階段時背景音樂還在載入：載入完成後補播
+                        if (this.nowBackgroundMusic === name && this.enabled && this.initialized) {
+                            audio.play();
+                        }
                         resolve();
                     };
 
@@ -72,13 +98,68 @@ class AudioManager {
         console.log('所有音效載入完成');
     }
 
+    // 下載音效精靈（多個短音效合併的音檔），以 Web Audio 依起點與長度播放其中的音效
+    async loadSprite(sprite) {
+        const url = this.pickUrl(sprite.files);
+        try {
+            const response = await fetch(url);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            this.spriteData[url] = await response.arrayBuffer();
+            if (this.audioContext) {
+                await this.decodeSprite(url);
+            }
+            for (const [name, [start, duration]] of Object.entries(sprite.clips)) {
+                this.clips[name] = { sprite: url, start, duration };
+            }
+        } catch (error) {
+            console.warn(`無法載入音效精靈 ${url}:`, error);
+        }
+    }
+
+    async decodeSprite(url) {
+        const data = this.spriteData[url];
+        if (!data) return;
+        delete this.spriteData[url];
+        try {
+            this.spriteBuffers[url] = await new Promise((resolve, reject) =>
+                this.audioContext.decodeAudioData(data, resolve, reject));
+        } catch (error) {
+            console.warn(`無法解碼音效精靈 ${url}:`, error);
+        }
+    }
+
+    // 播放音效精靈中的音效，回傳 AudioBufferSourceNode（尚未解碼時回傳 null）
+    playClip(soundName) {
+        const clip = this.clips[soundName];
+        const buffer = this.spriteBuffers[clip.sprite];
+        if (!buffer) return null;
+
+        if (this.audioContext.state === 'suspended') {
+            this.audioContext.resume();
+        }
+        const source = this.audioContext.createBufferSource();
+        source.buffer = buffer;
+        source.connect(this.gainNode);
+        source.start(0, clip.start, clip.duration);
+        return source;
+    }
+
+    hasSound(soundName) {
+        return Boolean(this.sounds[soundName] || this.clips[soundName]);
+    }
+
     // 播放音效
     play(soundName) {
-        if (!this.enabled || !this.initialized || !this.sounds[soundName]) {
+        if (!this.enabled || !this.initialized || !this.hasSound(soundName)) {
             return;
         }
 
         try {
+            if (this.clips[soundName]) {
+                this.playClip(soundName);
+                return;
+            }
+
             // 確保 AudioContext 已恢復
             if (this.audioContext.state === 'suspended') {
                 this.audioContext.resume();
@@ -158,8 +239,9 @@ class AudioManager {
                             this.audioContext.resume();
                         }
 
-                        // 取得音效物件
+                        // 取得音效物件（尚未載入時於載入完成後播放）
                         const audio = this.sounds[soundName];
+                        if (!audio) return;
                         audio.currentTime = 0; // 從頭播放
                         audio.volume = this.volume;
                         audio.play();
@@ -173,8 +255,9 @@ class AudioManager {
                     this.audioContext.resume();
                 }
 
-                // 取得音效物件
+                // 取得音效物件（尚未載入時於載入完成後播放）
                 const audio = this.sounds[soundName];
+                if (!audio) return;
                 audio.currentTime = 0; // 從頭播放
                 audio.volume = this.volume;
                 audio.play();
@@ -187,11 +270,18 @@ class AudioManager {
 
     vinyl_stop() {
         return new Promise((resolve, reject) => {
-            if (!this.enabled || !this.initialized || !this.sounds['vinyl_stop']) {
+            if (!this.enabled || !this.initialized || !this.hasSound('vinyl_stop')) {
                 return reject(new Error('音效系統未啟用或音效未載入'));
             }
 
             try {
+                if (this.clips['vinyl_stop']) {
+                    const source = this.playClip('vinyl_stop');
+                    if (!source) return resolve();
+                    source.onended = () => resolve();
+                    return;
+                }
+
                 // 確保 AudioContext 已恢復
                 if (this.audioContext.state === 'suspended') {
                     this.audioContext.resume();
@@ -313,9 +403,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const soundSlider = document.getElementById('volume');
     const volumeIcon = document.getElementById('volume-icon');
     if (volume > 0) {
-        volumeIcon.src = "../static/images/icons/Speaker.svg";
+        volumeIcon.src = GameUtils.assetUrl("images/icons/Speaker.svg");
     } else {
-        volumeIcon.src = "../static/images/icons/SpeakerMute.svg";
+        volumeIcon.src = GameUtils.assetUrl("images/icons/SpeakerMute.svg");
     }
     soundSlider.value = volume * 100;
 
@@ -350,12 +440,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 window.SFX.pop();
                 if (volume > 0) {
                     if (window.audioManager.lastVolume === 0) {
-                        volumeIcon.src = "../static/images/icons/Speaker.svg"; // 如果 lastVolume 為 0，設為預設值 0.5
+                        volumeIcon.src = GameUtils.assetUrl("images/icons/Speaker.svg"); // 如果 lastVolume 為 0，設為預設值 0.5
                     }
                     window.audioManager.lastVolume = volume; // 只有在非靜音時才更新 lastVolume
                 } else {
                     window.audioManager.lastVolume = volume;
-                    volumeIcon.src = "../static/images/icons/SpeakerMute.svg";
+                    volumeIcon.src = GameUtils.assetUrl("images/icons/SpeakerMute.svg");
                 }
             }
         });
@@ -371,13 +461,13 @@ document.addEventListener('DOMContentLoaded', () => {
                 // 靜音
                 window.audioManager.setVolume(0);
                 soundSlider.value = 0;
-                volumeIcon.src = "../static/images/icons/SpeakerMute.svg";
+                volumeIcon.src = GameUtils.assetUrl("images/icons/SpeakerMute.svg");
             } else {
                 // 恢復到 lastVolume（如果 lastVolume 為 0，則設為預設 0.5）
                 const restoreVolume = window.audioManager.lastVolume > 0 ? window.audioManager.lastVolume : 0.5;
                 window.audioManager.setVolume(restoreVolume);
                 soundSlider.value = restoreVolume * 100;
-                volumeIcon.src = "../static/images/icons/Speaker.svg";
+                volumeIcon.src = GameUtils.assetUrl("images/icons/Speaker.svg");
             }
             if (window.SFX && typeof window.SFX.click === 'function') {
                 window.SFX.click();
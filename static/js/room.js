@@ -36,6 +36,8 @@ class RoomPage {
         this.spyId = null;
 
         this.drawingRound = 1;
+        this.galleryManifest = [];
+        this.galleryPages = {};
 
         this.nowDisplayingContainer = 'room-container';
         this.homepage_container = document.getElementById('homepage-container');
@@ -363,17 +365,17 @@ class RoomPage {
 
 
     handleMyArt(data) {
-        if (Array.isArray(data.image_data)) {
+        if (Array.isArray(data.image_ids)) {
             this.hasChooseArt = false;
             const artworkSelect = document.getElementById('art-select-area');
             if (!artworkSelect) return;
 
             artworkSelect.innerHTML = ''; // 清空之前的內容
-            data.image_data.forEach((imageData, index) => {
+            data.image_ids.forEach((imageId, index) => {
                 const imgdiv = document.createElement('div');
                 imgdiv.className = 'artwork-select-container'; // 可選：添加樣式類名
                 const img = document.createElement('img');
-                img.src = `data:image/jpeg;base64,${imageData}`;
+                img.src = GameUtils.artUrl(imageId, 'display');
                 img.alt = `Artwork ${index + 1}`;
                 img.className = 'artwork-select-image'; // 可選：添加樣式類名
 
@@ -381,7 +383,7 @@ class RoomPage {
                 imgdiv.appendChild(img); // 添加 img 到容器中
 
                 const frameImg = document.createElement('img');
-                frameImg.src = `../static/images/frame/default.webp`;
+                frameImg.src = GameUtils.assetUrl(`images/frame/default.webp`);
                 frameImg.className = 'artwork-select-frame'; // 可選：添加樣式類名
                 frameImg.addEventListener('click', () => {
                     if (this.hasChooseArt) return;
@@ -406,12 +408,12 @@ class RoomPage {
         artShowContent.innerHTML = '';
 
         if (artImage && data.selected_art) {
-            artImage.src = `data:image/jpeg;base64,${data.selected_art}`;
+            artImage.src = GameUtils.artUrl(data.selected_art, 'display');
             artImage.className = 'art-show-image';
             artShowContent.appendChild(artImage);
         }
         const artFrame = document.createElement('img');
-        artFrame.src = '../static/images/frame/default.webp';
+        artFrame.src = GameUtils.assetUrl('images/frame/default.webp');
         artFrame.className = 'art-show-frame';
         artShowContent.appendChild(artFrame);
 
@@ -425,9 +427,9 @@ class RoomPage {
         if (creatorArtPlace) {
             const inGameArtImageBlock = document.createElement('div');
             inGameArtImageBlock.className = 'in-game-player-art-block';
-            inGameArtImage.src = `data:image/jpeg;base64,${data.selected_art}`;
+            inGameArtImage.src = GameUtils.artUrl(data.selected_art, 'thumb');
             inGameArtImage.className = 'in-game-player-art-img';
-            inGameArtFrame.src = '../static/images/frame/default.webp';
+            inGameArtFrame.src = GameUtils.assetUrl('images/frame/default.webp');
             inGameArtFrame.className = 'in-game-player-art-frame';
             inGameArtImageBlock.appendChild(inGameArtImage);
             inGameArtImageBlock.appendChild(inGameArtFrame);
@@ -448,9 +450,9 @@ class RoomPage {
         inGameArtFrame.addEventListener('mouseenter', () => {
             const zoomedArtContainer = document.getElementById('zoomed-art-container');
             const zoomedArtImage = document.getElementById('zoomed-art-image');
-            zoomedArtImage.src = `data:image/jpeg;base64,${data.selected_art}`;
+            zoomedArtImage.src = GameUtils.artUrl(data.selected_art);
             const zoomedArtFrame = document.getElementById('zoomed-art-frame');
-            zoomedArtFrame.src = '../static/images/frame/default.webp';
+            zoomedArtFrame.src = GameUtils.assetUrl('images/frame/default.webp');
             zoomedArtContainer.style.display = 'flex';
         });
 
@@ -481,6 +483,23 @@ class RoomPage {
         this.showInterface('art-display-interface')
     }
 
+    // 處理繪圖排隊位置更新
+    handleDrawingQueueUpdate(data) {
+        if (!data || data.round !== this.drawingRound) return;
+        const drawingTips = document.getElementById('drawing-tips');
+        if (!drawingTips) return;
+
+        let queueStatus = document.getElementById('drawing-queue-status');
+        if (!queueStatus) {
+            queueStatus = document.createElement('div');
+            queueStatus.id = 'drawing-queue-status';
+            drawingTips.appendChild(queueStatus);
+        }
+        queueStatus.textContent = data.position > 0
+            ? `排隊中，前方還有 ${data.position} 張作品`
+            : 'AI 正在繪圖中...';
+    }
+
     // 處理繪圖錯誤
     handleDrawingError(data) {
         this.hideDrawingWaiting();
@@ -534,6 +553,13 @@ class RoomPage {
         this.hasWantNextGame = false;
         this.showInterface('spy-guess-result-interface');
 
+        // 先取得畫廊目錄，動畫播放期間逐頁索取畫廊資料
+        this.galleryManifest = data.gallery || [];
+        this.galleryPages = {};
+        if (this.galleryManifest.length > 0) {
+            window.socketClient.send('get_gallery_page', { page: 0 });
+        }
+
         const wait = ms => new Promise(resolve => setTimeout(resolve, ms));
         window.playGameSound.stopMusic();
         window.playGameSound.drum_roll();
@@ -586,7 +612,7 @@ class RoomPage {
             // 頭像圖片
             const img = document.createElement('img');
             img.className = 'in-game-avatar-img';
-            img.src = `../static/images/avatar/${player.avatar_id}.jpg`;
+            img.src = GameUtils.assetUrl(`images/avatar/${player.avatar_id}.jpg`);
             img.alt = `${player.name || 'Unknown'} 的頭像`;
 
             // SVG 圖片
@@ -635,13 +661,13 @@ class RoomPage {
         if (!svg) return;
 
         if (status === 'drawing') {
-            svg.src = '../static/images/icons/Edit.svg';
+            svg.src = GameUtils.assetUrl('images/icons/Edit.svg');
         } else if (status === 'waiting') {
-            svg.src = '../static/images/icons/Question.svg';
+            svg.src = GameUtils.assetUrl('images/icons/Question.svg');
         } else if (status === 'sended') {
-            svg.src = '../static/images/icons/Bot.svg';
+            svg.src = GameUtils.assetUrl('images/icons/Bot.svg');
         } else if (status === 'finished') {
-            svg.src = '../static/images/icons/Checkmark.svg';
+            svg.src = GameUtils.assetUrl('images/icons/Checkmark.svg');
         } else {
             svg.src = '';
         }
@@ -707,13 +733,13 @@ class RoomPage {
 
         const avatarImg = document.createElement('img');
         avatarImg.className = 'player-avatar-img';
-        avatarImg.src = `../static/images/avatar/${player.avatar_id}.jpg`;
+        avatarImg.src = GameUtils.assetUrl(`images/avatar/${player.avatar_id}.jpg`);
         avatarImg.alt = `${player.name} 的頭像`;
         avatarImg.id = `avatar-img-${player.id}`;
 
         const frameImg = document.createElement('img');
         frameImg.className = 'player-frame-img';
-        frameImg.src = `../static/images/frame/${frame}.webp`;
+        frameImg.src = GameUtils.assetUrl(`images/frame/${frame}.webp`);
 
         playerAvatar.appendChild(avatarImg);
         playerAvatar.appendChild(frameImg);
@@ -888,13 +914,13 @@ class RoomPage {
             const avatarOptionimg = document.createElement('img');
             avatarOptionimg.className = 'avatar-option';
             avatarOptionimg.id = `avatar-option-${i}`;
-            avatarOptionimg.src = `../static/images/avatar/${i}.jpg`;
+            avatarOptionimg.src = GameUtils.assetUrl(`images/avatar/${i}.jpg`);
             avatarContainer.appendChild(avatarOptionimg);
             avatarOptionimg.addEventListener('click', () => {
                 window.changeAvatar(i);
                 const myAvatarImg = document.getElementById(`avatar-img-${this.myPlayerId}`);
                 if (myAvatarImg) {
-                    myAvatarImg.src = `../static/images/avatar/${i}.jpg`;
+                    myAvatarImg.src = GameUtils.assetUrl(`images/avatar/${i}.jpg`);
                 }
                 const avatarSelectContainer = document.getElementById('avatar-select-container');
                 if (avatarSelectContainer) {
@@ -915,7 +941,7 @@ class RoomPage {
 
             const styleOptionImg = document.createElement('img');
             styleOptionImg.className = 'style-option-img';
-            styleOptionImg.src = `../static/images/styles/${styles[i].thumbnail}`;
+            styleOptionImg.src = GameUtils.assetUrl(`images/styles/${styles[i].thumbnail}`);
             styleOption.appendChild(styleOptionImg);
 
             const styleIntroductionBlock = document.createElement('div');
@@ -1037,7 +1063,7 @@ class RoomPage {
                     voteItem.className = 'vote-item';
                     const voterImage = document.createElement('img');
                     voterImage.className = 'voter-image';
-                    voterImage.src = `../static/images/avatar/${voter?.avatar_id}.jpg`;
+                    voterImage.src = GameUtils.assetUrl(`images/avatar/${voter?.avatar_id}.jpg`);
                     voteItem.appendChild(voterImage);
                     const voterName = document.createElement('div');
                     voterName.className = 'voter-name';
@@ -1088,7 +1114,7 @@ class RoomPage {
                 body.classList.remove('body-dark');
                 gametableContainer.classList.remove('gametable-container-dark');
                 const spyAvatar = document.createElement('img');
-                spyAvatar.src = `../static/images/avatar/${spy.avatar_id}.jpg`;
+                spyAvatar.src = GameUtils.assetUrl(`images/avatar/${spy.avatar_id}.jpg`);
                 spyAvatar.className = 'real-spy-avatar';
 
 
@@ -1096,7 +1122,7 @@ class RoomPage {
                     realSpyTips.textContent = '間諜被大家識破了!';
                     realSpyBanner.textContent = `${spy.name} 是間諜！`;
                     const shockSvg = document.createElement('img');
-                    shockSvg.src = '../static/images/shock.svg';
+                    shockSvg.src = GameUtils.assetUrl('images/shock.svg');
                     shockSvg.className = 'shock-svg';
                     realSpyDisplay.appendChild(shockSvg);
                     realSpyDisplay.classList.add('bounce');
@@ -1315,7 +1341,7 @@ class RoomPage {
             winnerElement.className = 'winner-avatar';
             const img = document.createElement('img');
             img.className = 'winner-avatar-img bounce';
-            img.src = `../static/images/avatar/${winner.avatar_id}.jpg`;
+            img.src = GameUtils.assetUrl(`images/avatar/${winner.avatar_id}.jpg`);
             winnerElement.appendChild(img);
             const nameDiv = document.createElement('div');
             nameDiv.textContent = winner.name;
@@ -1327,19 +1353,18 @@ class RoomPage {
         gameResultTips.textContent = resultMessage;
     }
 
-    generateGallery(data) {
+    generateGallery(manifest) {
         const galleryItemContainer = document.getElementById('gallery-mid-content');
-        if (!galleryItemContainer || !data) return;
+        if (!galleryItemContainer || !manifest) return;
 
         // 清空之前的內容
         galleryItemContainer.innerHTML = '';
 
-
-
-        // 生成畫廊項目
-        data.forEach(item => {
+        // 依畫廊目錄生成畫廊項目，繪圖資料到達後再填入
+        manifest.forEach(item => {
             const itemElement = document.createElement('div');
             itemElement.className = 'gallery-item';
+            itemElement.id = `gallery-item-${item.page}`;
             const header = document.createElement('div');
             header.className = 'gallery-item-header';
             header.textContent = `${item.player_name || '未知藝術家'} 的作品`;
@@ -1347,129 +1372,168 @@ class RoomPage {
             const mainItem = document.createElement('div');
             mainItem.className = 'gallery-main-item-grid';
 
-            item.gallery_data.forEach(submitted_data => {
+            // 繪圖資料到達前先顯示縮圖
+            (item.thumbnails || []).forEach(imageId => {
                 const imgContainer = document.createElement('div');
                 imgContainer.className = 'gallery-main-img-container';
-
                 const imgFrame = document.createElement('img');
-                imgFrame.src = "../static/images/frame/default.webp";
+                imgFrame.src = GameUtils.assetUrl("images/frame/default.webp");
                 imgFrame.className = 'gallery-main-img-frame';
-
                 const img = document.createElement('img');
-                img.src = `data:image/jpeg;base64,${submitted_data.image_data[submitted_data.selectedImage]}`;
+                img.src = GameUtils.artUrl(imageId, 'thumb');
                 img.className = 'gallery-main-img';
-
                 imgContainer.appendChild(imgFrame);
                 imgContainer.appendChild(img);
                 mainItem.appendChild(imgContainer);
+            });
 
-                const fi = document.getElementById('follow-interface');
-
-                imgFrame.addEventListener('mouseenter', (e) => {
-                    fi.innerHTML = ''; // 清空內容
-                    const promptDiv = document.createElement('div');
-                    promptDiv.className = 'follow-prompt';
-                    promptDiv.textContent = submitted_data.prompt;
-                    fi.appendChild(promptDiv);
-
-                    const fiImgContainer = document.createElement('div');
-                    fiImgContainer.className = 'follow-img-container';
+            itemElement.appendChild(mainItem);
+            itemElement.appendChild(header);
 
-                    const fiMainImgContainer = document.createElement('div');
-                    fiMainImgContainer.className = 'follow-main-img-container';
-                    const fiMainImg = document.createElement('img');
-                    fiMainImg.className = 'follow-main-img';
-                    fiMainImg.src = `data:image/jpeg;base64,${submitted_data.image_data[submitted_data.selectedImage]}`;
-                    fiMainImgContainer.appendChild(fiMainImg);
+            galleryItemContainer.appendChild(itemElement);
 
-                    const fiMainImgFrame = document.createElement('img');
-                    fiMainImgFrame.className = 'follow-main-img-frame';
-                    fiMainImgFrame.src = "../static/images/frame/default.webp";
-                    fiMainImgContainer.appendChild(fiMainImgFrame);
+            if (this.galleryPages[item.page]) {
+                this.fillGalleryItem(this.galleryPages[item.page]);
+            }
+        });
+        this.generateGalleryPlayerStatus();
+    }
 
-                    fiImgContainer.appendChild(fiMainImgContainer);
+    // 處理畫廊單頁資料，並索取下一頁
+    handleGalleryPage(data) {
+        if (!data) return;
+        this.galleryPages[data.page] = data;
+        this.fillGalleryItem(data);
 
-                    const noneSelectImgDiv = document.createElement('div');
-                    noneSelectImgDiv.className = 'none-select-img-Div';
+        const nextPage = data.page + 1;
+        if (nextPage < this.galleryManifest.length && !this.galleryPages[nextPage]) {
+            window.socketClient.send('get_gallery_page', { page: nextPage });
+        }
+    }
 
-                    for (let index = 0; index < submitted_data.image_data.length; index++) {
-                        if (index !== submitted_data.selectedImage) {
-                            const noneSelectImgcontainer = document.createElement('div');
-                            noneSelectImgcontainer.className = 'none-select-img-container';
+    // 將單一玩家的繪圖填入畫廊項目
+    fillGalleryItem(page) {
+        const itemElement = document.getElementById(`gallery-item-${page.page}`);
+        if (!itemElement) return;
+        const mainItem = itemElement.querySelector('.gallery-main-item-grid');
+        mainItem.innerHTML = '';
 
-                            const noneSelectImgFrame = document.createElement('img');
-                            noneSelectImgFrame.className = 'none-select-img-frame';
-                            noneSelectImgFrame.src = "../static/images/frame/default.webp";
-                            noneSelectImgcontainer.appendChild(noneSelectImgFrame);
+        page.gallery_data.forEach(submitted_data => {
+            const imgContainer = document.createElement('div');
+            imgContainer.className = 'gallery-main-img-container';
 
-                            const img = document.createElement('img');
-                            img.className = 'none-select-img';
-                            img.src = `data:image/jpeg;base64,${submitted_data.image_data[index] || ''}`;
-                            noneSelectImgcontainer.appendChild(img);
+            const imgFrame = document.createElement('img');
+            imgFrame.src = GameUtils.assetUrl("images/frame/default.webp");
+            imgFrame.className = 'gallery-main-img-frame';
 
-                            noneSelectImgDiv.appendChild(noneSelectImgcontainer);
-                        }
+            const img = document.createElement('img');
+            img.src = GameUtils.artUrl(submitted_data.image_ids[submitted_data.selectedImage], 'thumb');
+            img.className = 'gallery-main-img';
+
+            imgContainer.appendChild(imgFrame);
+            imgContainer.appendChild(img);
+            mainItem.appendChild(imgContainer);
+
+            const fi = document.getElementById('follow-interface');
+
+            imgFrame.addEventListener('mouseenter', (e) => {
+                fi.innerHTML = ''; // 清空內容
+                const promptDiv = document.createElement('div');
+                promptDiv.className = 'follow-prompt';
+                promptDiv.textContent = submitted_data.prompt;
+                fi.appendChild(promptDiv);
+
+                const fiImgContainer = document.createElement('div');
+                fiImgContainer.className = 'follow-img-container';
+
+                const fiMainImgContainer = document.createElement('div');
+                fiMainImgContainer.className = 'follow-main-img-container';
+                const fiMainImg = document.createElement('img');
+                fiMainImg.className = 'follow-main-img';
+                fiMainImg.src = GameUtils.artUrl(submitted_data.image_ids[submitted_data.selectedImage]);
+                fiMainImgContainer.appendChild(fiMainImg);
+
+                const fiMainImgFrame = document.createElement('img');
+                fiMainImgFrame.className = 'follow-main-img-frame';
+                fiMainImgFrame.src = GameUtils.assetUrl("images/frame/default.webp");
+                fiMainImgContainer.appendChild(fiMainImgFrame);
+
+                fiImgContainer.appendChild(fiMainImgContainer);
+
+                const noneSelectImgDiv = document.createElement('div');
+                noneSelectImgDiv.className = 'none-select-img-Div';
+
+                for (let index = 0; index < submitted_data.image_ids.length; index++) {
+                    if (index !== submitted_data.selectedImage) {
+                        const noneSelectImgcontainer = document.createElement('div');
+                        noneSelectImgcontainer.className = 'none-select-img-container';
+
+                        const noneSelectImgFrame = document.createElement('img');
+                        noneSelectImgFrame.className = 'none-select-img-frame';
+                        noneSelectImgFrame.src = GameUtils.assetUrl("images/frame/default.webp");
+                        noneSelectImgcontainer.appendChild(noneSelectImgFrame);
+
+                        const img = document.createElement('img');
+                        img.className = 'none-select-img';
+                        img.src = GameUtils.artUrl(submitted_data.image_ids[index], 'thumb');
+                        noneSelectImgcontainer.appendChild(img);
+
+                        noneSelectImgDiv.appendChild(noneSelectImgcontainer);
                     }
-                    fiImgContainer.appendChild(noneSelectImgDiv);
-                    fi.appendChild(fiImgContainer);
-                });
-
-                imgFrame.addEventListener('mousemove', (e) => {
-                    const x = e.clientX;
-                    const y = e.clientY;
-                    const ww = window.innerWidth;
-                    const wh = window.innerHeight;
+                }
+                fiImgContainer.appendChild(noneSelectImgDiv);
+                fi.appendChild(fiImgContainer);
+            });
 
-                    // 取得視窗中實際渲染尺寸
-                    const fiWidth = getComputedStyle(fi).width.replace('px', '');
-                    const fiHeight = getComputedStyle(fi).height.replace('px', '');
+            imgFrame.addEventListener('mousemove', (e) => {
+                const x = e.clientX;
+                const y = e.clientY;
+                const ww = window.innerWidth;
+                const wh = window.innerHeight;
 
-                    const fiScaleWidth = window.scaleFactor * fiWidth;
-                    const fiScaleHeight = window.scaleFactor * fiHeight;
+                // 取得視窗中實際渲染尺寸
+                const fiWidth = getComputedStyle(fi).width.replace('px', '');
+                const fiHeight = getComputedStyle(fi).height.replace('px', '');
 
-                    let OFFSET = 20 * window.scaleFactor; // 與滑鼠的間距
+                const fiScaleWidth = window.scaleFactor * fiWidth;
+                const fiScaleHeight = window.scaleFactor * fiHeight;
 
+                let OFFSET = 20 * window.scaleFactor; // 與滑鼠的間距
 
-                    // 根據滑鼠位置決定顯示方向
-                    let left = x + OFFSET;
-                    let top = y + OFFSET;
 
-                    // 如果右邊超出螢幕，則顯示在左邊
-                    if (left + fiScaleWidth > ww) {
-                        left = x - fiScaleWidth - OFFSET;
-                    }
-                    // 如果左邊超出螢幕，則顯示在右邊
-                    if (left < 0) {
-                        left = x + OFFSET;
-                    }
+                // 根據滑鼠位置決定顯示方向
+                let left = x + OFFSET;
+                let top = y + OFFSET;
 
-                    // 如果下方超出螢幕，則顯示在上方
-                    if (top + fiScaleHeight > wh) {
-                        top = y - fiScaleHeight - OFFSET;
-                    }
-                    // 如果上方超出螢幕，則顯示在下方
-                    if (top < 0) {
-                        top = y + OFFSET;
-                    }
+                // 如果右邊超出螢幕，則顯示在左邊
+                if (left + fiScaleWidth > ww) {
+                    left = x - fiScaleWidth - OFFSET;
+                }
+                // 如果左邊超出螢幕，則顯示在右邊
+                if (left < 0) {
+                    left = x + OFFSET;
+                }
 
-                    fi.style.transform = `scale(${window.scaleFactor})`;
-                    fi.style.left = `${left}px`;
-                    fi.style.top = `${top}px`;
-                    fi.style.display = 'flex';
-                    console.log(`x: ${x}, y: ${y}, ww: ${ww}, wh: ${wh}, fiWidth: ${fiWidth}, fiHeight: ${fiHeight}`, fiScaleWidth, fiScaleHeight);
-                });
+                // 如果下方超出螢幕，則顯示在上方
+                if (top + fiScaleHeight > wh) {
+                    top = y - fiScaleHeight - OFFSET;
+                }
+                // 如果上方超出螢幕，則顯示在下方
+                if (top < 0) {
+                    top = y + OFFSET;
+                }
 
-                imgFrame.addEventListener('mouseleave', () => {
-                    fi.style.display = 'none';
-                });
+                fi.style.transform = `scale(${window.scaleFactor})`;
+                fi.style.left = `${left}px`;
+                fi.style.top = `${top}px`;
+                fi.style.display = 'flex';
+                console.log(`x: ${x}, y: ${y}, ww: ${ww}, wh: ${wh}, fiWidth: ${fiWidth}, fiHeight: ${fiHeight}`, fiScaleWidth, fiScaleHeight);
             });
 
-            itemElement.appendChild(mainItem);
-            itemElement.appendChild(header);
-
-            galleryItemContainer.appendChild(itemElement);
+            imgFrame.addEventListener('mouseleave', () => {
+                fi.style.display = 'none';
+            });
         });
-        this.generateGalleryPlayerStatus();
     }
 
     generateGalleryPlayerStatus() {
@@ -1482,7 +1546,7 @@ class RoomPage {
             playerStatus.id = `gallery-player-status-item-${player.id}`;
             const playerStatusImg = document.createElement('img');
             playerStatusImg.className = 'player-status-img';
-            playerStatusImg.src = "../static/images/avatar/" + player.avatar_id + ".jpg";
+            playerStatusImg.src = GameUtils.assetUrl("images/avatar/") + player.avatar_id + ".jpg";
             playerStatus.appendChild(playerStatusImg);
             const playerStatusSymbol = document.createElement('div');
             playerStatusSymbol.className = 'player-status-symbol';
@@ -1650,7 +1714,7 @@ class RoomPage {
         const selectedStyleIntroduction = document.getElementById('selected-style-introduction');
 
         if (selectedStyleImage && selectedStyleName && selectedStyleIntroduction) {
-            selectedStyleImage.src = `../static/images/styles/${this.styles[this.selectedStyle].thumbnail}`;
+            selectedStyleImage.src = GameUtils.assetUrl(`images/styles/${this.styles[this.selectedStyle].thumbnail}`);
             selectedStyleName.textContent = this.styles[this.selectedStyle].style_name;
             selectedStyleIntroduction.textContent = this.styles[this.selectedStyle].introduction;
         }
@@ -11,6 +11,11 @@ class SocketClient {
         this.playerId = null;
         this.hasChooseImg = false;
         this.isSpy = false;
+        this.pendingRedirect = null; // 分片轉址後要重送的事件
+        this.assetVersion = null; // 已預載的靜態檔案版本
+        this.loadedAssetUrls = new Set(); // 已預載的靜態檔案網址
+        this.assetBundles = new Map(); // 預載分組名稱 -> 分組內容（依遊戲階段分組）
+        this.bundleLoads = new Map(); // 預載分組名稱 -> 載入中或已完成的 Promise
 
         this.showArtCount = 0;
 
@@ -26,7 +31,9 @@ class SocketClient {
                 timeout: 10000,
                 reconnection: true,
                 reconnectionAttempts: this.maxReconnectAttempts,
-                reconnectionDelay: this.reconnectDelay
+                reconnectionDelay: this.reconnectDelay,
+                // 重新連線時回報已預載的版本，版本相同時伺服器不再送出檔案清單
+                auth: { asset_version: this.assetVersion }
             });
 
             this.setupEventListeners();
@@ -37,6 +44,63 @@ class SocketClient {
         }
     }
 
+    // 依序預載各階段的靜態檔案：第一組（大廳）完成即可開始，其餘在瀏覽器空閒時載入，
+    // 全部完成後才記錄版本（中斷時下次連線會重新預載，已載入的網址會略過）
+    loadAssets(assets) {
+        const firstLoad = this.assetVersion === null;
+        GameUtils.assetFiles = assets.files;
+        const bundles = new Map(assets.bundles.map(bundle => [bundle.name, bundle]));
+        this.assetBundles = bundles;
+        this.bundleLoads = new Map();
+        const [first, ...rest] = assets.bundles;
+        this.ensureBundle(first.name).then(() => {
+            GameUtils.hideLoading();
+            if (firstLoad && window.playGameSound) {
+                window.playGameSound.main_menu();
+            }
+            return rest.reduce((previous, bundle) => previous
+                .then(() => GameUtils.whenIdle())
+                .then(() => this.ensureBundle(bundle.name)), Promise.resolve());
+        }).then(() => {
+            // 載入期間收到新版本清單時，由新的載入流程記錄版本
+            if (this.assetBundles !== bundles) return;
+            this.assetVersion = assets.version;
+            this.socket.auth = { asset_version: assets.version };
+        }).catch((error) => {
+            console.error('預加載失敗:', error);
+        });
+    }
+
+    // 立即載入某階段的靜態檔案（進入該階段前呼叫），載入中或已載入時回傳同一個 Promise
+    ensureBundle(name) {
+        const bundle = this.assetBundles.get(name);
+        if (!bundle) return Promise.resolve();
+        if (!this.bundleLoads.has(name)) {
+            this.bundleLoads.set(name, this.loadBundle(bundle));
+        }
+        return this.bundleLoads.get(name);
+    }
+
+    loadBundle(bundle) {
+        const audio = window.audioManager;
+        const isNew = url => !this.loadedAssetUrls.has(url);
+        const images = bundle.images.filter(isNew);
+        const sounds = Object.fromEntries(
+            Object.entries(bundle.sounds).filter(([, source]) => isNew(audio.pickUrl(source))));
+        const sprite = bundle.sprite && isNew(audio.pickUrl(bundle.sprite.files)) ? bundle.sprite : null;
+        return Promise.all([
+            audio.loadSounds(sounds),
+            sprite ? audio.loadSprite(sprite) : null,
+            GameUtils.preloadStaticImages(images)
+        ]).then(() => {
+            images.forEach(url => this.loadedAssetUrls.add(url));
+            Object.values(sounds).forEach(source => this.loadedAssetUrls.add(audio.pickUrl(source)));
+            if (sprite) {
+                this.loadedAssetUrls.add(audio.pickUrl(sprite.files));
+            }
+        });
+    }
+
     // 設定事件監聽器
     setupEventListeners() {
         if (!this.socket) return;
@@ -46,22 +110,30 @@ class SocketClient {
             this.connected = true;
             this.reconnectAttempts = 0;
 
-            // 預加載靜態檔案
-            if (data.preload_files) {
-                Promise.all([
-                    window.audioManager.loadSounds(data.preload_files['sounds']),
-                    GameUtils.preloadStaticImages(data.preload_files['images'])
-                ]).then(() => {
-                    GameUtils.hideLoading();
-                    if (window.playGameSound) {
-                        window.playGameSound.main_menu();
-                    }
-                }).catch((error) => {
-                    console.error('預加載失敗:', error);
-                });
+            // 分片轉址後重送原本的事件
+            if (this.pendingRedirect) {
+                const { event, data: payload } = this.pendingRedirect;
+                this.pendingRedirect = null;
+                this.send(event, payload);
+                return;
+            }
+
+            // 預加載靜態檔案（首次連線或伺服器更新後才會收到清單）
+            if (data.assets) {
+                this.loadAssets(data.assets);
+            } else {
+                GameUtils.hideLoading();
             }
         });
 
+        // 房間位於其他分片：帶著分片編號重新連線（反向代理依此轉送）
+        this.socket.on('shard_redirect', (data) => {
+            console.log(`房間位於分片 ${data.shard}，重新連線`);
+            this.pendingRedirect = data;
+            this.socket.io.opts.query = { shard: data.shard };
+            this.socket.disconnect().connect();
+        });
+
         this.socket.on('disconnect', (reason) => {
             console.log('WebSocket 已斷線:', reason);
             this.connected = false;
@@ -123,8 +195,10 @@ class SocketClient {
         });
 
         this.socket.on('start_voting_topic', (data) => {
-            this.showArtCount = 0;
             console.log('開始投票主題:', data);
+            this.showArtCount = 0;
+            this.ensureBundle('drawing'); // 投票期間先載入繪圖階段的檔案
+
             if (window.roomPage) {
                 window.roomPage.handleStartVotingTopic(data);
                 window.playGameSound.vote_topic();
@@ -134,21 +208,30 @@ class SocketClient {
         // 遊戲相關事件
         this.socket.on('game_started', (data) => {
             console.log('遊戲開始:', data);
+            this.ensureBundle('drawing');
+            this.ensureBundle('show_art');
             window.roomPage.handleGameStarted(data)
             this.isSpy = data.is_spy;
             window.playGameSound.bell_multi();
         });
-        this.socket.on('player_status_update', (data) => {
+        this.socket.on('player_status_batch', (data) => {
             console.log('玩家狀態更新:', data);
-            window.roomPage.setPlayerStatusSvg(data.player_id, data.status);
+            for (const [playerId, status] of Object.entries(data.statuses)) {
+                window.roomPage.setPlayerStatusSvg(playerId, status);
+            }
         });
         this.socket.on('write_drawing_prompt', (data) => {
             console.log('撰寫繪圖提示:', data);
             window.roomPage.handleWriteDrawingPrompt(data)
             this.showArtCount++;
         });
+        this.socket.on('drawing_queue_update', (data) => {
+            console.log('繪圖排隊位置:', data);
+            window.roomPage.handleDrawingQueueUpdate(data);
+        });
         this.socket.on('drawing_finished', (data) => {
             console.log('繪圖完成:', data);
+            this.ensureBundle('show_art');
             this.send('get_myArt', {});
         });
 
@@ -161,6 +244,7 @@ class SocketClient {
 
         this.socket.on('start_showing', (data) => {
             console.log('開始展示繪圖:', data);
+            this.ensureBundle('voting');
             window.roomPage.handleStartShowing(data);
             if (this.showArtCount % 2 === 0) {
                 window.playGameSound.show_art1();
@@ -175,12 +259,15 @@ class SocketClient {
         });
         this.socket.on('start_voting_spy', (data) => {
             console.log('開始投票出間諜:', data);
+            this.ensureBundle('voting');
+            this.ensureBundle('gallery');
             window.roomPage.handleStartVotingSpy(data);
             window.playGameSound.vote_spy();
 
         });
         this.socket.on('voting_spy_result', (data) => {
             console.log('投票結果:', data);
+            this.ensureBundle('gallery');
             window.roomPage.handleSpyVoteResult(data);
             window.playGameSound.stopMusic();
         });
@@ -190,6 +277,10 @@ class SocketClient {
             play_again_btn.disabled = false;
             window.roomPage.handleGameEnded(data);
         });
+        this.socket.on('gallery_page', (data) => {
+            console.log('畫廊資料:', data);
+            window.roomPage.handleGalleryPage(data);
+        });
         this.socket.on('player_play_again', (data) => {
             window.roomPage.readyToPlayAgain(data.player_id);
             window.playGameSound.ready_play_again();
@@ -18,6 +18,17 @@ class GameUtils {
         }
     }
 
+    // 取得生成繪圖的網址，size 為 'thumb'（128px）、'display'（768px），省略則為原圖
+    static artUrl(imageId, size) {
+        if (!imageId) return '';
+        return size ? `../art/${imageId}/${size}` : `../art/${imageId}`;
+    }
+
+    // 取得靜態檔案帶指紋的網址（path 為 static 下的路徑），尚未取得清單時使用原網址
+    static assetUrl(path) {
+        return GameUtils.assetFiles[path] || `../static/${path}`;
+    }
+
     static async preloadStaticImages(imageSrcs) {
         if (!imageSrcs.length) return;
 
@@ -33,6 +44,17 @@ class GameUtils {
         await Promise.all(imagePromises);
     }
 
+    // 瀏覽器空閒時 resolve（不支援 requestIdleCallback 時延遲一小段時間）
+    static whenIdle(timeout = 2000) {
+        return new Promise(resolve => {
+            if (window.requestIdleCallback) {
+                window.requestIdleCallback(() => resolve(), { timeout });
+            } else {
+                setTimeout(resolve, 200);
+            }
+        });
+    }
+
     // 顯示錯誤訊息
     static showError(message) {
         const toast = document.getElementById('error-toast');
@@ -477,5 +499,8 @@ document.addEventListener('keydown', (e) => {
     }
 });
 
+// 靜態檔案路徑 -> 帶指紋的網址（連線時由伺服器提供）
+GameUtils.assetFiles = {};
+
 // 輸出工具類供其他文件使用
 window.GameUtils = GameUtils;
\ No newline at end of file
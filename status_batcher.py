@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StatusBatcher:
+    """合併短時間內的玩家狀態更新，每個房間每個時間窗只送出一則訊息
+
+    同一房間第一次更新時開始計時，時間窗內的後續更新併入同一批
+    （同一玩家只保留最後的狀態），時間窗結束後以 send(room_id, statuses) 送出。
+    所有房間共用一個執行緒；時間窗長度固定，因此以先進先出佇列即可依到期順序處理。
+    flush / discard 後佇列中留下的舊項目與房間目前批次的送出時間不符，到期時直接略過。
+    協程模式下的背景任務與等待方式同 PhaseScheduler。
+    """
+
+    def __init__(self, send: Callable[[str, Dict[str, str]], None], window: float = 0.05,
+                 start_background_task: Optional[Callable[[Callable[[], None]], object]] = None,
+                 sleep: Optional[Callable[[float], None]] = None,
+                 poll_interval: float = 0.01):
+        """
+        Args:
+            send: 送出一批狀態的函式，參數為房間ID與 {玩家ID: 狀態}
+            window: 合併的時間窗（秒）
+            start_background_task: 啟動送出迴圈的函式，未提供時使用 daemon 執行緒
+            sleep: 協程模式下等待時使用的 sleep 函式，未提供時以條件變數阻塞等待
+            poll_interval: 使用 sleep 時佇列為空的重新檢查間隔（秒）
+        """
+        self.send = send
+        self.window = window
+        self.start_background_task = start_background_task
+        self.sleep = sleep
+        self.poll_interval = poll_interval
+        self._pending: Dict[str, Dict[str, str]] = {}  # 房間ID -> {玩家ID: 狀態}
+        self._due: Deque[Tuple[float, str]] = deque()  # (送出時間, 房間ID)
+        self._due_at: Dict[str, float] = {}  # 房間ID -> 目前批次的送出時間
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def update(self, room_id: str, player_id: str, status: str):
+        """記錄玩家狀態，於時間窗結束時送出"""
+        with self._cond:
+            statuses = self._pending.get(room_id)
+            if statuses is None:
+                statuses = self._pending[room_id] = {}
+                due = self._due_at[room_id] = time.monotonic() + self.window
+                self._due.append((due, room_id))
+                if len(self._due) == 1:
+                    self._cond.notify()
+            statuses[player_id] = status
+
+    def flush(self, room_id: str):
+        """立即送出房間尚未送出的狀態（在廣播階段轉換前呼叫，確保順序）"""
+        with self._cond:
+            statuses = self._pending.pop(room_id, None)
+            self._due_at.pop(room_id, None)
+        if statuses:
+            self.send(room_id, statuses)
+
+    def discard(self, room_id: str):
+        """捨棄房間尚未送出的狀態"""
+        with self._cond:
+            self._pending.pop(room_id, None)
+            self._due_at.pop(room_id, None)
+
+    def start(self):
+        """啟動送出執行緒（重複呼叫不會重複啟動）"""
+        with self._cond:
+            if self._thread is None:
+                if self.start_background_task is None:
+                    self._thread = threading.Thread(target=self._run, name='status-batcher',
+                                                    daemon=True)
+                    self._thread.start()
+                else:
+                    self._thread = self.start_background_task(self._run)
+
+    def _wait(self, timeout: Optional[float]):
+        """等待新的批次或逾時（需持有 self._cond）"""
+        if self.sleep is None:
+            self._cond.wait(timeout)
+            return
+        # 協程模式：放開鎖讓出事件迴圈；新批次的送出時間都較晚，有批次時睡到它到期即可
+        self._cond.release()
+        try:
+            self.sleep(self.poll_interval if timeout is None else timeout)
+        finally:
+            self._cond.acquire()
+
+    def _next_due(self) -> Tuple[str, Optional[Dict[str, str]]]:
+        with self._cond:
+            while True:
+                if not self._due:
+                    self._wait(None)
+                    continue
+                due, room_id = self._due[0]
+                wait = due - time.monotonic()
+                if wait <= 0:
+                    self._due.popleft()
+                    if self._due_at.get(room_id) != due:
+                        # 這一批已被 flush 或 discard，房間之後的新批次有自己的送出時間
+                        return room_id, None
+                    del self._due_at[room_id]
+                    return room_id, self._pending.pop(room_id, None)
+                self._wait(wait)
+
+    def _run(self):
+        while True:
+            room_id, statuses = self._next_due()
+            if not statuses:
+                continue
+            try:
+                self.send(room_id, statuses)
+            except Exception as e:
+                logger.error(f'房間 {room_id} 狀態送出錯誤: {e}')
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# 測試直接匯入專案根目錄的模組
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """以執行緒模式匯入 app（圖片寫到暫存目錄、不記錄每個封包），整個測試階段共用"""
+    os.environ.update({
+        'SOCKETIO_ASYNC_MODE': 'threading',
+        'SOCKETIO_DEBUG_LOG': '0',
+        'UPLOAD_FOLDER': str(tmp_path_factory.mktemp('art_output')),
+    })
+    import app
+    return app
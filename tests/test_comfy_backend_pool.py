@@ -0,0 +1,172 @@
+"""ComfyBackendPool 測試：以本機的假 ComfyUI 伺服器驗證路由、標記離線重送與探測恢復"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from comfy_api_wrapper import ComfyApiWrapper
+from comfy_backend_pool import ComfyBackendPool, NoBackendAvailable
+
+
+class StubComfy:
+    """只實作 /prompt、/queue、/history 與 /view 的假 ComfyUI 伺服器（沒有 /ws）"""
+
+    def __init__(self):
+        self.prompts = []
+        self.failing = False  # True 時所有請求回應 500
+        self.pending = 0  # /queue 回報的等待中工作數
+        self.history = {}  # prompt_id -> /history 回應中的紀錄
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, body):
+                if stub.failing:
+                    self.send_error(500)
+                    return
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == '/queue':
+                    self.reply({'queue_running': [],
+                                'queue_pending': [[i, f'p{i}'] for i in range(stub.pending)]})
+                elif self.path.startswith('/history/'):
+                    prompt_id = self.path[len('/history/'):]
+                    entry = stub.history.get(prompt_id)
+                    self.reply({prompt_id: entry} if entry else {})
+                elif self.path.startswith('/view?'):
+                    self.send_response(200)
+                    self.send_header('Content-Length', '3')
+                    self.end_headers()
+                    self.wfile.write(b'img')
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if not stub.failing:
+                    stub.prompts.append(body)
+                self.reply({'prompt_id': f'{stub.name}-{len(stub.prompts)}'})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.name = f'stub{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stubs():
+    servers = [StubComfy() for _ in range(3)]
+    yield servers
+    for server in servers:
+        server.close()
+
+
+def make_pool(urls, **kwargs):
+    return ComfyBackendPool(urls, api_factory=lambda url: ComfyApiWrapper(url, timeout=2), **kwargs)
+
+
+def test_routes_to_least_loaded_backend(stubs):
+    stubs[0].pending = 3
+    stubs[1].pending = 1
+    stubs[2].pending = 1
+    pool = make_pool([s.url for s in stubs], max_in_flight=2)
+    pool.refresh()
+
+    url, prompt_id = pool.queue_prompt({'1': {}})
+    assert url == stubs[1].url
+    assert prompt_id.startswith(stubs[1].name)
+    assert len(stubs[1].prompts) == 1
+    # 送出後 stubs[1] 的負載增加，下一個工作改送到 stubs[2]
+    url, _ = pool.queue_prompt({'1': {}})
+    assert url == stubs[2].url
+
+
+def test_respects_max_in_flight(stubs):
+    pool = make_pool([stubs[0].url], max_in_flight=2)
+    pool.queue_prompt({})
+    pool.queue_prompt({})
+    with pytest.raises(NoBackendAvailable):
+        pool.queue_prompt({})
+    pool.release(stubs[0].url)
+    assert pool.queue_prompt({})[0] == stubs[0].url
+
+
+def test_failed_backend_is_marked_down_and_prompt_retried(stubs):
+    stubs[0].failing = True
+    stubs[1].pending = 5
+    pool = make_pool([stubs[0].url, stubs[1].url])
+
+    url, _ = pool.queue_prompt({'1': {}})
+    assert url == stubs[1].url
+    assert len(stubs[1].prompts) == 1
+    status = {backend['url']: backend for backend in pool.status()}
+    assert not status[stubs[0].url]['healthy']
+    assert status[stubs[0].url]['in_flight'] == 0
+    assert status[stubs[0].url]['last_error']
+    # 離線的後端不再被選中
+    assert pool.queue_prompt({})[0] == stubs[1].url
+    assert stubs[0].prompts == []
+
+
+def test_all_backends_down(stubs):
+    for stub in stubs[:2]:
+        stub.failing = True
+    pool = make_pool([stubs[0].url, stubs[1].url])
+    with pytest.raises(NoBackendAvailable):
+        pool.queue_prompt({})
+    assert not any(backend['healthy'] for backend in pool.status())
+
+
+def test_probe_recovers_backend(stubs):
+    stubs[0].failing = True
+    pool = make_pool([stubs[0].url], probe_interval=0)
+    with pytest.raises(NoBackendAvailable):
+        pool.queue_prompt({})
+
+    pool.refresh()  # 仍然失敗，維持離線
+    assert not pool.get(stubs[0].url).healthy
+
+    stubs[0].failing = False
+    stubs[0].pending = 2
+    pool.refresh()
+    backend = pool.get(stubs[0].url)
+    assert backend.healthy
+    assert backend.last_error is None
+    assert backend.queue_size == 2
+    assert pool.queue_prompt({})[0] == stubs[0].url
+
+
+def test_probe_waits_for_interval(stubs):
+    stubs[0].failing = True
+    pool = make_pool([stubs[0].url], probe_interval=60)
+    with pytest.raises(NoBackendAvailable):
+        pool.queue_prompt({})
+    stubs[0].failing = False
+    pool.refresh()  # 距離上次失敗不到 probe_interval，不探測
+    assert not pool.get(stubs[0].url).healthy
+
+
+def test_pull_falls_back_to_polling_without_event_stream(stubs):
+    pool = make_pool([stubs[0].url], connect_timeout=0.2)
+    url, prompt_id = pool.queue_prompt({'1': {}}, use_events=True)
+    # 假伺服器沒有 /ws，事件串流無法連線，提示仍以串流的 client_id 送出
+    assert stubs[0].prompts[0]['client_id'] == pool.get(url).api.events.client_id
+
+    stubs[0].history[prompt_id] = {
+        'status': {'status_str': 'success', 'completed': True},
+        'outputs': {'9': {'images': [{'filename': 'a.png', 'subfolder': '', 'type': 'temp'}]}},
+    }
+    assert pool.fetch_outputs(url, prompt_id, '9').result(timeout=10) == [b'img']
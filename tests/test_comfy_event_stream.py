@@ -0,0 +1,28 @@
+"""ComfyEventStream 測試：訊息分派與略過監控訊息"""
+import json
+
+from comfy_api_wrapper import ComfyEventStream
+
+
+def make_stream():
+    # 不呼叫 wait()，避免啟動連線執行緒；完成的結果記在 _finished
+    return ComfyEventStream('ws://127.0.0.1:9/ws?clientId={}')
+
+
+def test_finished_messages_are_recorded():
+    stream = make_stream()
+    stream._dispatch(json.dumps({'type': 'executing', 'data': {'node': None, 'prompt_id': 'a'}}))
+    stream._dispatch(json.dumps({'data': {'prompt_id': 'b'}, 'type': 'execution_error'},
+                                separators=(',', ':')))
+    assert stream._finished['a'] is None
+    assert isinstance(stream._finished['b'], Exception)
+
+
+def test_monitor_messages_are_skipped_regardless_of_formatting():
+    stream = make_stream()
+    # 後面接著無法解析的內容：若沒有略過就會解碼失敗
+    for raw in ('{"type": "crystools.monitor", "data": {',
+                '{"type":"crystools.monitor","data":{',
+                '{\n  "type" : "crystools.monitor",\n  "data": {'):
+        stream._dispatch(raw)
+    assert not stream._finished
@@ -0,0 +1,83 @@
+"""ImageStore 測試：內容定址寫入與依房間引用釋放圖片"""
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from game_logic import Player, Room, SubmittedData
+from image_store import ImageStore
+
+
+def make_png(color) -> bytes:
+    buf = io.BytesIO()
+    Image.new('RGB', (32, 32), color).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(str(tmp_path))
+
+
+def test_put_is_content_addressed(store):
+    data = make_png('red')
+    image_id = store.put(data)
+    assert store.put(data) == image_id
+    assert store.get(image_id) == data
+    assert store.mimetype(image_id) == 'image/png'
+    assert store.find_rendition(image_id, 'thumb', ['webp'])[1] == 'image/webp'
+
+
+def test_release_keeps_image_referenced_by_another_room(store):
+    data = make_png('blue')
+    image_id = store.put(data, owner='111111')
+    assert store.put(data, owner='222222') == image_id
+
+    assert store.release(image_id, '111111') == 0
+    assert store.exists(image_id)
+    assert store.find_rendition(image_id, 'display', ['jpg'])
+
+    assert store.release(image_id, '222222') > 0
+    assert not store.exists(image_id)
+    assert store.find_rendition(image_id, 'display', ['jpg', 'webp']) is None
+    assert not os.path.exists(store.refs_path(image_id))
+
+
+def test_release_is_idempotent_per_owner(store):
+    image_id = store.put(make_png('green'), owner='111111')
+    store.put(make_png('green'), owner='222222')
+    store.release(image_id, '111111')
+    assert store.release(image_id, '111111') == 0
+    assert store.exists(image_id)
+
+
+def test_put_after_release_rewrites(store):
+    data = make_png('white')
+    image_id = store.put(data, owner='111111')
+    store.release(image_id, '111111')
+    assert store.put(data, owner='222222') == image_id
+    assert store.get(image_id) == data
+
+
+def test_invalid_owner(store):
+    with pytest.raises(ValueError):
+        store.put(make_png('black'), owner='../x')
+    assert store.release('0' * ImageStore.ID_LENGTH, '../x') == 0
+
+
+def test_new_game_keeps_previous_images_until_room_is_released(store):
+    host = Player('sid', 'host', is_host=True)
+    room = Room('111111', host)
+    image_id = store.put(make_png('yellow'), owner=room.id)
+    data = SubmittedData(1, 'prompt')
+    data.image_ids = [image_id]
+    room.add_submission(host, data)
+
+    room.reset_for_new_game()
+    # 上一局的圖片仍屬於房間，房間回收時釋放
+    assert room.image_ids() == {image_id}
+    assert store.exists(image_id)
+    for retired in room.image_ids():
+        store.release(retired, room.id)
+    assert not store.exists(image_id)
@@ -0,0 +1,51 @@
+"""PhaseScheduler 測試：截止時間的取代、取消與協程模式"""
+import threading
+import time
+
+import pytest
+
+from phase_scheduler import PhaseScheduler
+
+
+def test_reschedule_replaces_deadline():
+    scheduler = PhaseScheduler()
+    scheduler.start()
+    fired = []
+    done = threading.Event()
+    scheduler.schedule('room', 0.3, lambda: fired.append('old'))
+    scheduler.schedule('room', 0.05, lambda: (fired.append('new'), done.set()))
+    assert done.wait(2)
+    time.sleep(0.4)
+    assert fired == ['new']
+
+
+def test_cancel():
+    scheduler = PhaseScheduler()
+    scheduler.start()
+    fired = []
+    scheduler.schedule('room', 0.05, lambda: fired.append('room'))
+    assert scheduler.cancel('room')
+    assert scheduler.remaining('room') is None
+    time.sleep(0.2)
+    assert fired == []
+
+
+def test_cooperative_mode_does_not_block_other_tasks():
+    """協程模式下等待截止時間時讓出事件迴圈，且能發現之後排入、較早到期的截止時間"""
+    eventlet = pytest.importorskip('eventlet')
+    scheduler = PhaseScheduler(start_background_task=eventlet.spawn, sleep=eventlet.sleep)
+    scheduler.start()
+    fired = []
+    scheduler.schedule('late', 5, lambda: fired.append('late'))
+    eventlet.sleep(0.01)
+    scheduler.schedule('early', 0.2, lambda: fired.append('early'))
+    last = start = time.monotonic()
+    longest = 0
+    while not fired and last - start < 2:
+        eventlet.sleep(0.01)
+        now = time.monotonic()
+        longest, last = max(longest, now - last), now
+    assert fired == ['early']
+    assert last - start < 1
+    assert longest < 0.1
+    scheduler.cancel('late')
@@ -0,0 +1,84 @@
+"""Room 各回合計數測試：隨機操作序列下，計數結果需與逐一掃描玩家提交的舊邏輯一致"""
+import random
+
+import pytest
+
+from game_logic import Player, Room, SubmittedData
+
+ROUNDS = (1, 2)
+# 計數鍵 -> SubmittedData 上對應的完成條件
+FLAGS = {
+    'finished': lambda data: data.isDrawFinished,
+    'received': lambda data: data.isReceived,
+    'selected': lambda data: data.selectedImage is not None,
+}
+CHECKS = {
+    'finished': Room.check_all_drawing_finished,
+    'received': Room.check_all_art_received,
+    'selected': Room.check_all_art_selected,
+}
+
+
+def scan_all_done(room: Room, round: int, key: str) -> bool:
+    """改用計數前的判斷方式：掃描每位玩家在該回合的所有提交"""
+    for player in room.players:
+        round_data = [data for data in player.submitted_data if data.round == round]
+        if not any(FLAGS[key](data) for data in round_data):
+            return False
+    return True
+
+
+def scan_count(room: Room, round: int, key: str) -> int:
+    return sum(1 for player in room.players for data in player.submitted_data
+               if data.round == round and FLAGS[key](data))
+
+
+def assert_consistent(room: Room):
+    for round in ROUNDS:
+        for key, check in CHECKS.items():
+            assert room._all_done(round, key) == scan_all_done(room, round, key)
+            assert bool(check(room, round)) == scan_all_done(room, round, key)
+            counted = room._round_counts.get(round, {}).get(key, 0)
+            assert counted == scan_count(room, round, key)
+
+
+def random_step(room: Room, rng: random.Random, next_id: list):
+    """對房間做一次隨機操作（遵守 app.py 的規則：每位玩家每回合只提交一次）"""
+    op = rng.choice(('join', 'leave', 'submit', 'submit', 'finish', 'receive', 'select',
+                     'select', 'restore', 'reset'))
+    players = list(room.players)
+    if op == 'join':
+        next_id[0] += 1
+        room.add_player(Player(f'sid{next_id[0]}', f'p{next_id[0]}'))
+    elif op == 'leave' and len(players) > 1:
+        room.remove_player(rng.choice(players).id)
+    elif op == 'submit':
+        player = rng.choice(players)
+        round = rng.choice(ROUNDS)
+        if room.get_submission(player.id, round) is None:
+            room.add_submission(player, SubmittedData(round, 'prompt'))
+    elif op in ('finish', 'receive', 'select'):
+        player = rng.choice(players)
+        round = rng.choice(ROUNDS)
+        if op == 'finish':
+            room.mark_drawing_finished(player.id, round)
+        elif op == 'receive':
+            room.mark_art_received(player.id, round)
+        else:
+            room.mark_art_selected(player.id, round, rng.randrange(2))
+    elif op == 'restore':
+        # 經過房間儲存序列化後，計數由提交資料重建
+        room = Room.from_state(room.to_state())
+    elif op == 'reset' and rng.random() < 0.1:
+        room.reset_for_new_game()
+    return room
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_counters_match_scan(seed):
+    rng = random.Random(seed)
+    room = Room('room', Player('sid0', 'host', is_host=True))
+    next_id = [0]
+    for _ in range(60):
+        room = random_step(room, rng, next_id)
+        assert_consistent(room)
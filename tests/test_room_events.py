@@ -0,0 +1,154 @@
+"""房間事件併發測試：多個房間同時提交提詞與回傳圖片，送出繪圖工作時不持有房間鎖"""
+import io
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOMS = 6
+PLAYERS = 3
+
+
+class SlowComfyPool:
+    """假的 ComfyUI 後端池：送出工作需要一段時間，並記錄送出時是否仍在房間交易中"""
+
+    def __init__(self, game_manager, delay=0.05):
+        self.game_manager = game_manager
+        self.delay = delay
+        self.in_transaction = []  # 在房間交易中（持有房間鎖）送出的工作
+        self.dispatched = queue.Queue()  # 已送出的工作 (房間ID, 玩家ID, 回合)
+        self._ids = itertools.count()
+
+    def queue_prompt(self, prompt, use_events=False):
+        key = tuple(prompt[prompt.get_node_id(title)]['inputs']['value']
+                    for title in ('room_id', 'player_id', 'round'))
+        if self.game_manager._work.get() is not None:
+            self.in_transaction.append(key)
+        time.sleep(self.delay)
+        self.dispatched.put(key)
+        return 'stub', f'prompt-{next(self._ids)}'
+
+    def release(self, url):
+        pass
+
+    def callback_addresses(self):
+        return set()
+
+
+@pytest.fixture
+def comfy(app_module, monkeypatch):
+    monkeypatch.chdir(ROOT)  # 讀取工作流程範本與風格資料
+    pool = SlowComfyPool(app_module.game_manager)
+    monkeypatch.setattr(app_module, 'get_comfy_pool', lambda: pool)
+    return pool
+
+
+@pytest.fixture
+def rooms(app_module):
+    """以真正的事件建立房間與加入玩家，再把房間直接設為繪圖階段"""
+    app = app_module
+    created = []
+    for r in range(ROOMS):
+        players = []
+        for i in range(PLAYERS):
+            client = app.socketio.test_client(app.app, flask_test_client=app.app.test_client())
+            if i == 0:
+                client.emit('create_room', {'player_name': f'host{r}'})
+                room_id = [e for e in client.get_received()
+                           if e['name'] == 'room_created'][0]['args'][0]['room_id']
+            else:
+                client.emit('join_room', {'room_id': room_id, 'player_name': f'p{i}'})
+            players.append(client)
+        with app.game_manager.transaction():
+            room = app.game_manager.get_room(room_id)
+            room.phase = room.phaseName.index('drawing')
+            player_ids = [player.id for player in room.players]
+        for client in players:
+            client.get_received()
+        created.append((room_id, list(zip(player_ids, players))))
+    yield created
+    for room_id, players in created:
+        # 移除房間並釋放其繪圖工作、計時與圖片
+        room = app.game_manager.peek_room(room_id)
+        app.game_manager.remove_room(room_id)
+        app.release_room(room)
+        for _, client in players:
+            client.disconnect()
+
+
+def make_png() -> bytes:
+    buf = io.BytesIO()
+    Image.new('RGB', (32, 32), 'red').save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def upload_dispatched(app, pool, expected):
+    """模擬 ComfyUI：每個送出的工作完成後回傳圖片到 /upload"""
+    png = make_png()
+    for _ in range(expected):
+        room_id, player_id, round_number = pool.dispatched.get(timeout=10)
+        response = app.app.test_client().post(
+            '/upload', base_url='https://localhost',
+            data={'files': (io.BytesIO(png), 'art.png')},
+            headers={'room': room_id, 'player': player_id, 'round': str(round_number)})
+        assert response.status_code == 202
+
+
+def wait_for(condition, timeout=20):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_concurrent_prompts_across_rooms(app_module, comfy, rooms):
+    app = app_module
+    durations = []
+
+    def submit(client):
+        start = time.perf_counter()
+        client.emit('submit_drawing_prompt', {'prompt': '一隻貓', 'selected_style': 0})
+        durations.append(time.perf_counter() - start)
+
+    uploader = threading.Thread(target=upload_dispatched,
+                                args=(app, comfy, ROOMS * PLAYERS), daemon=True)
+    uploader.start()
+    with ThreadPoolExecutor(8) as executor:
+        for future in [executor.submit(submit, client)
+                       for _, players in rooms for _, client in players]:
+            future.result()
+
+    assert wait_for(lambda: all(app.game_manager.peek_room(room_id).check_all_drawing_finished(1)
+                                for room_id, _ in rooms))
+    uploader.join(5)
+    assert comfy.in_transaction == []
+    # 排隊中的工作由其他房間的事件送出，事件處理不會等待房間鎖逾時
+    assert max(durations) < 5
+    for _, players in rooms:
+        host = players[0][1]
+        assert sum(1 for e in host.get_received() if e['name'] == 'drawing_finished') == 1
+
+
+def test_expire_drawing_dispatches_after_lock_release(app_module, comfy, rooms):
+    app = app_module
+    room_id, players = rooms[0]
+    with app.game_manager.transaction():
+        app.expire_drawing(app.game_manager.get_room(room_id))
+        # 代為送出的工作在交易結束前還沒有送出
+        assert comfy.dispatched.empty()
+    assert comfy.in_transaction == []
+    dispatched = [comfy.dispatched.get(timeout=5)
+                  for _ in range(min(PLAYERS, app.generation_scheduler.max_in_flight))]
+    room = app.game_manager.peek_room(room_id)
+    assert all(room.get_submission(player_id, 1) is not None for player_id, _ in players)
+    app.generation_scheduler.cancel_room(room_id)
+    for key in dispatched:
+        app.generation_scheduler.complete(*key)
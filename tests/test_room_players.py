@@ -0,0 +1,95 @@
+"""Room 玩家索引測試：重新連線、離開與更換房主後，依ID／socket ID 的查詢與玩家列表快取保持一致；階段以索引比較"""
+from game_logic import GameManager, Player, Room
+
+
+def assert_indexed(room: Room):
+    assert room._players_by_id == {player.id: player for player in room.players}
+    assert room._players_by_socket == {player.socket_id: player for player in room.players}
+    for player in room.players:
+        assert room.get_player(player.id) is player
+        assert room.get_player_by_socket(player.socket_id) is player
+    assert room.player_list() == [player.to_dict() for player in room.players]
+
+
+def make_room(count=4) -> Room:
+    room = Room('123456', Player('sid0', 'host', is_host=True))
+    for i in range(1, count):
+        room.add_player(Player(f'sid{i}', f'p{i}'))
+    room.player_list()  # 先建立快取
+    return room
+
+
+def test_rejoin_with_new_socket():
+    room = make_room()
+    player = room.players[1]
+    room.set_player_socket(player, 'sid-new')
+    assert room.get_player_by_socket('sid1') is None
+    assert room.get_player_by_socket('sid-new') is player
+    assert_indexed(room)
+
+    # 重新連線後離開，新的 socket ID 也一併移除
+    room.remove_player(player.id)
+    assert room.get_player_by_socket('sid-new') is None
+    assert room.get_player(player.id) is None
+    assert_indexed(room)
+
+
+def test_rejoin_with_same_socket():
+    room = make_room()
+    player = room.players[2]
+    room.set_player_socket(player, player.socket_id)
+    assert_indexed(room)
+
+
+def test_remove_player():
+    room = make_room()
+    player = room.players[2]
+    room.remove_player(player.id)
+    assert player not in room.players
+    assert room.get_player(player.id) is None
+    assert room.get_player_by_socket(player.socket_id) is None
+    assert_indexed(room)
+    # 移除不存在的玩家不影響索引
+    room.remove_player(player.id)
+    assert len(room.players) == 3
+    assert_indexed(room)
+
+
+def test_host_reassignment_updates_player_list():
+    room = make_room()
+    host = room.players[0]
+    room.remove_player(host.id)
+    new_host = room.players[0]
+    assert new_host.is_host
+    assert room.player_list()[0]['is_host']
+    assert_indexed(room)
+
+
+def test_join_after_leave_and_restore():
+    room = make_room()
+    room.remove_player(room.players[3].id)
+    room.add_player(Player('sid-late', 'late'))
+    room.set_player_socket(room.players[1], 'sid-rejoin')
+    assert_indexed(room)
+    # 經過房間儲存序列化後重建的索引相同
+    restored = Room.from_state(room.to_state())
+    assert_indexed(restored)
+    assert restored.get_player_by_socket('sid-rejoin').id == room.players[1].id
+
+
+def test_last_player_leaves():
+    room = make_room(1)
+    room.remove_player(room.players[0].id)
+    assert room.players == []
+    assert_indexed(room)
+
+
+def test_stage_helpers_use_stage_indexes():
+    room = make_room()
+    room.start_voting()
+    assert room.phase_name == 'voting'
+    manager = GameManager()
+    manager.add_room(room)
+    assert [info['id'] for info in manager.get_active_rooms()] == [room.id]
+    room.phase = room.phaseName.index('ended')
+    assert manager.get_active_rooms() == []
@@ -0,0 +1,144 @@
+"""RedisRoomStore 測試（fakeredis）：房間狀態序列化往返與跨 worker 的房間鎖"""
+import threading
+
+import fakeredis
+import pytest
+from redis.exceptions import LockError
+
+from game_logic import GameManager, Player, Room, SubmittedData
+from room_store import RedisRoomStore
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def make_store(server, **kwargs) -> RedisRoomStore:
+    """每個 worker 各自連線到同一台（假的）Redis"""
+    return RedisRoomStore('redis://fake', client=fakeredis.FakeRedis(server=server), **kwargs)
+
+
+def make_room() -> Room:
+    """遊戲進行到第二回合、各種狀態都有值的房間"""
+    host = Player('sid-host', '房主', is_host=True)
+    room = Room('123456', host)
+    guest = Player('sid-guest', '玩家')
+    room.add_player(guest)
+    room.start_game('動物', '貓')
+    room.phase = 5
+    room.topicCandidates = ['動物', '食物']
+    room.topicVoteCount = [2, 0]
+    room.drawing_deadline = 1700000000.5
+    room.votes = {host.id: guest.id}
+    for player in room.players:
+        room.add_submission(player, SubmittedData(1, f'{player.name}的提詞'))
+        room.mark_drawing_finished(player.id, 1)
+        room.mark_art_received(player.id, 1)
+        room.mark_art_selected(player.id, 1, 0)
+    room.get_submission(host.id, 1).image_ids = ['a' * 20, 'b' * 20]
+    room.current_round = 2
+    room.add_submission(host, SubmittedData(2, '第二回合'))
+    room.mark_drawing_finished(host.id, 2)
+    room.set_player_avatar(guest, 3)
+    return room
+
+
+def test_state_round_trip(server):
+    store = make_store(server)
+    room = make_room()
+    store.save(room)
+
+    restored = store.get(room.id)
+    assert restored is not room
+    assert restored.to_state() == room.to_state()
+    assert restored.created_at == room.created_at
+    # 由提交資料重建的索引與計數
+    for player in room.players:
+        assert restored.get_player(player.id).name == player.name
+        assert restored.get_player_by_socket(player.socket_id).id == player.id
+    assert restored.get_submission(room.players[0].id, 1).image_ids == ['a' * 20, 'b' * 20]
+    assert restored.check_all_drawing_finished(1)
+    assert restored.check_all_art_selected(1)
+    assert not restored.check_all_drawing_finished(2)
+    assert restored._round_counts == room._round_counts
+    assert restored.player_list() == room.player_list()
+    assert restored.image_ids() == room.image_ids()
+
+    # 還原後的房間可以繼續遊戲
+    guest = restored.players[1]
+    restored.add_submission(guest, SubmittedData(2, '第二回合'))
+    restored.mark_drawing_finished(guest.id, 2)
+    assert restored.check_all_drawing_finished(2)
+
+
+def test_index_and_delete(server):
+    store = make_store(server)
+    rooms = [Room(f'{i:06d}', Player(f'sid{i}', f'p{i}', is_host=True)) for i in range(3)]
+    for room in rooms:
+        store.save(room)
+    assert sorted(store.room_ids()) == [room.id for room in rooms]
+    assert len(store) == 3
+
+    store.delete(rooms[0].id)
+    assert store.get(rooms[0].id) is None
+    # 過期的房間資料會從索引中移除
+    store.redis.delete(store._key(rooms[1].id))
+    assert store.room_ids() == [rooms[2].id]
+    assert store.redis.smembers(store._index_key) == {rooms[2].id.encode()}
+
+
+def test_transaction_writes_back(server):
+    manager = GameManager(make_store(server))
+    manager.add_room(make_room())
+    with manager.transaction():
+        room = manager.get_room('123456')
+        room.votes['x'] = 'y'
+    # 另一個 worker 讀到修改後的狀態
+    other = GameManager(make_store(server))
+    assert other.get_room('123456').votes['x'] == 'y'
+
+
+def test_lock_serializes_workers(server):
+    """多個 worker 同時修改同一房間，房間鎖讓每次修改都以最新狀態為基礎"""
+    managers = [GameManager(make_store(server)) for _ in range(4)]
+    managers[0].add_room(make_room())
+    errors = []
+
+    def vote(manager, worker):
+        try:
+            for i in range(10):
+                with manager.transaction():
+                    room = manager.get_room('123456')
+                    room.votes[f'{worker}-{i}'] = 'x'
+                    room.topicVoteCount[0] += 1
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=vote, args=(manager, worker))
+               for worker, manager in enumerate(managers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    room = managers[0].get_room('123456')
+    assert room.topicVoteCount[0] == 2 + 40
+    assert len(room.votes) == 1 + 40
+
+
+def test_lock_timeout(server):
+    store = make_store(server, lock_timeout=0.2)
+    holder = make_store(server).redis.lock(f'{store.prefix}lock:123456', timeout=5)
+    assert holder.acquire()
+    try:
+        with pytest.raises(LockError):
+            with store.lock('123456'):
+                pass
+        # 其他房間不受影響
+        with store.lock('654321'):
+            pass
+    finally:
+        holder.release()
+    with store.lock('123456'):
+        pass
@@ -0,0 +1,87 @@
+"""StatusBatcher 測試：時間窗合併、flush 與 discard 後的下一批仍等滿時間窗"""
+import threading
+import time
+
+import pytest
+
+from status_batcher import StatusBatcher
+
+WINDOW = 0.2
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []  # (送出時間, 房間ID, 狀態)
+        self.sent = threading.Event()
+
+    def __call__(self, room_id, statuses):
+        self.batches.append((time.monotonic(), room_id, dict(statuses)))
+        self.sent.set()
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+@pytest.fixture
+def batcher(recorder):
+    batcher = StatusBatcher(recorder, window=WINDOW)
+    batcher.start()
+    return batcher
+
+
+def test_updates_in_window_are_merged(batcher, recorder):
+    start = time.monotonic()
+    batcher.update('room', 'a', 'sended')
+    batcher.update('room', 'b', 'sended')
+    batcher.update('room', 'a', 'finished')
+    assert recorder.sent.wait(2)
+    sent_at, room_id, statuses = recorder.batches[0]
+    assert room_id == 'room'
+    assert statuses == {'a': 'finished', 'b': 'sended'}
+    assert sent_at - start >= WINDOW * 0.9
+
+
+@pytest.mark.parametrize('drop', ['flush', 'discard'])
+def test_next_batch_waits_full_window_after_drop(batcher, recorder, drop):
+    batcher.update('room', 'a', 'sended')
+    time.sleep(WINDOW / 2)
+    getattr(batcher, drop)('room')
+    recorder.sent.clear()
+    del recorder.batches[:]
+
+    # 舊批次的送出時間到期時不應提早送出新批次
+    started = time.monotonic()
+    batcher.update('room', 'b', 'finished')
+    assert recorder.sent.wait(2)
+    sent_at, _, statuses = recorder.batches[0]
+    assert statuses == {'b': 'finished'}
+    assert sent_at - started >= WINDOW * 0.9
+    time.sleep(WINDOW)
+    assert len(recorder.batches) == 1
+
+
+def test_flush_sends_immediately(batcher, recorder):
+    batcher.update('room', 'a', 'finished')
+    batcher.flush('room')
+    assert recorder.batches[0][1:] == ('room', {'a': 'finished'})
+    time.sleep(WINDOW * 1.5)
+    assert len(recorder.batches) == 1
+
+
+def test_cooperative_mode_does_not_block_other_tasks(recorder):
+    """協程模式下等待時間窗時讓出事件迴圈，同一執行緒上的其他任務不會卡住"""
+    eventlet = pytest.importorskip('eventlet')
+    batcher = StatusBatcher(recorder, window=WINDOW, start_background_task=eventlet.spawn,
+                            sleep=eventlet.sleep)
+    batcher.start()
+    batcher.update('room', 'a', 'sended')
+    last = start = time.monotonic()
+    longest = 0
+    while not recorder.batches and last - start < 2:
+        eventlet.sleep(0.01)
+        now = time.monotonic()
+        longest, last = max(longest, now - last), now
+    assert recorder.batches[0][1:] == ('room', {'a': 'sended'})
+    assert longest < WINDOW / 2
@@ -0,0 +1,69 @@
+"""上傳圖片寫入測試：轉檔失敗時釋放排程名額並通知玩家"""
+import io
+from concurrent.futures import Future
+
+import pytest
+from PIL import Image
+
+from game_logic import Player, Room, SubmittedData
+
+
+def make_jpeg(color) -> bytes:
+    buf = io.BytesIO()
+    Image.new('RGB', (32, 32), color).save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+def transcoded(result=None, error=None) -> Future:
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+@pytest.fixture
+def drawing(app_module, monkeypatch):
+    """繪圖中的房間，記錄釋放的排程名額與送出的事件"""
+    player = Player('sid-upload', '玩家', is_host=True)
+    room = Room('654321', player)
+    room.add_submission(player, SubmittedData(1, '貓'))
+    app_module.game_manager.add_room(room)
+    completed, emitted = [], []
+    monkeypatch.setattr(app_module.generation_scheduler, 'complete',
+                        lambda *key: completed.append(key))
+    monkeypatch.setattr(app_module.socketio, 'emit',
+                        lambda event, data, room=None: emitted.append((event, room)))
+    yield room, player, completed, emitted
+    app_module.game_manager.remove_room(room.id)
+    app_module.phase_scheduler.cancel(room.id)
+
+
+def test_failed_transcode_releases_slot_and_notifies(app_module, drawing):
+    room, player, completed, emitted = drawing
+    app_module.store_uploaded_images(room.id, player.id, '1',
+                                     transcoded(error=OSError('無法解碼')))
+    assert completed == [(room.id, player.id, 1)]
+    assert ('drawing_error', player.socket_id) in emitted
+    assert not room.get_submission(player.id, 1).isDrawFinished
+
+
+def test_partial_transcode_releases_written_images(app_module, drawing):
+    room, player, completed, emitted = drawing
+    data = make_jpeg('red')
+    app_module.store_uploaded_images(room.id, player.id, '1', transcoded([data, None]))
+    assert completed == [(room.id, player.id, 1)]
+    assert ('drawing_error', player.socket_id) in emitted
+    submission = room.get_submission(player.id, 1)
+    assert not submission.isDrawFinished and submission.image_ids == []
+    image_store = app_module.get_image_store()
+    assert not image_store.exists(image_store.make_id(data))
+
+
+def test_successful_transcode_finishes_drawing(app_module, drawing):
+    room, player, completed, emitted = drawing
+    app_module.store_uploaded_images(room.id, player.id, '1', transcoded([make_jpeg('blue')]))
+    assert completed == [(room.id, player.id, 1)]
+    assert room.get_submission(player.id, 1).isDrawFinished
+    assert ('drawing_finished', room.id) in emitted